@@ -0,0 +1,87 @@
+"""
+Readers for columnar uploads: Parquet, and Arrow IPC (file / Feather v2, or stream).
+Files are read one record batch at a time. Known ingest columns are cast
+to their target types with Arrow compute kernels once per batch, so the
+per-row converters (e.g. BulkLoader) receive dates and floats instead of
+parsing strings row by row.
+pyarrow is imported on first use, so CSV / JSON uploads never load it.
+"""
+from typing import BinaryIO, Iterator, List
+
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+# Arrow IPC streams open with a continuation marker
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+# Ingest columns and the Arrow type each is cast to; other columns are passed through
+DATE_COLUMNS = ("date_of_service", "date_of_birth")
+FLOAT_COLUMNS = ("allowed_amount", "deductible_met", "oop_met", "deductible_limit", "oop_limit")
+INT_COLUMNS = ("plan_id",)
+TEXT_COLUMNS = ("member_id", "cpt_code", "npi", "provider_npi", "diagnosis_code", "phone_number", "zip_code")
+
+def is_columnar(head: bytes) -> bool:
+    return head.startswith((PARQUET_MAGIC, ARROW_FILE_MAGIC, ARROW_STREAM_MAGIC))
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError("Parquet / Arrow uploads need pyarrow installed (pip install pyarrow)")
+    return pyarrow
+
+def _cast_column(column, target):
+    """
+    Casts one column, trimming strings first. If any value fails to convert
+    the column is left as it was, so the row converters reject just those rows.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = pc.utf8_trim_whitespace(column)
+            if target != pa.string():
+                # Blank cells become nulls rather than parse errors
+                column = pc.if_else(pc.equal(column, ""), pa.scalar(None, column.type), column)
+        if column.type == target:
+            return column
+        return column.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return column
+
+def convert_batch(batch) -> List[dict]:
+    """Casts the known ingest columns of a record batch and returns its rows as dicts."""
+    pa = _require_pyarrow()
+    targets = {}
+    targets.update({name: pa.date32() for name in DATE_COLUMNS})
+    targets.update({name: pa.float64() for name in FLOAT_COLUMNS})
+    targets.update({name: pa.int64() for name in INT_COLUMNS})
+    targets.update({name: pa.string() for name in TEXT_COLUMNS})
+
+    columns = [
+        _cast_column(column, targets[name]) if name in targets else column
+        for name, column in zip(batch.schema.names, batch.columns)
+    ]
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names).to_pylist()
+
+def iter_columnar_rows(fileobj: BinaryIO, chunk_size: int) -> Iterator[List[dict]]:
+    """Yields lists of row dicts, one per record batch of at most chunk_size rows."""
+    pa = _require_pyarrow()
+    head = fileobj.read(len(ARROW_FILE_MAGIC))
+    fileobj.seek(0)
+
+    if head.startswith(PARQUET_MAGIC):
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(fileobj).iter_batches(batch_size=chunk_size)
+    elif head.startswith(ARROW_FILE_MAGIC):
+        reader = pa.ipc.open_file(fileobj)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        batches = iter(pa.ipc.open_stream(fileobj))
+
+    for batch in batches:
+        # IPC batches are as large as the writer made them
+        for start in range(0, batch.num_rows, chunk_size):
+            rows = convert_batch(batch.slice(start, chunk_size))
+            if rows:
+                yield rows
@@ -23,6 +23,39 @@ class Settings(BaseSettings):
     
     # App
     BASE_URL: str = "http://localhost:8000"
+    
+    # Pricing result cache (per worker process)
+    PRICING_CACHE_MAX_ENTRIES: int = 10000
+    PRICING_CACHE_TTL_SECONDS: int = 300
+    
+    # Geocode cache (zips missing from the bundled centroid table)
+    GEOCODE_CACHE_MAX_ENTRIES: int = 50000
+    GEOCODE_CACHE_TTL_SECONDS: int = 90 * 24 * 3600
+    GEOCODE_NEGATIVE_TTL_SECONDS: int = 24 * 3600
+    
+    # Facility spatial index (per worker process); rebuilt at least this often
+    FACILITY_INDEX_TTL_SECONDS: int = 300
+    
+    # Admin dashboard counts (per worker process)
+    DASHBOARD_STATS_TTL_SECONDS: int = 30
+    # Admin members list: rows per page, and how long a filter's total count is reused
+    MEMBERS_PAGE_SIZE: int = 50
+    MEMBERS_COUNT_TTL_SECONDS: int = 60
+    
+    # Ingestion jobs: rows committed per checkpoint, and how long a
+    # "running" job may go without a checkpoint before it can be resumed
+    INGEST_CHUNK_SIZE: int = 5000
+    INGEST_JOB_STALE_SECONDS: int = 300
+    # How often a running job refreshes updated_at; well under INGEST_JOB_STALE_SECONDS
+    INGEST_JOB_HEARTBEAT_SECONDS: int = 60
+    # Background worker for queued ingestion jobs (POST /tpa/ingest/referrals)
+    RUN_JOB_WORKER: bool = True
+    JOB_POLL_SECONDS: float = 2.0
+    # Referral ingest thread pool (one DB session per worker; keep below the DB pool size)
+    REFERRAL_WORKERS: int = 4
+    # Full-roster eligibility sync refuses to terminate more than this share of a
+    # file's active members (guards against truncated or partial files)
+    ROSTER_MAX_TERMINATION_RATIO: float = 0.25
 
     model_config = SettingsConfigDict(env_file=".env", extra="allow", case_sensitive=True)
 
@@ -0,0 +1,145 @@
+"""
+Streaming readers for uploaded CSV / JSON / X12 / Parquet / Arrow files.
+Rows are read straight from the upload spool and handed out in fixed-size
+chunks, so memory stays bounded by the chunk size rather than the file size.
+"""
+import codecs
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, List, Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Error messages kept in an ingestion result; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Bytes read from the spool per JSON read
+JSON_READ_BLOCK = 64 * 1024
+# A single JSON record larger than this is treated as malformed
+MAX_JSON_RECORD_CHARS = 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+def _sniff(fileobj: BinaryIO) -> str:
+    """Returns the first few non-whitespace characters of the file (BOM skipped) and rewinds."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    text = ""
+    while len(text) < 3:
+        block = fileobj.read(4096)
+        text = (text + decoder.decode(block, final=not block)).lstrip(_WHITESPACE)
+        if not block:
+            break
+    fileobj.seek(0)
+    return text[:3]
+
+def _iter_json_array(fileobj: BinaryIO, block_size: int) -> Iterator[dict]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parser = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        block = fileobj.read(block_size)
+        eof = not block
+        buf = buf[pos:] + decoder.decode(block, final=eof)
+        pos = 0
+        return not eof
+
+    while True:
+        # Skip whitespace and separators up to the next value
+        while pos < len(buf) and buf[pos] in _WHITESPACE + ("," if started else ""):
+            pos += 1
+        if pos >= len(buf):
+            if not fill():
+                raise ValueError("Unexpected end of JSON array")
+            continue
+
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array of records")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        if buf[pos] != "{":
+            raise ValueError("Expected JSON objects inside the array")
+
+        try:
+            record, end = parser.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Most likely the record straddles the block boundary
+            if len(buf) - pos > MAX_JSON_RECORD_CHARS:
+                raise ValueError("Malformed JSON record (or record too large)")
+            if not fill():
+                raise ValueError("Malformed JSON record")
+            continue
+        pos = end
+        yield record
+
+def iter_upload_rows(fileobj: BinaryIO, chunk_size: Optional[int] = None,
+                     block_size: int = JSON_READ_BLOCK) -> Iterator[List[dict]]:
+    """
+    Yields lists of at most chunk_size (default INGEST_CHUNK_SIZE) row dicts
+    from an uploaded file (UploadFile.file). A JSON array of objects is
+    parsed incrementally, an X12 interchange (834 / 835) segment by segment,
+    Parquet / Arrow IPC one record batch at a time (see app/core/columnar.py);
+    anything else is read as CSV with a header row.
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    from app.core.columnar import is_columnar, iter_columnar_rows
+    magic = fileobj.read(8)
+    fileobj.seek(0)
+    if is_columnar(magic):
+        yield from iter_columnar_rows(fileobj, chunk_size)
+        return
+
+    head = _sniff(fileobj)
+    if head.startswith("["):
+        rows = _iter_json_array(fileobj, block_size)
+    elif head == "ISA":
+        from app.services.x12_parser import iter_x12_rows
+        rows = iter_x12_rows(fileobj, block_size)
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        try:
+            yield from _chunked(csv.DictReader(text), chunk_size)
+        finally:
+            # Leave the upload's file open for its owner
+            text.detach()
+        return
+    yield from _chunked(rows, chunk_size)
+
+def _chunked(rows, chunk_size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def merge_results(total: dict, result: dict) -> dict:
+    """
+    Folds one chunk's ingestion result into a running total: counts are summed,
+    lists concatenated. Only the first MAX_REPORTED_ERRORS error messages are
+    kept, so the total stays bounded however many rows a file rejects; the
+    chunks' own counters (e.g. "rejected") carry the full number.
+    """
+    for key, value in result.items():
+        if key == "errors":
+            errors = total.setdefault(key, [])
+            errors.extend(value[:max(MAX_REPORTED_ERRORS - len(errors), 0)])
+        elif isinstance(value, list):
+            total.setdefault(key, []).extend(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        else:
+            total[key] = value
+    return total
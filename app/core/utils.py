@@ -1,5 +1,6 @@
 
 import re
+from datetime import date, datetime
 
 def normalize_phone_number(phone: str) -> str:
     """
@@ -26,3 +27,14 @@ def normalize_phone_number(phone: str) -> str:
         return phone
         
     return f"+{digits}"
+
+def parse_date(value) -> date:
+    """
+    YYYY-MM-DD string to date. Values that are already dates (e.g. from
+    batch validation or columnar uploads) are passed through.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
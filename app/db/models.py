@@ -1,7 +1,7 @@
 from typing import Optional, List
 from datetime import datetime, date
 from sqlmodel import SQLModel, Field, Relationship, JSON
-from sqlalchemy import Column, String, Boolean, Integer, Float, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, Integer, Float, Date, DateTime, ForeignKey, Text, UniqueConstraint, Index
 
 # --- Users (Admin) ---
 class User(SQLModel, table=True):
@@ -28,6 +28,11 @@ class Plan(SQLModel, table=True):
     rules: List["CPTApprovalRule"] = Relationship(back_populates="plan")
 
 class Eligibility(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination of the admin members list
+        Index("ix_eligibility_plan_id_id", "plan_id", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     member_id: str = Field(index=True) # Unique ID from employer
     first_name: str
@@ -45,6 +50,10 @@ class Eligibility(SQLModel, table=True):
     # New Risk Tier
     risk_tier: str = Field(default="Low") # Low, Medium, High
     
+    # Full-roster (delta) eligibility sync
+    termination_date: Optional[date] = None # Coverage end; set when a full file no longer lists the member
+    row_hash: Optional[str] = None # Hash of the last roster row applied; unchanged rows are skipped
+    
     plan: Plan = Relationship(back_populates="members")
     interactions: List["MemberInteraction"] = Relationship(back_populates="member")
     accumulators: List["Accumulator"] = Relationship(back_populates="member")
@@ -63,6 +72,11 @@ class Facility(SQLModel, table=True):
     longitude: Optional[float] = None
 
 class EOB(SQLModel, table=True):
+    __table_args__ = (
+        # Pricing: EOBs of one plan + CPT, and their allowed amounts without a table lookup
+        Index("ix_eob_plan_cpt_allowed", "plan_id", "cpt_code", "allowed_amount"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     member_id_ref: str # Reference to member_id, might not link directly if member not in eligibility yet
     plan_id: int = Field(foreign_key="plan.id")
@@ -72,6 +86,32 @@ class EOB(SQLModel, table=True):
     allowed_amount: float
     place_of_service: Optional[str] = None
     facility_name: Optional[str] = None
+    row_hash: Optional[str] = Field(default=None, unique=True, index=True) # sha256 of member, date, CPT, NPI, amount; drops resent rows
+
+class PriceSummary(SQLModel, table=True):
+    """Per-plan price aggregate over EOBs, refreshed incrementally on EOB ingest"""
+    __table_args__ = (
+        UniqueConstraint("plan_id", "cpt_code", "npi", name="uq_pricesummary_plan_cpt_npi"),
+        Index("ix_pricesummary_plan_cpt_min", "plan_id", "cpt_code", "min_allowed"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    plan_id: int = Field(foreign_key="plan.id")
+    cpt_code: str
+    npi: str
+    min_allowed: float
+    median_allowed: float
+    eob_count: int = 0
+    facility_name: Optional[str] = None  # Fallback name from EOBs when Facility row is missing
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class GeocodeCache(SQLModel, table=True):
+    """Persistent zip geocode results, shared across workers. found=False caches misses."""
+    zip_code: str = Field(primary_key=True)
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    found: bool = True
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
 
 class CPTApprovalRule(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -97,6 +137,10 @@ class CPTNPIException(SQLModel, table=True):
     is_active: bool = True
 
 class MemberInteraction(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_memberinteraction_member_timestamp", "member_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     member_id: int = Field(foreign_key="eligibility.id")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -119,6 +163,11 @@ class OptOut(SQLModel, table=True):
 # --- New TPA Models ---
 
 class Accumulator(SQLModel, table=True):
+    __table_args__ = (
+        # Routing reads a member's latest accumulator
+        Index("ix_accumulator_member_timestamp", "member_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     member_id: int = Field(foreign_key="eligibility.id")
     deductible_met: float = 0.0
@@ -130,6 +179,10 @@ class Accumulator(SQLModel, table=True):
     member: Eligibility = Relationship(back_populates="accumulators")
 
 class ReferralEvent(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_referralevent_member_timestamp", "member_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     member_id: int = Field(foreign_key="eligibility.id")
     cpt_code: str
@@ -152,6 +205,7 @@ class ReferralEvent(SQLModel, table=True):
     
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     status: str = "received" # received, processed, engaged, suppressed
+    source_key: Optional[str] = Field(default=None, unique=True, index=True) # "<job id>:<row>" for job rows; a retried chunk skips rows already stored
     
     member: Eligibility = Relationship(back_populates="referrals")
 
@@ -164,6 +218,7 @@ class Claim(SQLModel, table=True):
     allowed_amount: float
     provider_npi: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    row_hash: Optional[str] = Field(default=None, unique=True, index=True) # sha256 of member, date, CPT, NPI, amount; drops resent rows
 
     member: Eligibility = Relationship(back_populates="claims")
 
@@ -172,9 +227,25 @@ class SupportMessage(SQLModel, table=True):
     member_id: int = Field(foreign_key="eligibility.id")
     message_content: str
     media_url: Optional[str] = None  # For referral photos
-    status: str = "pending"  # pending, replied, resolved
+    status: str = Field(default="pending", index=True)  # pending, replied, resolved
     admin_reply: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     resolved_at: Optional[datetime] = None
     
     member: Eligibility = Relationship()
+
+class IngestionJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True) # eligibility, accumulators, claims, facilities, referrals, eob
+    file_name: Optional[str] = None
+    file_hash: str = Field(index=True) # sha256 of the uploaded file
+    status: str = "running" # queued, running, completed, failed
+    row_offset: int = 0 # Checkpoint: rows committed so far
+    total_rows: Optional[int] = None # Known up front for queued API jobs
+    payload: Optional[List[dict]] = Field(default=None, sa_column=Column(JSON(none_as_null=True))) # Rows of a queued job, cleared once done
+    processed: int = 0
+    error_count: int = 0
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
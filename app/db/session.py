@@ -1,4 +1,6 @@
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -10,10 +12,42 @@ if "sqlite" in settings.DATABASE_URL:
 
 engine = create_engine(settings.DATABASE_URL, echo=False, connect_args=connect_args)
 
+# Async drivers for the same database, used by async route handlers
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    if backend == "postgres":
+        backend = "postgresql"
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+_async_engine = None
+
+def get_async_engine():
+    """Created on first use so the sync-only scripts never need the async driver."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), echo=False)
+    return _async_engine
+
 def get_session():
+    """
+    Sync session. Handlers that use it are plain `def` so FastAPI runs them
+    in its threadpool instead of blocking the event loop; async handlers
+    that need it must wrap the DB work in run_in_threadpool.
+    """
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    """Session for `async def` handlers; relationships must be loaded eagerly."""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
     
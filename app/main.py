@@ -8,7 +8,7 @@ if sys.version_info < (3, 10):
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 from app.routes import twilio, admin, tpa, exceptions
-from app.db.session import create_db_and_tables
+from app.db.session import create_db_and_tables, engine
 from app.core.config import get_settings
 from contextlib import asynccontextmanager
 
@@ -17,7 +17,22 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    
+    # Facility spatial index for distance filtering in PricingService
+    from sqlmodel import Session
+    from app.services.facility_index import build_facility_index
+    with Session(engine) as session:
+        build_facility_index(session)
+    
+    # Background worker for queued ingestion jobs
+    worker = None
+    if settings.RUN_JOB_WORKER:
+        from app.services.job_worker import JobWorker
+        worker = JobWorker(engine)
+        worker.start()
     yield
+    if worker:
+        worker.stop()
 
 app = FastAPI(title="Totl", lifespan=lifespan)
 
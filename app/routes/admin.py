@@ -2,14 +2,17 @@ from fastapi import APIRouter, Request, Depends, Form, UploadFile, File, status,
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select, func
-from sqlalchemy import and_
-from app.db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from app.db.session import get_session, get_async_session
 from app.db.models import User, Employer, Plan, Eligibility, EOB, Facility, CPTApprovalRule, MemberInteraction, OptOut, Accumulator
 from app.core.config import get_settings
 from typing import Optional
 import csv
 import codecs
-from datetime import datetime
+from datetime import datetime, date
+from urllib.parse import urlencode
 from app.core.utils import normalize_phone_number
 
 router = APIRouter()
@@ -66,14 +69,21 @@ def get_support_count(session: Session):
     count = session.exec(select(func.count()).select_from(SupportMessage).where(SupportMessage.status == "pending")).one()
     return count
 
+async def get_support_count_async(session: AsyncSession):
+    from app.db.models import SupportMessage
+    result = await session.exec(select(func.count()).select_from(SupportMessage).where(SupportMessage.status == "pending"))
+    return result.one()
+
 # --- Routes ---
+# Handlers using the sync session are plain `def` so FastAPI runs them in its
+# threadpool; the most-visited pages are `async def` on the async session.
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @router.post("/login")
-async def login(request: Request, username: str = Form(...), password: str = Form(...), session: Session = Depends(get_session)):
+def login(request: Request, username: str = Form(...), password: str = Form(...), session: Session = Depends(get_session)):
     # Simple check - in prod use hashing
     # For MVP bootstrap, let's allow a default admin if DB is empty or check DB
     user = session.exec(select(User).where(User.username == username)).first()
@@ -96,36 +106,27 @@ async def logout(request: Request):
 
 @router.get("/", response_class=HTMLResponse)
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, employer_id: int = None, session: Session = Depends(get_session)):
+def dashboard(request: Request, employer_id: int = None, session: Session = Depends(get_session)):
     login_required(request)
     from app.db.models import Eligibility, MemberInteraction, Employer, Plan
+    from app.services.dashboard_stats import dashboard_stats
     
     # Get all employers for filter dropdown
     employers = session.exec(select(Employer)).all()
     
-    # Build query with optional employer filter
-    members_query = select(Eligibility)
-    if employer_id:
-        # Filter by employer through plan relationship
-        plan_ids = session.exec(select(Plan.id).where(Plan.employer_id == employer_id)).all()
-        members_query = members_query.where(Eligibility.plan_id.in_(plan_ids))
-    
-    members = session.exec(members_query).all()
-    
-    # Calculate stats
-    stats = {
-        "members": len(members),
-        "opted_in": sum(1 for m in members if m.opted_in),
-        "opted_out": sum(1 for m in members if m.opted_out),
-        "interactions": session.exec(select(MemberInteraction)).all().__len__()
-    }
+    # Counts are SQL aggregates per employer, cached briefly
+    stats = dashboard_stats(session, employer_id)
     
     # Get recent interactions (filter by employer if selected)
     interactions_query = select(MemberInteraction).order_by(MemberInteraction.timestamp.desc()).limit(10)
     if employer_id:
-        # Filter interactions for members of this employer
-        member_ids = [m.id for m in members]
-        interactions_query = interactions_query.where(MemberInteraction.member_id.in_(member_ids))
+        # Filter by employer through the member's plan
+        interactions_query = (
+            interactions_query
+            .join(Eligibility, Eligibility.id == MemberInteraction.member_id)
+            .join(Plan, Plan.id == Eligibility.plan_id)
+            .where(Plan.employer_id == employer_id)
+        )
     
     interactions = session.exec(interactions_query).all()
     
@@ -139,9 +140,9 @@ async def dashboard(request: Request, employer_id: int = None, session: Session
     })
 
 @router.post("/upload/eligibility")
-async def upload_eligibility(request: Request, file: UploadFile = File(...), session: Session = Depends(get_session)):
+def upload_eligibility(request: Request, file: UploadFile = File(...), session: Session = Depends(get_session)):
     login_required(request)
-    content = await file.read()
+    content = file.file.read()
     decoded = content.decode('utf-8').splitlines()
     reader = csv.DictReader(decoded)
     
@@ -191,83 +192,53 @@ async def upload_eligibility(request: Request, file: UploadFile = File(...), ses
     return RedirectResponse(url="/admin/dashboard", status_code=303)
 
 @router.post("/upload/eob")
-async def upload_eob(request: Request, file: UploadFile = File(...), session: Session = Depends(get_session)):
+def upload_eob(request: Request, file: UploadFile = File(...), session: Session = Depends(get_session)):
     login_required(request)
-    content = await file.read()
-    decoded = content.decode('utf-8').splitlines()
-    reader = csv.DictReader(decoded)
+    from app.services.ingestion_jobs import IngestionJobService
     
-    count = 0
-    for row in reader:
-        try:
-            new_eob = EOB(
-                member_id_ref=row["member_id"],
-                plan_id=int(row["plan_id"]),
-                date_of_service=datetime.strptime(row["date_of_service"], "%Y-%m-%d").date(),
-                cpt_code=row["cpt_code"],
-                npi=row["npi"],
-                allowed_amount=float(row["allowed_amount"]),
-                place_of_service=row.get("place_of_service"),
-                facility_name=row.get("facility_name")
-            )
-            session.add(new_eob)
-            count += 1
-        except Exception as e:
-            print(f"Skipping EOB row: {e}")
-            continue
-            
-    session.commit()
+    # Stream validated rows straight into EOB (COPY on Postgres) as a resumable job;
+    # the loader also refreshes the price summary for the keys it loaded
+    job, summary = IngestionJobService(session).run("eob", file.file, file.filename)
+    if summary.get("duplicate_of"):
+        print(f"EOB upload {file.filename}: already ingested as job {summary['duplicate_of']}, skipped")
+    else:
+        print(f"EOB upload {file.filename}: loaded {summary['loaded']}, rejected {summary['rejected']}, "
+              f"duplicates {summary['duplicates']} ({summary['method']})")
+    for error in summary["errors"]:
+        print(f"Skipping EOB row: {error}")
     return RedirectResponse(url="/admin/dashboard", status_code=303)
 
 @router.get("/onboarding", response_class=HTMLResponse)
-async def onboarding_page(request: Request, session: Session = Depends(get_session)):
+def onboarding_page(request: Request, session: Session = Depends(get_session)):
     login_required(request)
     plans = session.exec(select(Plan)).all()
     return templates.TemplateResponse("onboarding.html", {"request": request, "plans": plans})
 
 @router.get("/members", response_class=HTMLResponse)
-async def members_list(
+def members_list(
     request: Request,
     employer_id: Optional[int] = None,
     q: Optional[str] = None,
     status: Optional[str] = "all",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
     session: Session = Depends(get_session)
 ):
     login_required(request)
+    from app.services.member_directory import member_page
 
     error_message = None
     try:
         # Get all employers for dropdown
         employers = session.exec(select(Employer)).all()
 
-        query = select(Eligibility)
-
-        if employer_id:
-            # Filter by employer via plan relationship
-            plan_ids = session.exec(select(Plan.id).where(Plan.employer_id == employer_id)).all()
-            query = query.where(Eligibility.plan_id.in_(plan_ids))
-        
-        if q:
-            # Simple search on name or phone
-            query = query.where(
-                (Eligibility.first_name.ilike(f"%{q}%")) | 
-                (Eligibility.last_name.ilike(f"%{q}%")) | 
-                (Eligibility.phone_number.ilike(f"%{q}%"))
-            )
-            
-        if status == "opted_in":
-            query = query.where(Eligibility.opted_in == True)
-        elif status == "opted_out":
-            query = query.where(Eligibility.opted_out == True)
-        elif status == "pending":
-            query = query.where(and_(Eligibility.opted_in == False, Eligibility.opted_out == False))
-            
-        members = session.exec(query).all()
+        # One keyset page at a time; large books never load in full
+        page = member_page(session, employer_id, q, status, cursor, limit)
         
     except Exception as e:
         session.rollback()
         error_message = f"An error occurred while fetching members: {e}"
-        members = []
+        page = {"members": [], "next_cursor": None, "total": 0}
         try:
             employers = session.exec(select(Employer)).all()
         except:
@@ -276,7 +247,12 @@ async def members_list(
         
     return templates.TemplateResponse("members.html", {
         "request": request,
-        "members": members,
+        "members": page["members"],
+        "total": page["total"],
+        "next_cursor": page["next_cursor"],
+        "cursor": cursor,
+        # Current filters, carried by the pagination links
+        "filters": urlencode({k: v for k, v in {"employer_id": employer_id, "q": q, "status": status}.items() if v}),
         "query": q,
         "status": status,
         "employers": employers,
@@ -285,8 +261,47 @@ async def members_list(
         "support_count": get_support_count(session)
     })
 
+@router.get("/members/data")
+def members_data(
+    request: Request,
+    employer_id: Optional[int] = None,
+    q: Optional[str] = None,
+    status: Optional[str] = "all",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: Session = Depends(get_session)
+):
+    """JSON pages of the members list; pass next_cursor back as cursor for the following page."""
+    login_required(request)
+    from app.services.member_directory import member_page
+
+    try:
+        page = member_page(session, employer_id, q, status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "total": page["total"],
+        "next_cursor": page["next_cursor"],
+        "members": [
+            {
+                "id": m.id,
+                "member_id": m.member_id,
+                "first_name": m.first_name,
+                "last_name": m.last_name,
+                "phone_number": m.phone_number,
+                "plan_id": m.plan_id,
+                "plan_name": m.plan.name if m.plan else None,
+                "opted_in": m.opted_in,
+                "opted_out": m.opted_out,
+                "opted_in_date": m.opted_in_date,
+                "total_savings": m.total_savings,
+            }
+            for m in page["members"]
+        ],
+    }
+
 @router.post("/members/{member_id}/unlock")
-async def unlock_member(request: Request, member_id: int, session: Session = Depends(get_session)):
+def unlock_member(request: Request, member_id: int, session: Session = Depends(get_session)):
     login_required(request)
     member = session.get(Eligibility, member_id)
     if member:
@@ -304,7 +319,7 @@ async def unlock_member(request: Request, member_id: int, session: Session = Dep
     return RedirectResponse(url="/admin/members?status=all", status_code=303)
 
 @router.post("/campaign/preview", response_class=HTMLResponse)
-async def preview_campaign(request: Request, plan_id: int = Form(...), session: Session = Depends(get_session)):
+def preview_campaign(request: Request, plan_id: int = Form(...), session: Session = Depends(get_session)):
     login_required(request)
     
     plan = session.get(Plan, plan_id)
@@ -319,6 +334,7 @@ async def preview_campaign(request: Request, plan_id: int = Form(...), session:
         .where(Eligibility.plan_id == plan_id)
         .where(Eligibility.opted_in == False)
         .where(Eligibility.opted_out == False)
+        .where(or_(Eligibility.termination_date.is_(None), Eligibility.termination_date > date.today()))
     ).all()
     
     msg_preview = "Hi, this is Totl, working with your employer’s health plan. We help you get many labs and imaging tests at $0. When your doctor gives you an order, text us a photo and we’ll show you the nearest $0 options. Reply YES to enroll or NO to opt out."
@@ -331,7 +347,7 @@ async def preview_campaign(request: Request, plan_id: int = Form(...), session:
     })
 
 @router.post("/trigger_onboarding")
-async def trigger_onboarding(
+def trigger_onboarding(
     request: Request, 
     plan_id: int = Form(...), 
     selected_members: list[int] = Form(...), 
@@ -372,23 +388,23 @@ async def trigger_onboarding(
     })
 
 @router.get("/members/{member_id}", response_class=HTMLResponse)
-async def member_detail(request: Request, member_id: int, session: Session = Depends(get_session)):
+async def member_detail(request: Request, member_id: int, session: AsyncSession = Depends(get_async_session)):
     login_required(request)
     
-    member = session.get(Eligibility, member_id)
+    member = await session.get(Eligibility, member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
         
-    plans = session.exec(select(Plan)).all()
+    plans = (await session.exec(select(Plan))).all()
     
     # Fetch interactions
-    interactions = session.exec(
+    interactions = (await session.exec(
         select(MemberInteraction)
         .where(MemberInteraction.member_id == member_id)
         .order_by(MemberInteraction.timestamp.asc())
-    ).all()
+    )).all()
     
-    accumulator = session.exec(select(Accumulator).where(Accumulator.member_id == member_id).order_by(Accumulator.timestamp.desc())).first()
+    accumulator = (await session.exec(select(Accumulator).where(Accumulator.member_id == member_id).order_by(Accumulator.timestamp.desc()))).first()
     
     return templates.TemplateResponse("member_detail.html", {
         "request": request,
@@ -396,11 +412,11 @@ async def member_detail(request: Request, member_id: int, session: Session = Dep
         "plans": plans,
         "interactions": interactions,
         "accumulator": accumulator,
-        "support_count": get_support_count(session)
+        "support_count": await get_support_count_async(session)
     })
 
 @router.post("/members/{member_id}")
-async def update_member(
+def update_member(
     request: Request, 
     member_id: int,
     first_name: str = Form(...),
@@ -431,7 +447,7 @@ async def update_member(
     return RedirectResponse(url=f"/admin/members/{member_id}", status_code=303)
 
 @router.post("/members/{member_id}/send_message")
-async def send_message(
+def send_message(
     request: Request,
     member_id: int,
     message: str = Form(...),
@@ -473,13 +489,23 @@ async def send_message(
     return RedirectResponse(url=f"/admin/members/{member_id}", status_code=303)
 
 @router.get("/settings", response_class=HTMLResponse)
-async def settings_page(request: Request, session: Session = Depends(get_session)):
+def settings_page(request: Request, session: Session = Depends(get_session)):
     login_required(request)
     return templates.TemplateResponse("settings.html", {"request": request, "support_count": get_support_count(session)})
 
+@router.get("/stats/cache")
+async def cache_stats(request: Request):
+    login_required(request)
+    from app.services.pricing_service import get_pricing_cache_stats
+    from app.services.geo_service import get_geocode_cache_stats
+    from app.services.dashboard_stats import get_dashboard_stats_cache_stats
+    from app.services.member_directory import get_member_count_cache_stats
+    return {"pricing": get_pricing_cache_stats(), "geocode": get_geocode_cache_stats(),
+            "dashboard": get_dashboard_stats_cache_stats(), "member_counts": get_member_count_cache_stats()}
+
 
 @router.post("/demo/trigger_event")
-async def trigger_demo_event(
+def trigger_demo_event(
     request: Request,
     member_id: str = Form(...),
     cpt_code: str = Form(...),
@@ -514,7 +540,7 @@ async def trigger_demo_event(
     return RedirectResponse(url=f"/admin/demo/console?member_id={member.id}", status_code=303)
 
 @router.get("/demo/console", response_class=HTMLResponse)
-async def demo_console(request: Request, member_id: int = None, session: Session = Depends(get_session)):
+def demo_console(request: Request, member_id: int = None, session: Session = Depends(get_session)):
     login_required(request)
     from app.db.models import Eligibility, MemberInteraction
     
@@ -544,7 +570,7 @@ async def demo_console(request: Request, member_id: int = None, session: Session
     })
 
 @router.post("/demo/simulate_inbound")
-async def simulate_inbound(
+def simulate_inbound(
     request: Request,
     member_id: int = Form(...),
     body: str = Form(None),
@@ -564,17 +590,16 @@ async def simulate_inbound(
     # Call the webhook logic directly instead of making HTTP requests
         
     if action == 'text':
-        # Import the webhook function
-        from app.routes.twilio import twilio_webhook
+        # Import the webhook logic
+        from app.routes.twilio import handle_inbound_sms
         
-        # Call the webhook directly with the member's phone number and message
+        # Call the webhook logic directly with the member's phone number and message
         try:
-            response = await twilio_webhook(
-                request=request,
+            response = handle_inbound_sms(
+                session,
                 From=member.phone_number,
                 Body=body if body else "",
-                NumMedia=0,
-                session=session
+                NumMedia=0
             )
             print(f"DEBUG ADMIN: Webhook returned: {response}", flush=True)
             
@@ -608,7 +633,7 @@ async def simulate_inbound(
             traceback.print_exc()
             
     elif action == 'pic':
-        from app.routes.twilio import twilio_webhook
+        from app.routes.twilio import handle_inbound_sms
         from app.services.referral_image_service import ReferralImageService
         
         # Generate a realistic LabCorp referral image
@@ -629,13 +654,12 @@ async def simulate_inbound(
         
         # Call the webhook with the generated image
         try:
-            response = await twilio_webhook(
-                request=request,
+            response = handle_inbound_sms(
+                session,
                 From=member.phone_number,
                 Body="",
                 NumMedia=1,
-                MediaUrl0=full_url,
-                session=session
+                MediaUrl0=full_url
             )
             
             # Log interactions - REMOVED to prevent double logging (webhook handles it)
@@ -667,7 +691,7 @@ async def simulate_inbound(
 
 
 @router.post("/demo/reset")
-async def reset_demo(
+def reset_demo(
     request: Request,
     member_id: int = Form(...),
     session: Session = Depends(get_session)
@@ -740,39 +764,51 @@ async def reset_demo(
 
 
 # --- Integrations / TPA Data Management ---
+def resume_note(result: dict) -> str:
+    if result.get("duplicate_of"):
+        return f" This file was already ingested (job {result['duplicate_of']}); skipped."
+    note = ""
+    if result.get("resumed_from"):
+        note += f" Resumed from row {result['resumed_from']}."
+    if result.get("duplicates"):
+        note += f" Skipped {result['duplicates']} rows already on file."
+    return note
+
 @router.get("/integrations", response_class=HTMLResponse)
-async def integrations_page(request: Request, session: Session = Depends(get_session)):
+def integrations_page(request: Request, session: Session = Depends(get_session)):
     login_required(request)
     return templates.TemplateResponse("integrations.html", {"request": request, "support_count": get_support_count(session)})
 
 @router.post("/integrations/upload/eligibility", response_class=HTMLResponse)
-async def upload_eligibility(
+def upload_eligibility(
     request: Request,
     file: UploadFile = File(...),
+    full_roster: bool = Form(False),
     session: Session = Depends(get_session)
 ):
     login_required(request)
     try:
-        from app.services.tpa_ingestion import TPAIngestionService
-        import json
-        
-        content = await file.read()
+        from app.services.ingestion_jobs import IngestionJobService
         
-        # Try JSON first
-        try:
-            data = json.loads(content.decode())
-        except:
-            # Try CSV
-            import io
-            csv_reader = csv.DictReader(io.StringIO(content.decode()))
-            data = list(csv_reader)
+        # Stream the upload as a resumable job: each chunk commits with a checkpoint
+        if full_roster:
+            # Delta against the stored roster; members missing from the file are terminated
+            job, result = IngestionJobService(session).run("eligibility_full", file.file, file.filename)
+            return templates.TemplateResponse("integrations.html", {
+                "request": request,
+                "message": (
+                    f"Roster sync: {result.get('inserted', 0)} added, {result.get('updated', 0)} changed, "
+                    f"{result.get('unchanged', 0)} unchanged, {result.get('terminated', 0)} terminated. "
+                    f"Errors: {result.get('error_count', 0)}.{resume_note(result)}"
+                    + (f" {result['errors'][-1]}" if result["errors"] else "")
+                )
+            })
         
-        service = TPAIngestionService(session)
-        result = service.ingest_eligibility(data)
+        job, result = IngestionJobService(session).run("eligibility", file.file, file.filename)
         
         return templates.TemplateResponse("integrations.html", {
             "request": request,
-            "message": f"Processed {result['processed']} eligibility records. Errors: {len(result['errors'])}"
+            "message": f"Processed {result['processed']} eligibility records ({result.get('rows_per_sec', 0)} rows/sec). Errors: {result.get('error_count', 0)}.{resume_note(result)}"
         })
     except Exception as e:
         return templates.TemplateResponse("integrations.html", {
@@ -781,30 +817,21 @@ async def upload_eligibility(
         })
 
 @router.post("/integrations/upload/accumulators", response_class=HTMLResponse)
-async def upload_accumulators(
+def upload_accumulators(
     request: Request,
     file: UploadFile = File(...),
     session: Session = Depends(get_session)
 ):
     login_required(request)
     try:
-        from app.services.tpa_ingestion import TPAIngestionService
-        import json
+        from app.services.ingestion_jobs import IngestionJobService
         
-        content = await file.read()
-        try:
-            data = json.loads(content.decode())
-        except:
-            import io
-            csv_reader = csv.DictReader(io.StringIO(content.decode()))
-            data = list(csv_reader)
-        
-        service = TPAIngestionService(session)
-        result = service.ingest_accumulators(data)
+        # Stream the upload as a resumable job: each chunk commits with a checkpoint
+        job, result = IngestionJobService(session).run("accumulators", file.file, file.filename)
         
         return templates.TemplateResponse("integrations.html", {
             "request": request,
-            "message": f"Processed {result['processed']} accumulator records."
+            "message": f"Processed {result['processed']} accumulator records.{resume_note(result)}"
         })
     except Exception as e:
         return templates.TemplateResponse("integrations.html", {
@@ -813,30 +840,44 @@ async def upload_accumulators(
         })
 
 @router.post("/integrations/upload/claims", response_class=HTMLResponse)
-async def upload_claims(
+def upload_claims(
     request: Request,
     file: UploadFile = File(...),
     session: Session = Depends(get_session)
 ):
     login_required(request)
     try:
-        from app.services.tpa_ingestion import TPAIngestionService
-        import json
+        from app.services.ingestion_jobs import IngestionJobService
         
-        content = await file.read()
-        try:
-            data = json.loads(content.decode())
-        except:
-            import io
-            csv_reader = csv.DictReader(io.StringIO(content.decode()))
-            data = list(csv_reader)
+        # Stream the upload as a resumable job: each chunk commits with a checkpoint
+        job, result = IngestionJobService(session).run("claims", file.file, file.filename)
         
-        service = TPAIngestionService(session)
-        result = service.ingest_claims(data)
+        return templates.TemplateResponse("integrations.html", {
+            "request": request,
+            "message": f"Processed {result['processed']} claims records.{resume_note(result)}"
+        })
+    except Exception as e:
+        return templates.TemplateResponse("integrations.html", {
+            "request": request,
+            "error": str(e)
+        })
+
+@router.post("/integrations/upload/facilities", response_class=HTMLResponse)
+def upload_facilities(
+    request: Request,
+    file: UploadFile = File(...),
+    session: Session = Depends(get_session)
+):
+    login_required(request)
+    try:
+        from app.services.ingestion_jobs import IngestionJobService
+        
+        # Stream the upload as a resumable job: each chunk commits with a checkpoint
+        job, result = IngestionJobService(session).run("facilities", file.file, file.filename)
         
         return templates.TemplateResponse("integrations.html", {
             "request": request,
-            "message": f"Processed {result['processed']} claims records."
+            "message": f"Processed {result['processed']} facility records ({result.get('geocoded', 0)} geocoded).{resume_note(result)}"
         })
     except Exception as e:
         return templates.TemplateResponse("integrations.html", {
@@ -844,28 +885,45 @@ async def upload_claims(
             "error": str(e)
         })
 
-@router.post("/integrations/upload/referrals", response_class=HTMLResponse)
-async def upload_referrals(
+@router.post("/integrations/upload/remittance", response_class=HTMLResponse)
+def upload_remittance(
     request: Request,
     file: UploadFile = File(...),
+    plan_id: int = Form(...),
     session: Session = Depends(get_session)
 ):
     login_required(request)
     try:
-        from app.services.tpa_ingestion import TPAIngestionService
-        import json
+        from app.services.ingestion_jobs import IngestionJobService
         
-        content = await file.read()
-        try:
-            data = json.loads(content.decode())
-        except:
-            import io
-            csv_reader = csv.DictReader(io.StringIO(content.decode()))
-            data = list(csv_reader)
+        if not session.get(Plan, plan_id):
+            raise ValueError(f"Plan {plan_id} not found")
+        
+        # X12 835 (or EOB CSV/JSON) into EOB; the 835 does not carry our plan, so the form supplies it
+        job, result = IngestionJobService(session).run("eob", file.file, file.filename, row_defaults={"plan_id": plan_id})
         
-        # Call TPA ingestion
-        service = TPAIngestionService(session)
-        result = service.ingest_referrals(data)
+        return templates.TemplateResponse("integrations.html", {
+            "request": request,
+            "message": f"Loaded {result.get('loaded', 0)} remittance lines. Rejected: {result.get('rejected', 0)}.{resume_note(result)}"
+        })
+    except Exception as e:
+        return templates.TemplateResponse("integrations.html", {
+            "request": request,
+            "error": str(e)
+        })
+
+@router.post("/integrations/upload/referrals", response_class=HTMLResponse)
+def upload_referrals(
+    request: Request,
+    file: UploadFile = File(...),
+    session: Session = Depends(get_session)
+):
+    login_required(request)
+    try:
+        from app.services.ingestion_jobs import IngestionJobService
+        
+        # Stream the upload as a resumable job: each chunk commits with a checkpoint
+        job, result = IngestionJobService(session).run("referrals", file.file, file.filename)
         if result["errors"]:
             print(f"DEBUG ADMIN: Ingestion Errors: {result['errors']}", flush=True)
         else:
@@ -873,7 +931,7 @@ async def upload_referrals(
         
         return templates.TemplateResponse("integrations.html", {
             "request": request,
-            "message": f"Processed {result['processed']} referral records."
+            "message": f"Processed {result['processed']} referral records.{resume_note(result)}"
         })
     except Exception as e:
         return templates.TemplateResponse("integrations.html", {
@@ -924,6 +982,19 @@ MEM001,2024-02-20,80053,E11,75.00,1234567890
         headers={"Content-Disposition": "attachment; filename=claims_sample.csv"}
     )
 
+@router.get("/integrations/sample/facilities")
+async def sample_facilities(request: Request):
+    login_required(request)
+    csv_data = """npi,facility_name,address,city,state,zip_code
+2222222222,QuickLab Freestanding Center,456 Elm Ave,Allentown,PA,18103
+3333333333,LabCorp Express,789 Oak Blvd,Easton,PA,18042
+"""
+    return StreamingResponse(
+        io.BytesIO(csv_data.encode()),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=facilities_sample.csv"}
+    )
+
 @router.get("/integrations/sample/referrals")
 async def sample_referrals(request: Request):
     login_required(request)
@@ -939,30 +1010,31 @@ MEM002,73721,9999999999
 
 # --- Support Queue ---
 @router.get("/support", response_class=HTMLResponse)
-async def support_queue(request: Request, filter: str = "active", session: Session = Depends(get_session)):
+async def support_queue(request: Request, filter: str = "active", session: AsyncSession = Depends(get_async_session)):
     login_required(request)
     from app.db.models import SupportMessage
     
-    query = select(SupportMessage)
+    # The template shows each message's member; load them up front (no lazy loads on the async session)
+    query = select(SupportMessage).options(selectinload(SupportMessage.member))
     
     if filter == "resolved":
         query = query.where(SupportMessage.status == "resolved")
     else:
         query = query.where(SupportMessage.status.in_(["pending", "replied"]))
         
-    messages = session.exec(
+    messages = (await session.exec(
         query.order_by(SupportMessage.timestamp.desc())
-    ).all()
+    )).all()
     
     return templates.TemplateResponse("support.html", {
         "request": request,
         "messages": messages,
         "current_filter": filter,
-        "support_count": get_support_count(session)
+        "support_count": await get_support_count_async(session)
     })
 
 @router.post("/support/{message_id}/reply", response_class=HTMLResponse)
-async def support_reply(
+def support_reply(
     request: Request,
     message_id: int,
     reply: str = Form(...),
@@ -990,7 +1062,7 @@ async def support_reply(
     return RedirectResponse(url="/admin/support", status_code=303)
 
 @router.post("/support/{message_id}/resolve", response_class=HTMLResponse)
-async def support_resolve(
+def support_resolve(
     request: Request,
     message_id: int,
     session: Session = Depends(get_session)
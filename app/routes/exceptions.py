@@ -9,7 +9,7 @@ from fastapi import APIRouter, Depends, Request
 router = APIRouter()
 
 @router.get("/admin/exceptions/export")
-async def export_exceptions(
+def export_exceptions(
     request: Request,
     plan_id: int = None,
     session: Session = Depends(get_session)
@@ -1,78 +1,109 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy.orm import defer
 from sqlmodel import Session
-from app.db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_session, get_async_session
 from app.services.tpa_ingestion import TPAIngestionService
-from pydantic import BaseModel
-from typing import List, Optional
+from app.services.batch_validation import validate_batch, BatchValidation
+from typing import List
 
 router = APIRouter()
 
-# --- Pydantic Models for Ingestion ---
+# --- Validation ---
+# Payloads are validated column by column for the whole batch (see
+# app/services/batch_validation.py for the fields of each feed). Invalid
+# rows are skipped and listed under "validation" with their index.
 
-class EligibilityItem(BaseModel):
-    member_id: str
-    first_name: str
-    last_name: str
-    date_of_birth: str # YYYY-MM-DD
-    phone_number: str
-    plan_id: Optional[int] = None
-    risk_tier: Optional[str] = "Low"
-
-class AccumulatorItem(BaseModel):
-    member_id: str
-    deductible_met: float
-    oop_met: float
-    deductible_limit: Optional[float] = 3000.0
-    oop_limit: Optional[float] = 6000.0
-
-class ClaimItem(BaseModel):
-    member_id: str
-    date_of_service: str # YYYY-MM-DD
-    cpt_code: str
-    diagnosis_code: Optional[str] = None
-    allowed_amount: float
-    provider_npi: Optional[str] = None
-
-class ReferralItem(BaseModel):
-    member_id: str
-    cpt_code: str
-    provider_npi: Optional[str] = None
+def validated(kind: str, payload: List[dict]) -> BatchValidation:
+    check = validate_batch(kind, payload)
+    if payload and not check.rows:
+        raise HTTPException(status_code=422, detail=check.report())
+    return check
 
 # --- Endpoints ---
+# Ingestion handlers are plain `def`: the sync session and services run in
+# FastAPI's threadpool rather than on the event loop.
 
 @router.post("/ingest/eligibility")
-async def ingest_eligibility(
-    payload: List[EligibilityItem], 
+def ingest_eligibility(
+    payload: List[dict] = Body(...),
+    full_file: bool = False,
     session: Session = Depends(get_session)
 ):
+    """
+    full_file=true treats the payload as the complete roster: unchanged members
+    are skipped and members of its plans that are missing are terminated.
+    """
+    check = validated("eligibility", payload)
     service = TPAIngestionService(session)
-    data = [item.dict() for item in payload]
-    return service.ingest_eligibility(data)
+    if full_file:
+        result = service.sync_eligibility(check.rows)
+    else:
+        result = service.ingest_eligibility(check.rows)
+    result["validation"] = check.report()
+    return result
 
 @router.post("/ingest/accumulators")
-async def ingest_accumulators(
-    payload: List[AccumulatorItem],
+def ingest_accumulators(
+    payload: List[dict] = Body(...),
     session: Session = Depends(get_session)
 ):
-    service = TPAIngestionService(session)
-    data = [item.dict() for item in payload]
-    return service.ingest_accumulators(data)
+    check = validated("accumulators", payload)
+    result = TPAIngestionService(session).ingest_accumulators(check.rows)
+    result["validation"] = check.report()
+    return result
 
 @router.post("/ingest/claims")
-async def ingest_claims(
-    payload: List[ClaimItem],
+def ingest_claims(
+    payload: List[dict] = Body(...),
     session: Session = Depends(get_session)
 ):
-    service = TPAIngestionService(session)
-    data = [item.dict() for item in payload]
-    return service.ingest_claims(data)
+    check = validated("claims", payload)
+    result = TPAIngestionService(session).ingest_claims(check.rows)
+    result["validation"] = check.report()
+    return result
 
-@router.post("/ingest/referrals")
-async def ingest_referrals(
-    payload: List[ReferralItem],
+@router.post("/ingest/facilities")
+def ingest_facilities(
+    payload: List[dict] = Body(...),
     session: Session = Depends(get_session)
 ):
-    service = TPAIngestionService(session)
-    data = [item.dict() for item in payload]
-    return service.ingest_referrals(data)
+    check = validated("facilities", payload)
+    result = TPAIngestionService(session).ingest_facilities(check.rows)
+    result["validation"] = check.report()
+    return result
+
+@router.post("/ingest/referrals", status_code=202)
+def ingest_referrals(
+    payload: List[dict] = Body(...),
+    session: Session = Depends(get_session)
+):
+    # Routing, pricing, image generation and SMS run in the background job worker
+    from app.services.ingestion_jobs import IngestionJobService
+    check = validated("referrals", payload)
+    job = IngestionJobService(session).enqueue("referrals", check.rows)
+    return {"job_id": job.id, "status": job.status, "total_rows": job.total_rows, "validation": check.report()}
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: int, session: AsyncSession = Depends(get_async_session)):
+    # Polled by TPAs while a job runs, so it uses the async session; the
+    # queued rows (payload) are never loaded
+    from app.db.models import IngestionJob
+    job = await session.get(IngestionJob, job_id, options=[defer(IngestionJob.payload)])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "row_offset": job.row_offset,
+        "progress": round(job.row_offset / job.total_rows, 4) if job.total_rows else None,
+        "processed": job.processed,
+        "error_count": job.error_count,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "completed_at": job.completed_at,
+    }
 
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db.session import get_session
 from app.db.models import Eligibility, MemberInteraction, OptOut, SupportMessage, ReferralEvent
@@ -21,6 +22,15 @@ async def twilio_webhook(
     MediaUrl0: str = Form(None),
     session: Session = Depends(get_session)
 ):
+    # Anything async (reading the form) happens here; the DB work, Twilio and
+    # Gemini calls are blocking and run in the threadpool
+    if NumMedia > 0 and not MediaUrl0:
+        # Use MediaUrl0 param if provided (from simulation), else try form
+        form_data = await request.form()
+        MediaUrl0 = form_data.get("MediaUrl0")
+    return await run_in_threadpool(handle_inbound_sms, session, From, Body, NumMedia, MediaUrl0)
+
+def handle_inbound_sms(session: Session, From: str, Body: str, NumMedia: int, MediaUrl0: str = None) -> str:
     twilio = TwilioService()
     gemini = GeminiService()
     pricing = PricingService(session)
@@ -179,12 +189,7 @@ async def twilio_webhook(
     
     # 4. Handle Media (Referrals) - Manual photo submission (Section 2)
     if NumMedia > 0:
-        # Get media URL
-        # Use MediaUrl0 param if provided (from simulation), else try form
         media_url = MediaUrl0
-        if not media_url:
-            form_data = await request.form()
-            media_url = form_data.get("MediaUrl0")
         
         if media_url:
             # Log interaction
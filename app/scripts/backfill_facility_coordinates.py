@@ -0,0 +1,44 @@
+from sqlmodel import Session, select
+from app.db.session import engine
+from app.db.models import Facility
+from app.services.geo_service import geocode_facility
+from app.services.pricing_service import bump_price_index_version
+from app.services.facility_index import invalidate_facility_index
+
+BATCH_SIZE = 500
+
+def backfill():
+    """Resolve and store latitude/longitude for facilities that don't have them yet."""
+    updated = 0
+    unresolved = 0
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            facilities = session.exec(
+                select(Facility)
+                .where((Facility.latitude == None) | (Facility.longitude == None))
+                .where(Facility.id > last_id)
+                .order_by(Facility.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not facilities:
+                break
+            for facility in facilities:
+                last_id = facility.id
+                if geocode_facility(facility):
+                    session.add(facility)
+                    updated += 1
+                else:
+                    print(f"Could not geocode {facility.npi} (zip {facility.zip_code})")
+                    unresolved += 1
+            session.commit()
+
+    # Only reaches this process; running app workers pick the coordinates up when
+    # their facility index and pricing cache entries expire (FACILITY_INDEX_TTL_SECONDS,
+    # PRICING_CACHE_TTL_SECONDS)
+    bump_price_index_version()
+    invalidate_facility_index()
+    print(f"Backfill complete: {updated} geocoded, {unresolved} unresolved")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,37 @@
+"""
+Builds app/data/zip_centroids.bin from a ZIP centroid source file.
+
+Accepts either the Census ZCTA Gazetteer file (tab-separated, GEOID/INTPTLAT/INTPTLONG)
+or a CSV with zip_code,lat,lng columns:
+
+    python -m app.scripts.build_zip_centroids 2023_Gaz_zcta_national.txt
+"""
+import csv
+import sys
+from app.services.geo_service import ZIP_TABLE_PATH, write_zip_table
+
+def read_source(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = "\t" if "\t" in sample else ","
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for row in reader:
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            zip_code = row.get("geoid") or row.get("zip_code") or row.get("zip")
+            lat = row.get("intptlat") or row.get("lat") or row.get("latitude")
+            lng = row.get("intptlong") or row.get("lng") or row.get("long") or row.get("longitude")
+            if not (zip_code and lat and lng):
+                continue
+            yield zip_code.zfill(5), float(lat), float(lng)
+
+def build(source_path, output_path=ZIP_TABLE_PATH):
+    rows = {}
+    for zip_code, lat, lng in read_source(source_path):
+        if zip_code.isdigit() and len(zip_code) == 5:
+            rows[int(zip_code)] = (lat, lng)
+    write_zip_table(output_path, rows)
+    print(f"Wrote {len(rows)} ZIP centroids to {output_path}")
+
+if __name__ == "__main__":
+    build(sys.argv[1], *sys.argv[2:3])
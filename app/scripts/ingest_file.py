@@ -0,0 +1,21 @@
+import sys
+from sqlmodel import Session
+from app.db.session import engine
+from app.services.ingestion_jobs import IngestionJobService, INGEST_KINDS
+
+def ingest(kind: str, path: str, plan_id: int = None):
+    """Run (or resume) an ingestion job for a file on disk (CSV, JSON or X12 834/835)."""
+    row_defaults = {"plan_id": plan_id} if plan_id else None
+    with Session(engine) as session, open(path, "rb") as fileobj:
+        job, result = IngestionJobService(session).run(kind, fileobj, path, row_defaults=row_defaults)
+        if result.get("duplicate_of"):
+            print(f"Already ingested by job {job.id}; skipped")
+            return
+        print(f"Job {job.id} {job.status}: {job.processed} processed, {job.error_count} errors "
+              f"(resumed from row {result['resumed_from']})")
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] not in INGEST_KINDS:
+        print(f"Usage: python -m app.scripts.ingest_file <{'|'.join(INGEST_KINDS)}> <path> [plan_id]")
+        sys.exit(1)
+    ingest(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
@@ -0,0 +1,12 @@
+import sys
+from sqlmodel import Session
+from app.db.session import engine
+from app.services.pricing_service import PricingService
+
+def rebuild(plan_id: int = None):
+    with Session(engine) as session:
+        written = PricingService(session).rebuild_price_summary(plan_id)
+        print(f"Rebuilt price summary: {written} rows")
+
+if __name__ == "__main__":
+    rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
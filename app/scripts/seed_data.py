@@ -188,6 +188,12 @@ def seed_data():
             )
             session.add(fac3)
         
+        # Store facility coordinates once so pricing never geocodes them
+        from app.services.geo_service import geocode_facility
+        for facility in (fac1, fac2, fac3):
+            geocode_facility(facility)
+            session.add(facility)
+        
         # CPT-NPI Exceptions (Pre-approved combinations for TPA)
         exc1 = session.exec(select(CPTNPIException).where(
             CPTNPIException.cpt_bundle_id == "MRI_KNEE_WO"
@@ -342,6 +348,12 @@ def seed_data():
             session.add(CPTApprovalRule(plan_id=acme_plan.id, cpt_code="80050", requires_approval=False))
 
         session.commit()
+        
+        # 6. Build the price summary the PricingService reads from
+        from app.services.pricing_service import PricingService
+        from app.services.facility_index import invalidate_facility_index
+        PricingService(session).rebuild_price_summary()
+        invalidate_facility_index()
         print("Seeding complete.")
 
 if __name__ == "__main__":
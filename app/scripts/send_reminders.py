@@ -71,6 +71,10 @@ def send_reminders():
             # Check opt-in status
             if not member.opted_in or member.opted_out:
                 continue
+            
+            # Skip members whose coverage has ended
+            if member.termination_date and member.termination_date <= today:
+                continue
                 
             # Check if they have had a MORE RECENT service for these CPTs (e.g. they already went this year)
             recent_service = session.exec(
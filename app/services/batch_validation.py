@@ -0,0 +1,192 @@
+"""
+Column-wise validation of TPA ingestion payloads.
+A posted batch of rows is turned into one Arrow column per field, and each
+column is checked and coerced with vectorized compute kernels (dates,
+amounts, CPT format, phone normalization) instead of building one Pydantic
+model per row. Rows with any invalid field are dropped and reported by
+their index in the posted list; the rest go to TPAIngestionService with
+dates, numbers and phone numbers already converted.
+Benchmark against the per-row path: python -m app.scripts.benchmark_validation
+"""
+from typing import Any, Dict, List, NamedTuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Rejected rows listed individually in the report; the rest are only counted
+MAX_REPORTED_REJECTIONS = 100
+
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+NUMBER_PATTERN = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
+INTEGER_PATTERN = r"^[-+]?\d+(\.0*)?$"
+# CPT (5 digits, or 4 digits + F/T/U for category II/III/PLA) or HCPCS Level II (letter + 4 digits)
+CPT_PATTERN = r"^(\d{4}[0-9FTU]|[A-Z]\d{4})$"
+
+ERRORS = {
+    "date": "expected a YYYY-MM-DD date",
+    "float": "not a number",
+    "int": "not an integer",
+    "cpt": "not a CPT/HCPCS code",
+    "phone": "not a phone number",
+}
+
+class ColumnSpec(NamedTuple):
+    type: str  # text, date, float, int, cpt, phone
+    required: bool = True
+    default: Any = None
+
+SCHEMAS: Dict[str, Dict[str, ColumnSpec]] = {
+    "eligibility": {
+        "member_id": ColumnSpec("text"),
+        "first_name": ColumnSpec("text"),
+        "last_name": ColumnSpec("text"),
+        "date_of_birth": ColumnSpec("date"),
+        "phone_number": ColumnSpec("phone"),
+        "plan_id": ColumnSpec("int", required=False),
+        "risk_tier": ColumnSpec("text", required=False, default="Low"),
+        "zip_code": ColumnSpec("text", required=False),
+        "coverage_end": ColumnSpec("date", required=False),
+        "termination_date": ColumnSpec("date", required=False),
+        # 834 INS03; 024 (cancellation) terminates the member in a full-file sync
+        "maintenance_type": ColumnSpec("text", required=False),
+    },
+    "accumulators": {
+        "member_id": ColumnSpec("text"),
+        "deductible_met": ColumnSpec("float"),
+        "oop_met": ColumnSpec("float"),
+        "deductible_limit": ColumnSpec("float", required=False, default=3000.0),
+        "oop_limit": ColumnSpec("float", required=False, default=6000.0),
+    },
+    "claims": {
+        "member_id": ColumnSpec("text"),
+        "date_of_service": ColumnSpec("date"),
+        "cpt_code": ColumnSpec("cpt"),
+        "diagnosis_code": ColumnSpec("text", required=False),
+        "allowed_amount": ColumnSpec("float"),
+        "provider_npi": ColumnSpec("text", required=False),
+    },
+    "facilities": {
+        "npi": ColumnSpec("text"),
+        "facility_name": ColumnSpec("text"),
+        "address": ColumnSpec("text", required=False),
+        "city": ColumnSpec("text", required=False),
+        "state": ColumnSpec("text", required=False),
+        "zip_code": ColumnSpec("text", required=False),
+        "latitude": ColumnSpec("float", required=False),
+        "longitude": ColumnSpec("float", required=False),
+    },
+    "referrals": {
+        "member_id": ColumnSpec("text"),
+        "cpt_code": ColumnSpec("cpt"),
+        "provider_npi": ColumnSpec("text", required=False),
+    },
+}
+
+class BatchValidation(NamedTuple):
+    rows: List[dict]
+    rejected: int
+    rejections: List[dict]  # [{"row": index, "errors": {column: message}}], first MAX_REPORTED_REJECTIONS
+
+    def report(self) -> dict:
+        return {"rejected": self.rejected, "rows": self.rejections}
+
+def _column(rows: List[dict], name: str, kind: str) -> pa.Array:
+    values = [row.get(name) for row in rows]
+    if kind == "cpt":
+        # A code sent as a JSON number has lost its leading zeros (00100 arrives as 100)
+        values = [f"{v:05d}" if isinstance(v, int) and not isinstance(v, bool) else v for v in values]
+    if kind in ("text", "cpt"):
+        # Codes and identifiers (CPT, NPI, member id) are strings even when every value looks numeric
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed value types in one field (e.g. numbers and strings)
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+def _text(column: pa.Array) -> pa.Array:
+    """Trimmed strings, with blanks as nulls."""
+    if pa.types.is_null(column.type):
+        return pa.nulls(len(column), pa.string())
+    if not pa.types.is_string(column.type):
+        column = column.cast(pa.string())
+    column = pc.utf8_trim_whitespace(column)
+    return pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+
+def _matches(text: pa.Array, pattern: str) -> pa.Array:
+    return pc.fill_null(pc.match_substring_regex(text, pattern), False)
+
+def _convert(column: pa.Array, kind: str):
+    """Returns (converted column, mask of present but invalid values)."""
+    if kind == "date" and (pa.types.is_date(column.type) or pa.types.is_timestamp(column.type)):
+        return column.cast(pa.date32()), pa.array([False] * len(column))
+    if kind in ("float", "int") and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+        if kind == "float":
+            return column.cast(pa.float64()), pa.array([False] * len(column))
+        if pa.types.is_integer(column.type):
+            return column.cast(pa.int64()), pa.array([False] * len(column))
+        whole = pc.fill_null(pc.equal(column, pc.floor(column)), True)
+        return pc.if_else(whole, column, pa.scalar(None, column.type)).cast(pa.int64()), pc.invert(whole)
+
+    text = _text(column)
+    present = pc.is_valid(text)
+    if kind == "text":
+        return text, pa.array([False] * len(column))
+    if kind == "date":
+        parsed = pc.strptime(text, format="%Y-%m-%d", unit="s", error_is_null=True)
+        # strptime rolls 2024-02-30 over to March; round-tripping catches it
+        valid = pc.and_(_matches(text, DATE_PATTERN), pc.fill_null(pc.equal(pc.strftime(parsed, format="%Y-%m-%d"), text), False))
+        converted = pc.if_else(valid, parsed, pa.scalar(None, parsed.type)).cast(pa.date32())
+    elif kind in ("float", "int"):
+        valid = _matches(text, NUMBER_PATTERN if kind == "float" else INTEGER_PATTERN)
+        converted = pc.if_else(valid, text, pa.scalar(None, pa.string())).cast(pa.float64())
+        if kind == "int":
+            # Through float so "2.0" is accepted, as Pydantic did
+            converted = converted.cast(pa.int64())
+    elif kind == "cpt":
+        text = pc.utf8_upper(text)
+        valid = _matches(text, CPT_PATTERN)
+        converted = pc.if_else(valid, text, pa.scalar(None, pa.string()))
+    elif kind == "phone":
+        # Same result as normalize_phone_number; fewer than 10 or more than 15 digits is rejected
+        digits = pc.replace_substring_regex(text, r"\D", "")
+        length = pc.fill_null(pc.utf8_length(digits), 0)
+        valid = pc.and_(pc.greater_equal(length, 10), pc.less_equal(length, 15))
+        us = pc.or_(pc.equal(length, 10), pc.and_(pc.equal(length, 11), pc.fill_null(pc.starts_with(digits, "1"), False)))
+        prefixed = pc.if_else(pc.equal(length, 10), pa.scalar("+1"), pa.scalar("+"))
+        normalized = pc.if_else(us, pc.binary_join_element_wise(prefixed, digits, ""),
+                                pc.if_else(pc.fill_null(pc.starts_with(text, "+"), False), text,
+                                           pc.binary_join_element_wise("+", digits, "")))
+        converted = pc.if_else(valid, normalized, pa.scalar(None, pa.string()))
+    else:
+        raise ValueError(f"Unknown column type: {kind}")
+    return converted, pc.and_(present, pc.invert(valid))
+
+def validate_batch(kind: str, rows: List[dict]) -> BatchValidation:
+    """
+    Validates and coerces a batch of rows for an ingestion kind (see SCHEMAS),
+    column by column. Fields not in the schema are dropped.
+    """
+    if kind not in SCHEMAS:
+        raise ValueError(f"Unknown ingestion kind: {kind}")
+    if not rows:
+        return BatchValidation([], 0, [])
+
+    columns, errors = {}, {}
+    rejected_mask = pa.array([False] * len(rows))
+    for name, spec in SCHEMAS[kind].items():
+        converted, invalid = _convert(_column(rows, name, spec.type), spec.type)
+        failures = [(invalid, ERRORS.get(spec.type))]
+        if spec.required:
+            failures.append((pc.and_(pc.is_null(converted), pc.invert(invalid)), "required"))
+        elif spec.default is not None:
+            converted = pc.fill_null(converted, spec.default)
+        for mask, message in failures:
+            rejected_mask = pc.or_(rejected_mask, mask)
+            for index in pc.indices_nonzero(mask).to_pylist():
+                errors.setdefault(index, {})[name] = message
+        columns[name] = converted
+
+    table = pa.table(columns).filter(pc.invert(rejected_mask))
+    rejections = [{"row": index, "errors": errors[index]} for index in sorted(errors)[:MAX_REPORTED_REJECTIONS]]
+    return BatchValidation(table.to_pylist(), len(errors), rejections)
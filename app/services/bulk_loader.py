@@ -0,0 +1,213 @@
+"""
+Bulk loading of EOB and Claim rows.
+Rows are validated into plain column dicts and written in chunks without
+building ORM objects: COPY FROM STDIN on Postgres, executemany elsewhere.
+Each row carries a hash of its natural key (member, date, CPT, NPI, amount,
+and the plan for EOBs) under a unique index, so rows from a resent file are
+dropped by the insert itself (ON CONFLICT DO NOTHING) instead of piling up
+as duplicates.
+"""
+import csv
+import hashlib
+import io
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from app.db.models import EOB, Claim, Eligibility
+from app.core.uploads import MAX_REPORTED_ERRORS
+from app.core.utils import parse_date
+
+# Rows per COPY / executemany batch
+LOAD_CHUNK_ROWS = 5000
+
+def _optional(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _required(row: dict, column: str) -> str:
+    # A blank value is rejected like a missing one: COPY would read it as NULL
+    # while executemany would store "", so the same file would load differently
+    value = _optional(row[column])
+    if value is None:
+        raise ValueError(f"empty column '{column}'")
+    return value
+
+def row_hash(member_id, date_of_service, cpt_code, npi, allowed_amount, plan_id=None) -> str:
+    """
+    Natural-key hash of an EOB / claim line; the amount is compared to the cent.
+    EOBs pass their plan_id: the same 835 loaded against another plan is new
+    data for that plan, just as the ingestion job treats it as a new file.
+    """
+    parts = [str(member_id).strip(), date_of_service.isoformat(), cpt_code, npi or "", f"{float(allowed_amount):.2f}"]
+    if plan_id is not None:
+        parts.append(str(plan_id))
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def _to_copy_csv(columns: List[str], rows: List[dict]) -> io.StringIO:
+    """CSV payload for COPY ... WITH (FORMAT csv); None becomes an unquoted empty field (NULL)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buf.seek(0)
+    return buf
+
+class BulkLoader:
+    def __init__(self, session: Session):
+        self.session = session
+
+    @property
+    def uses_copy(self) -> bool:
+        return self.session.get_bind().dialect.name == "postgresql"
+
+    def load_eobs(self, rows: Iterable[dict]) -> dict:
+        """
+        Load EOB rows (member_id, plan_id, date_of_service, cpt_code, npi,
+        allowed_amount, place_of_service, facility_name) and refresh the
+        price summary for the (plan, cpt, npi) keys that were loaded.
+        """
+        touched: Set[Tuple[int, str, str]] = set()
+
+        def convert(row: dict) -> dict:
+            values = {
+                "member_id_ref": _required(row, "member_id"),
+                "plan_id": int(row["plan_id"]),
+                "date_of_service": parse_date(row["date_of_service"]),
+                "cpt_code": _required(row, "cpt_code"),
+                "npi": _required(row, "npi"),
+                "allowed_amount": float(row["allowed_amount"]),
+                "place_of_service": _optional(row.get("place_of_service")),
+                "facility_name": _optional(row.get("facility_name")),
+            }
+            values["row_hash"] = row_hash(values["member_id_ref"], values["date_of_service"], values["cpt_code"],
+                                          values["npi"], values["allowed_amount"], values["plan_id"])
+            touched.add((values["plan_id"], values["cpt_code"], values["npi"]))
+            return values
+
+        summary = self._load(EOB, rows, lambda chunk: convert)
+
+        from app.services.pricing_service import PricingService
+        PricingService(self.session).refresh_price_summary(touched)
+        return summary
+
+    def load_claims(self, rows: Iterable[dict]) -> dict:
+        """
+        Load historical claims (member_id, date_of_service, cpt_code,
+        diagnosis_code, allowed_amount, provider_npi). member_id is resolved
+        against Eligibility once per chunk; unknown members are rejected.
+        """
+        now = datetime.utcnow()
+
+        def convert(row: dict, members: Dict[str, int]) -> dict:
+            member_pk = members.get(row.get("member_id"))
+            if member_pk is None:
+                raise LookupError(f"Member not found: {row.get('member_id')}")
+            values = {
+                "member_id": member_pk,
+                "date_of_service": parse_date(row["date_of_service"]),
+                "cpt_code": _required(row, "cpt_code"),
+                "diagnosis_code": _optional(row.get("diagnosis_code")),
+                "allowed_amount": float(row["allowed_amount"]),
+                "provider_npi": _optional(row.get("provider_npi")),
+                "timestamp": now,
+            }
+            values["row_hash"] = row_hash(row["member_id"], values["date_of_service"], values["cpt_code"],
+                                          values["provider_npi"], values["allowed_amount"])
+            return values
+
+        def prepare(chunk: List[dict]):
+            member_ids = list({row.get("member_id") for row in chunk if row.get("member_id")})
+            members: Dict[str, int] = {}
+            if member_ids:
+                for member_id, pk in self.session.exec(
+                    select(Eligibility.member_id, Eligibility.id)
+                    .where(Eligibility.member_id.in_(member_ids))
+                    .order_by(Eligibility.id)
+                ).all():
+                    members.setdefault(member_id, pk)
+            return lambda row: convert(row, members)
+
+        return self._load(Claim, rows, prepare)
+
+    def _load(self, model, rows: Iterable[dict], prepare) -> dict:
+        """
+        Validates and writes rows chunk by chunk, then commits once.
+        prepare(chunk) returns the converter from an input row to column
+        values for that chunk; a row whose conversion raises is rejected.
+        Rows already stored (same row_hash) are counted as duplicates, not loaded.
+        """
+        summary = {"loaded": 0, "rejected": 0, "duplicates": 0, "errors": [],
+                   "method": "copy" if self.uses_copy else "executemany", "rows_per_sec": 0.0}
+        started = time.perf_counter()
+        row_number = 0
+
+        chunk: List[dict] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= LOAD_CHUNK_ROWS:
+                row_number = self._load_chunk(model, chunk, prepare, row_number, summary)
+                chunk = []
+        if chunk:
+            row_number = self._load_chunk(model, chunk, prepare, row_number, summary)
+
+        self.session.commit()
+        elapsed = time.perf_counter() - started
+        summary["rows_per_sec"] = round(row_number / elapsed, 1) if elapsed > 0 else 0.0
+        return summary
+
+    def _load_chunk(self, model, chunk: List[dict], prepare, row_number: int, summary: dict) -> int:
+        valid = []
+        convert = prepare(chunk)
+        for row in chunk:
+            row_number += 1
+            try:
+                valid.append(convert(row))
+            except KeyError as e:
+                summary["rejected"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append(f"Row {row_number}: missing column {e}")
+            except Exception as e:
+                summary["rejected"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append(f"Row {row_number}: {e}")
+        if valid:
+            inserted = self._write(model.__table__, valid)
+            summary["loaded"] += inserted
+            summary["duplicates"] += len(valid) - inserted
+        return row_number
+
+    def _write(self, table, rows: List[dict]) -> int:
+        """Inserts rows, skipping any whose row_hash is already stored. Returns the number inserted."""
+        connection = self.session.connection()
+        if not self.uses_copy:
+            statement = table.insert()
+            if connection.dialect.name == "sqlite":
+                statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=["row_hash"])
+            return connection.execute(statement, rows).rowcount
+
+        # COPY cannot skip conflicts, so it fills a temp staging table that is then
+        # merged with ON CONFLICT DO NOTHING. Both run on the session's own
+        # connection, inside its transaction.
+        columns = list(rows[0].keys())
+        preparer = connection.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        staging = preparer.quote(f"{table.name}_staging")
+        column_list = ", ".join(preparer.quote(c) for c in columns)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {target} WITH NO DATA")
+            cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", _to_copy_csv(columns, rows))
+            cursor.execute(
+                f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} "
+                f"ON CONFLICT (row_hash) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute(f"DROP TABLE {staging}")
+        finally:
+            cursor.close()
+        return inserted
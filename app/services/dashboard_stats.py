@@ -0,0 +1,65 @@
+from sqlmodel import Session, select, func
+from sqlalchemy import case
+from app.db.models import Eligibility, MemberInteraction, Plan
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from typing import Dict, Optional
+
+settings = get_settings()
+
+# Per-employer dashboard counts, computed in SQL and shared by every dashboard
+# view for DASHBOARD_STATS_TTL_SECONDS, so page views don't aggregate the
+# member and interaction tables each time. Counts lag by at most the TTL.
+_stats_cache = TTLCache(1, settings.DASHBOARD_STATS_TTL_SECONDS)
+
+EMPTY_STATS = {"members": 0, "opted_in": 0, "opted_out": 0, "interactions": 0}
+
+def get_dashboard_stats_cache_stats() -> dict:
+    return _stats_cache.stats()
+
+def clear_dashboard_stats_cache():
+    _stats_cache.clear()
+
+def employer_stats(session: Session) -> Dict[Optional[int], dict]:
+    """
+    Member, opt-in, opt-out and interaction counts per employer id, from two
+    GROUP BY queries. Members whose plan is missing are counted under None.
+    """
+    cached = _stats_cache.get("employers")
+    if cached is not None:
+        return cached
+
+    stats: Dict[Optional[int], dict] = {}
+    member_counts = session.exec(
+        select(
+            Plan.employer_id,
+            func.count(Eligibility.id),
+            func.sum(case((Eligibility.opted_in == True, 1), else_=0)),
+            func.sum(case((Eligibility.opted_out == True, 1), else_=0)),
+        )
+        .select_from(Eligibility)
+        .outerjoin(Plan, Plan.id == Eligibility.plan_id)
+        .group_by(Plan.employer_id)
+    ).all()
+    for employer_id, members, opted_in, opted_out in member_counts:
+        stats[employer_id] = dict(EMPTY_STATS, members=members, opted_in=opted_in or 0, opted_out=opted_out or 0)
+
+    interaction_counts = session.exec(
+        select(Plan.employer_id, func.count(MemberInteraction.id))
+        .select_from(MemberInteraction)
+        .join(Eligibility, Eligibility.id == MemberInteraction.member_id)
+        .outerjoin(Plan, Plan.id == Eligibility.plan_id)
+        .group_by(Plan.employer_id)
+    ).all()
+    for employer_id, interactions in interaction_counts:
+        stats.setdefault(employer_id, dict(EMPTY_STATS))["interactions"] = interactions
+
+    _stats_cache.set("employers", stats)
+    return stats
+
+def dashboard_stats(session: Session, employer_id: Optional[int] = None) -> dict:
+    """Counts for one employer, or summed over all of them."""
+    stats = employer_stats(session)
+    if employer_id:
+        return dict(stats.get(employer_id, EMPTY_STATS))
+    return {key: sum(group[key] for group in stats.values()) for key in EMPTY_STATS}
@@ -0,0 +1,119 @@
+"""
+In-memory spatial index over facility coordinates.
+Facilities are bucketed into a fixed lat/lng grid so "facilities within R miles
+of a point" only looks at the handful of cells overlapping the search box;
+distances for those cells are computed in one NumPy pass.
+Built at startup and rebuilt lazily after facility changes. Invalidation only
+reaches the calling process, so an index is also rebuilt once it is
+FACILITY_INDEX_TTL_SECONDS old; that bounds how long other workers (or a
+backfill script's changes) go unseen.
+"""
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from sqlmodel import Session, select
+from app.db.models import Facility
+from app.core.config import get_settings
+from app.services.geo_service import get_coordinates, haversine_distances
+
+settings = get_settings()
+
+# ~17 miles of latitude per cell; routing radii are 10-25 miles
+CELL_DEGREES = 0.25
+MILES_PER_DEGREE_LAT = 69.0
+
+class FacilitySpatialIndex:
+    def __init__(self, points: Iterable[Tuple[str, float, float]]):
+        points = list(points)
+        lats = np.array([p[1] for p in points], dtype=np.float64)
+        lngs = np.array([p[2] for p in points], dtype=np.float64)
+        rows = np.floor(lats / CELL_DEGREES).astype(np.int64)
+        cols = np.floor(lngs / CELL_DEGREES).astype(np.int64)
+
+        # Store facilities sorted by cell so each cell is one contiguous slice
+        order = np.lexsort((cols, rows))
+        self.npis: List[str] = [points[i][0] for i in order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self._positions = {npi: i for i, npi in enumerate(self.npis)}
+        self._cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for i, (row, col) in enumerate(zip(rows[order].tolist(), cols[order].tolist())):
+            start, _ = self._cells.get((row, col), (i, i))
+            self._cells[(row, col)] = (start, i + 1)
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES))
+
+    def __contains__(self, npi: str) -> bool:
+        return npi in self._positions
+
+    def __len__(self) -> int:
+        return len(self.npis)
+
+    def within(self, lat: float, lng: float, radius_miles: float) -> Dict[str, float]:
+        """Returns {npi: distance_miles} for indexed facilities within radius_miles of (lat, lng)."""
+        lat_span = radius_miles / MILES_PER_DEGREE_LAT
+        lng_span = radius_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        min_row, min_col = self._cell(lat - lat_span, lng - lng_span)
+        max_row, max_col = self._cell(lat + lat_span, lng + lng_span)
+
+        slices = [
+            self._cells[(row, col)]
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+            if (row, col) in self._cells
+        ]
+        if not slices:
+            return {}
+        candidates = np.concatenate([np.arange(start, end) for start, end in slices])
+
+        distances = haversine_distances(lat, lng, self.lats[candidates], self.lngs[candidates])
+        hits = distances <= radius_miles
+        return {
+            self.npis[i]: round(d, 1)
+            for i, d in zip(candidates[hits].tolist(), distances[hits].tolist())
+        }
+
+# (index, monotonic time it was built)
+_index: Optional[Tuple[FacilitySpatialIndex, float]] = None
+_index_lock = threading.Lock()
+
+def build_facility_index(session: Session) -> FacilitySpatialIndex:
+    """
+    (Re)build the index from Facility rows. Stored latitude/longitude is used
+    when present, otherwise the facility zip is geocoded.
+    """
+    global _index
+    points = []
+    for npi, lat, lng, zip_code in session.exec(
+        select(Facility.npi, Facility.latitude, Facility.longitude, Facility.zip_code)
+    ).all():
+        if lat is None or lng is None:
+            coords = get_coordinates(zip_code)
+            if not coords:
+                continue  # Not indexed; pricing falls back to zip distance
+            lat, lng = coords
+        points.append((npi, lat, lng))
+
+    index = FacilitySpatialIndex(points)
+    with _index_lock:
+        _index = (index, time.monotonic())
+    return index
+
+def get_facility_index(session: Session) -> FacilitySpatialIndex:
+    """Returns the current index, building it on first use, after invalidation or once it has expired."""
+    current = _index
+    if current is None or time.monotonic() - current[1] > settings.FACILITY_INDEX_TTL_SECONDS:
+        return build_facility_index(session)
+    return current[0]
+
+def invalidate_facility_index():
+    """Call after facilities are added, moved or removed. Other processes rebuild when their index expires."""
+    global _index
+    with _index_lock:
+        _index = None
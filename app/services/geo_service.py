@@ -1,27 +1,199 @@
 """
-Geo-distance calculation service using Google Maps Geocoding API.
-Falls back to mock calculation if API is unavailable.
+Geo-distance calculation service.
+Zip coordinates come from the bundled ZIP centroid table first, then a
+persistent geocode cache, then the Google Maps Geocoding API.
+Falls back to mock calculation if none of them has the zip.
 """
 import os
+import sys
+import mmap
+import array
+import bisect
+import struct
+import threading
 import requests
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
+from datetime import datetime
 import math
+import numpy as np
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 
-# Simple in-memory cache for zip code coordinates
-_zip_cache = {}
+settings = get_settings()
+
+# --- Geocode cache for zips missing from the centroid table ---
+# Bounded in-memory LRU tier in front of the GeocodeCache table.
+_geocode_memory = TTLCache(settings.GEOCODE_CACHE_MAX_ENTRIES, settings.GEOCODE_CACHE_TTL_SECONDS)
+_NOT_FOUND = object()
+GEOCODE_RETRY_SECONDS = 60
+_geocode_stats = {"table_hits": 0, "db_hits": 0, "api_calls": 0}
+
+def _remember(zip5: str, coords: Optional[Tuple[float, float]], found: bool):
+    if found:
+        _geocode_memory.set(zip5, coords)
+    else:
+        _geocode_memory.set(zip5, _NOT_FOUND, ttl=settings.GEOCODE_NEGATIVE_TTL_SECONDS)
+
+def _read_geocode_db(zip5: str) -> Tuple[Optional[bool], Optional[Tuple[float, float]]]:
+    """Returns (found, coords) from the GeocodeCache table, or (None, None) if absent/expired."""
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.db.models import GeocodeCache
+    try:
+        with Session(engine) as session:
+            row = session.get(GeocodeCache, zip5)
+    except Exception as e:
+        print(f"Geocode cache read failed for {zip5}: {e}")
+        return None, None
+    if not row:
+        return None, None
+    ttl = settings.GEOCODE_CACHE_TTL_SECONDS if row.found else settings.GEOCODE_NEGATIVE_TTL_SECONDS
+    if (datetime.utcnow() - row.fetched_at).total_seconds() > ttl:
+        return None, None
+    if not row.found:
+        return False, None
+    return True, (row.latitude, row.longitude)
+
+def _write_geocode_db(zip5: str, coords: Optional[Tuple[float, float]], found: bool):
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.db.models import GeocodeCache
+    try:
+        with Session(engine) as session:
+            row = session.get(GeocodeCache, zip5) or GeocodeCache(zip_code=zip5)
+            row.latitude, row.longitude = coords if coords else (None, None)
+            row.found = found
+            row.fetched_at = datetime.utcnow()
+            session.add(row)
+            session.commit()
+    except Exception as e:
+        print(f"Geocode cache write failed for {zip5}: {e}")
+
+def clear_geocode_cache():
+    """Clears the in-memory tier only; the GeocodeCache table is left alone."""
+    _geocode_memory.clear()
+    for key in _geocode_stats:
+        _geocode_stats[key] = 0
+
+def get_geocode_cache_stats() -> dict:
+    stats = _geocode_memory.stats()
+    stats.update(_geocode_stats)
+    return stats
+
+# --- Offline ZIP centroid table ---
+# Layout (little-endian): b"ZIPC", uint32 count, then count sorted uint32 zips,
+# count float32 latitudes and count float32 longitudes.
+ZIP_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "zip_centroids.bin")
+_ZIP_TABLE_MAGIC = b"ZIPC"
+_ZIP_TABLE_HEADER = struct.Struct("<4sI")
+
+class ZipCentroidTable:
+    """
+    Array-backed ZIP -> (lat, lng) lookup over the memory-mapped data file.
+    Opening is O(1); pages are read from disk as lookups touch them.
+    """
+    def __init__(self, path: str = ZIP_TABLE_PATH):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _ZIP_TABLE_HEADER.unpack_from(self._mmap, 0)
+        if magic != _ZIP_TABLE_MAGIC:
+            raise ValueError(f"Not a ZIP centroid table: {path}")
+
+        offset = _ZIP_TABLE_HEADER.size
+        size = 4 * count
+        view = memoryview(self._mmap)
+        self.zips = self._column(view[offset:offset + size], "I")
+        self.lats = self._column(view[offset + size:offset + 2 * size], "f")
+        self.lngs = self._column(view[offset + 2 * size:offset + 3 * size], "f")
+
+    @staticmethod
+    def _column(buffer: memoryview, typecode: str):
+        if sys.byteorder == "little":
+            return buffer.cast(typecode)
+        column = array.array(typecode, buffer.tobytes())
+        column.byteswap()
+        return column
+
+    def __len__(self) -> int:
+        return len(self.zips)
+
+    def lookup(self, zip_code: str) -> Optional[Tuple[float, float]]:
+        zip5 = (zip_code or "").strip()[:5]
+        if len(zip5) != 5 or not zip5.isdigit():
+            return None
+        key = int(zip5)
+        i = bisect.bisect_left(self.zips, key)
+        if i < len(self.zips) and self.zips[i] == key:
+            return (round(self.lats[i], 4), round(self.lngs[i], 4))
+        return None
+
+def write_zip_table(path: str, rows: Dict[int, Tuple[float, float]]):
+    """Writes {zip_int: (lat, lng)} in the ZipCentroidTable layout."""
+    zips = sorted(rows)
+    with open(path, "wb") as f:
+        f.write(_ZIP_TABLE_HEADER.pack(_ZIP_TABLE_MAGIC, len(zips)))
+        for typecode, values in (
+            ("I", zips),
+            ("f", [rows[z][0] for z in zips]),
+            ("f", [rows[z][1] for z in zips]),
+        ):
+            column = array.array(typecode, values)
+            if sys.byteorder != "little":
+                column.byteswap()
+            f.write(column.tobytes())
+
+_zip_table: Optional[ZipCentroidTable] = None
+_zip_table_lock = threading.Lock()
+_zip_table_missing = False
+
+def get_zip_table() -> Optional[ZipCentroidTable]:
+    """Loads the bundled table once per process; None if the data file is absent."""
+    global _zip_table, _zip_table_missing
+    if _zip_table is None and not _zip_table_missing:
+        with _zip_table_lock:
+            if _zip_table is None and not _zip_table_missing:
+                try:
+                    _zip_table = ZipCentroidTable()
+                except (OSError, ValueError) as e:
+                    print(f"ZIP centroid table unavailable ({e}); using geocoding API only")
+                    _zip_table_missing = True
+    return _zip_table
+
+def _normalize_zip(zip_code: str) -> Optional[str]:
+    zip5 = (zip_code or "").strip()[:5]
+    if len(zip5) == 5 and zip5.isdigit():
+        return zip5
+    return None
 
 def get_coordinates(zip_code: str) -> Optional[Tuple[float, float]]:
     """
-    Get latitude and longitude for a zip code using Google Maps Geocoding API.
+    Get latitude and longitude for a zip code.
+    Reads the bundled ZIP centroid table first (no network), then the
+    geocode cache (memory, then DB), then the Google Maps Geocoding API.
     Returns (lat, lng) tuple or None if not found.
-    Caches results to minimize API calls.
     """
-    if not zip_code:
+    zip5 = _normalize_zip(zip_code)
+    if not zip5:
         return None
     
-    # Check cache first
-    if zip_code in _zip_cache:
-        return _zip_cache[zip_code]
+    table = get_zip_table()
+    if table is not None:
+        coords = table.lookup(zip5)
+        if coords:
+            _geocode_stats["table_hits"] += 1
+            return coords
+    
+    # Memory tier (negative results are cached as _NOT_FOUND)
+    cached = _geocode_memory.get(zip5)
+    if cached is not None:
+        return None if cached is _NOT_FOUND else cached
+    
+    # DB tier, shared across workers and restarts
+    found, coords = _read_geocode_db(zip5)
+    if found is not None:
+        _geocode_stats["db_hits"] += 1
+        _remember(zip5, coords, found)
+        return coords
     
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not api_key:
@@ -30,24 +202,46 @@ def get_coordinates(zip_code: str) -> Optional[Tuple[float, float]]:
     try:
         url = f"https://maps.googleapis.com/maps/api/geocode/json"
         params = {
-            "address": zip_code,
+            "address": zip5,
             "key": api_key,
             "components": "country:US"  # Limit to US zip codes
         }
         
+        _geocode_stats["api_calls"] += 1
         response = requests.get(url, params=params, timeout=5)
         data = response.json()
         
         if data.get("status") == "OK" and data.get("results"):
             location = data["results"][0]["geometry"]["location"]
             coords = (location["lat"], location["lng"])
-            _zip_cache[zip_code] = coords
+            _remember(zip5, coords, True)
+            _write_geocode_db(zip5, coords, True)
             return coords
+        if data.get("status") == "ZERO_RESULTS":
+            # Definitive miss: negative-cache so we stop asking
+            _remember(zip5, None, False)
+            _write_geocode_db(zip5, None, False)
+            return None
     except Exception as e:
-        print(f"Geocoding API error for {zip_code}: {e}")
+        print(f"Geocoding API error for {zip5}: {e}")
     
+    # Transient failure (timeout, quota): back off briefly, don't persist
+    _geocode_memory.set(zip5, _NOT_FOUND, ttl=GEOCODE_RETRY_SECONDS)
     return None
 
+def geocode_facility(facility) -> bool:
+    """
+    Fill facility.latitude/longitude from its zip if they are not set yet.
+    Returns True if the facility has coordinates afterwards.
+    """
+    if facility.latitude is not None and facility.longitude is not None:
+        return True
+    coords = get_coordinates(facility.zip_code)
+    if not coords:
+        return False
+    facility.latitude, facility.longitude = coords
+    return True
+
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate the great circle distance in miles between two points 
@@ -67,6 +261,22 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return c * r
 
+def haversine_distances(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    Vectorized haversine: distances in miles from one origin to arrays of
+    points, computed in a single NumPy pass (same formula as haversine_distance).
+    """
+    lat1 = math.radians(lat)
+    lon1 = math.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+    
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    
+    # Radius of earth in miles
+    return c * 3956
+
 def calculate_distance_mock(zip1: str, zip2: str) -> float:
     """
     Mock distance calculation for fallback.
@@ -93,7 +303,7 @@ def calculate_distance_mock(zip1: str, zip2: str) -> float:
 def calculate_distance(zip1: str, zip2: str) -> float:
     """
     Calculate approximate distance between two zip codes in miles.
-    Uses Google Maps Geocoding API if available, falls back to mock.
+    Uses the ZIP centroid table / Geocoding API if available, falls back to mock.
     
     Returns distance in miles.
     """
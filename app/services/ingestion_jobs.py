@@ -0,0 +1,327 @@
+"""
+Resumable, chunked ingestion jobs.
+Each chunk is committed together with the job's checkpoint (row_offset), so
+after a crash an uploaded file can be re-submitted and picks up where the
+last committed chunk left off. A file whose content hash matches a completed
+job is skipped outright. Queued jobs (rows posted to the API) carry their rows
+in the job and are run by the background worker.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, event, or_, update
+from sqlmodel import Session, select
+from app.db.models import IngestionJob
+from app.core.config import get_settings
+from app.core.uploads import iter_upload_rows, merge_results
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INGEST_KINDS = ("eligibility", "eligibility_full", "accumulators", "claims", "facilities", "referrals", "eob")
+# Kinds whose rows get a source_key ("<job id>:<row>"), so a chunk that failed after
+# part of it was committed (e.g. one of the parallel referral workers) can be retried
+KEYED_KINDS = ("referrals",)
+
+def file_sha256(fileobj: BinaryIO) -> str:
+    """Hashes an upload in 1 MiB blocks and rewinds it."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(1024 * 1024), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+class JobHeartbeat(threading.Thread):
+    """
+    Bumps a running job's updated_at every INGEST_JOB_HEARTBEAT_SECONDS on its
+    own connection, so a chunk that takes longer than INGEST_JOB_STALE_SECONDS
+    (e.g. referrals rendering images and sending texts) is not taken for an
+    abandoned job and reclaimed by another process's worker.
+    """
+    def __init__(self, bind, job_id: int, interval: float = None):
+        super().__init__(name=f"ingestion-job-{job_id}-heartbeat", daemon=True)
+        self.bind = bind
+        self.job_id = job_id
+        self.interval = settings.INGEST_JOB_HEARTBEAT_SECONDS if interval is None else interval
+        self._stop_event = threading.Event()
+
+    def beat(self):
+        with self.bind.begin() as conn:
+            conn.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == self.job_id)
+                .where(IngestionJob.status == "running")
+                .values(updated_at=datetime.utcnow())
+            )
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                logger.warning(f"Heartbeat for ingestion job {self.job_id} failed: {e}")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self.join(timeout)
+
+class IngestionJobService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def _ingest_method(self, kind: str) -> Callable[[list], dict]:
+        if kind == "eob":
+            from app.services.bulk_loader import BulkLoader
+            return BulkLoader(self.session).load_eobs
+        if kind not in INGEST_KINDS:
+            raise ValueError(f"Unknown ingestion kind: {kind}")
+        if kind == "eligibility_full":
+            from app.services.tpa_ingestion import EligibilityRosterSync
+            return EligibilityRosterSync(self.session)
+        from app.services.tpa_ingestion import TPAIngestionService
+        service = TPAIngestionService(self.session)
+        if kind == "referrals":
+            return service.ingest_referrals_parallel
+        return getattr(service, f"ingest_{kind}")
+
+    def find_completed(self, kind: str, file_hash: str) -> Optional[IngestionJob]:
+        """The completed job that already ingested this exact file, if any."""
+        return self.session.exec(
+            select(IngestionJob)
+            .where(IngestionJob.kind == kind)
+            .where(IngestionJob.file_hash == file_hash)
+            .where(IngestionJob.status == "completed")
+            .order_by(IngestionJob.id.desc())
+        ).first()
+
+    def start(self, kind: str, file_hash: str, file_name: Optional[str] = None) -> IngestionJob:
+        """
+        Returns the job to run for this file: an interrupted job for the same
+        kind and file hash if there is one (failed, or running with a stale
+        checkpoint), otherwise a new job.
+        """
+        job = self.session.exec(
+            select(IngestionJob)
+            .where(IngestionJob.kind == kind)
+            .where(IngestionJob.file_hash == file_hash)
+            .where(IngestionJob.payload.is_(None))
+            .where(IngestionJob.status.in_(["running", "failed"]))
+            .order_by(IngestionJob.id.desc())
+        ).first()
+
+        if job and job.status == "running":
+            idle = (datetime.utcnow() - job.updated_at).total_seconds()
+            if idle < settings.INGEST_JOB_STALE_SECONDS:
+                raise ValueError(f"This file is already being ingested (job {job.id}, row {job.row_offset})")
+
+        if job is None:
+            job = IngestionJob(kind=kind, file_hash=file_hash, file_name=file_name)
+        job.status = "running"
+        job.updated_at = datetime.utcnow()
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    @staticmethod
+    def _checkpoint(job: IngestionJob, row_offset: int, processed: int, error_count: int, last_error: Optional[str]):
+        job.row_offset = row_offset
+        job.processed = processed
+        job.error_count = error_count
+        job.last_error = last_error
+        job.updated_at = datetime.utcnow()
+
+    def run(self, kind: str, fileobj: BinaryIO, file_name: Optional[str] = None,
+            chunk_size: Optional[int] = None, row_defaults: Optional[dict] = None) -> Tuple[IngestionJob, dict]:
+        """
+        Ingests an uploaded file (UploadFile.file) as a job, resuming from the
+        last checkpoint if this file was interrupted before.
+        row_defaults fills fields a file format does not carry (e.g. plan_id for an 835).
+        A file already ingested with the same row_defaults is not read again:
+        the earlier job is returned with duplicate_of set in the result.
+        Returns the job and the merged ingestion result for the rows processed in this run.
+        """
+        ingest = self._ingest_method(kind)
+        file_hash = file_sha256(fileobj)
+        if row_defaults:
+            defaults = json.dumps(row_defaults, sort_keys=True, default=str)
+            file_hash = hashlib.sha256(f"{file_hash}:{defaults}".encode()).hexdigest()
+
+        done = self.find_completed(kind, file_hash)
+        if done is not None:
+            return done, {"processed": 0, "errors": [], "error_count": 0, "job_id": done.id, "resumed_from": 0, "duplicate_of": done.id}
+
+        job = self.start(kind, file_hash, file_name)
+        chunks = iter_upload_rows(fileobj, chunk_size)
+        if row_defaults:
+            chunks = (
+                [{**row, **{k: v for k, v in row_defaults.items() if row.get(k) in (None, "")}} for row in chunk]
+                for chunk in chunks
+            )
+        return self._run_chunks(job, chunks, ingest)
+
+    def enqueue(self, kind: str, rows: List[dict]) -> IngestionJob:
+        """
+        Stores rows as a queued job for the background worker (see
+        app/services/job_worker.py) and returns it without processing anything.
+        """
+        self._ingest_method(kind)  # Validate kind up front
+        body = json.dumps(rows, sort_keys=True, default=str).encode()
+        job = IngestionJob(
+            kind=kind,
+            file_hash=hashlib.sha256(body).hexdigest(),
+            status="queued",
+            total_rows=len(rows),
+            payload=rows,
+        )
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    def claim_next(self) -> Optional[int]:
+        """
+        Claims the oldest queued job (or a queued job whose worker stopped
+        checkpointing) and returns its id. The claim is a conditional UPDATE,
+        so concurrent workers never pick up the same job.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.INGEST_JOB_STALE_SECONDS)
+        candidates = self.session.exec(
+            select(IngestionJob.id, IngestionJob.status, IngestionJob.updated_at)
+            .where(IngestionJob.payload.is_not(None))
+            .where(or_(
+                IngestionJob.status == "queued",
+                and_(IngestionJob.status == "running", IngestionJob.updated_at < stale_before),
+            ))
+            .order_by(IngestionJob.id)
+            .limit(10)
+        ).all()
+
+        for job_id, status, updated_at in candidates:
+            claimed = self.session.exec(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id)
+                .where(IngestionJob.status == status)
+                .where(IngestionJob.updated_at == updated_at)
+                .values(status="running", updated_at=datetime.utcnow())
+            )
+            self.session.commit()
+            if claimed.rowcount == 1:
+                return job_id
+        return None
+
+    def process(self, job_id: int, chunk_size: Optional[int] = None) -> Tuple[IngestionJob, dict]:
+        """Runs a claimed queued job from its checkpoint to completion."""
+        job = self.session.get(IngestionJob, job_id)
+        ingest = self._ingest_method(job.kind)
+        rows = job.payload or []
+        chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        chunks = (rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size))
+        return self._run_chunks(job, chunks, ingest)
+
+    def _run_chunks(self, job: IngestionJob, chunks: Iterable[List[dict]], ingest: Callable[[list], dict]) -> Tuple[IngestionJob, dict]:
+        """
+        Feeds chunks after the job's checkpoint to ingest. An ingest object may
+        also define skip(chunk), called for chunks committed by an earlier run,
+        and finish(), called once after the last chunk (see EligibilityRosterSync).
+        A JobHeartbeat keeps the job's updated_at fresh while chunks run.
+        The returned result keeps only a sample of error messages (see
+        merge_results); its error_count, like job.error_count, counts them all.
+        """
+        job_id = job.id
+        resume_from = job.row_offset
+        processed, error_count, last_error = job.processed, job.error_count, job.last_error
+        errors_before = error_count
+
+        # The chunk's row_offset is written by the ingest method's own commit, in the
+        # same transaction as the chunk's rows. It is applied just before that commit
+        # rather than up front, so the job row is not locked (on Postgres) while the
+        # chunk runs and the heartbeat can keep updating it.
+        pending_offset = []
+        def apply_checkpoint(session):
+            if pending_offset:
+                job.row_offset = pending_offset.pop()
+                job.updated_at = datetime.utcnow()
+                session.add(job)
+        event.listen(self.session, "before_commit", apply_checkpoint)
+        heartbeat = JobHeartbeat(self.session.get_bind(), job_id)
+        heartbeat.start()
+
+        started = time.perf_counter()
+        result: dict = {"processed": 0, "errors": []}
+        row = 0
+        job_row = resume_from
+        try:
+            for chunk in chunks:
+                # Skip rows already committed by an earlier run
+                if row + len(chunk) <= resume_from:
+                    row += len(chunk)
+                    if hasattr(ingest, "skip"):
+                        ingest.skip(chunk)
+                    continue
+                if row < resume_from:
+                    if hasattr(ingest, "skip"):
+                        ingest.skip(chunk[:resume_from - row])
+                    chunk = chunk[resume_from - row:]
+                    row = resume_from
+                if job.kind in KEYED_KINDS:
+                    chunk = [dict(values, source_key=f"{job_id}:{row + i}") for i, values in enumerate(chunk)]
+                row += len(chunk)
+
+                pending_offset[:] = [row]
+                chunk_result = ingest(chunk)
+                merge_results(result, chunk_result)
+
+                errors = chunk_result.get("errors", [])
+                processed += chunk_result.get("processed", chunk_result.get("loaded", 0))
+                error_count += chunk_result.get("rejected", len(errors))
+                if errors:
+                    last_error = str(errors[-1])[:500]
+                job_row = row
+
+                # Counts after the chunk
+                self._checkpoint(job, row, processed, error_count, last_error)
+                self.session.add(job)
+                self.session.commit()
+
+            if hasattr(ingest, "finish"):
+                finish_result = ingest.finish()
+                merge_results(result, finish_result)
+                if finish_result.get("errors"):
+                    error_count += len(finish_result["errors"])
+                    last_error = str(finish_result["errors"][-1])[:500]
+        except Exception as e:
+            pending_offset.clear()
+            self.session.rollback()
+            job = self.session.get(IngestionJob, job_id)
+            job.processed, job.error_count = processed, error_count
+            job.status = "failed"
+            job.last_error = str(e)[:500]
+            job.updated_at = datetime.utcnow()
+            self.session.add(job)
+            self.session.commit()
+            raise
+        finally:
+            heartbeat.stop()
+            event.remove(self.session, "before_commit", apply_checkpoint)
+
+        self._checkpoint(job, job_row, processed, error_count, last_error)
+        job.status = "completed"
+        job.completed_at = job.updated_at = datetime.utcnow()
+        job.payload = None
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+
+        result["job_id"] = job_id
+        result["resumed_from"] = resume_from
+        result["error_count"] = error_count - errors_before
+        if "rows_per_sec" in result:
+            elapsed = time.perf_counter() - started
+            result["rows_per_sec"] = round((row - resume_from) / elapsed, 1) if elapsed > 0 else 0.0
+        return job, result
@@ -0,0 +1,51 @@
+"""
+In-process worker for queued ingestion jobs.
+Polls the IngestionJob table, so no external broker is needed; several
+app processes can each run a worker since claims are atomic, and a running
+job's heartbeat keeps it from being reclaimed while a long chunk is in progress.
+"""
+import logging
+import threading
+from typing import Optional
+
+from sqlmodel import Session
+from app.core.config import get_settings
+from app.services.ingestion_jobs import IngestionJobService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class JobWorker(threading.Thread):
+    def __init__(self, engine, poll_seconds: float = None):
+        super().__init__(name="ingestion-job-worker", daemon=True)
+        self.engine = engine
+        self.poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._stop_event = threading.Event()
+
+    def run_once(self) -> Optional[int]:
+        """Claims and processes one queued job. Returns its id, or None if the queue was empty."""
+        with Session(self.engine) as session:
+            service = IngestionJobService(session)
+            job_id = service.claim_next()
+            if job_id is None:
+                return None
+            try:
+                job, _ = service.process(job_id)
+                logger.info(f"Ingestion job {job_id} completed: {job.processed} processed, {job.error_count} errors")
+            except Exception as e:
+                # process() already marked the job failed
+                logger.error(f"Ingestion job {job_id} failed: {e}")
+            return job_id
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.run_once() is not None:
+                    continue  # Drain the queue before sleeping
+            except Exception as e:
+                logger.error(f"Ingestion job worker error: {e}")
+            self._stop_event.wait(self.poll_seconds)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        self.join(timeout)
@@ -0,0 +1,95 @@
+from sqlmodel import Session, select, func
+from sqlalchemy import and_, tuple_
+from sqlalchemy.orm import selectinload
+from app.db.models import Eligibility, Plan
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from typing import Optional, Tuple
+import base64
+import json
+
+settings = get_settings()
+
+# Largest page a caller may ask for
+MAX_PAGE_SIZE = 500
+
+# Total matches per filter. Counting a large book on every page turn costs more
+# than the page itself, so totals are reused for MEMBERS_COUNT_TTL_SECONDS.
+_count_cache = TTLCache(1000, settings.MEMBERS_COUNT_TTL_SECONDS)
+
+def get_member_count_cache_stats() -> dict:
+    return _count_cache.stats()
+
+def clear_member_count_cache():
+    _count_cache.clear()
+
+def encode_cursor(plan_id: int, member_pk: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([plan_id, member_pk]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        plan_id, member_pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(plan_id), int(member_pk)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def filter_members(statement, employer_id: Optional[int] = None, q: Optional[str] = None, status: Optional[str] = "all"):
+    """Applies the members list filters; the employer is matched in SQL through the plan."""
+    if employer_id:
+        statement = statement.where(Eligibility.plan_id.in_(select(Plan.id).where(Plan.employer_id == employer_id)))
+    if q:
+        # Simple search on name or phone
+        statement = statement.where(
+            (Eligibility.first_name.ilike(f"%{q}%")) |
+            (Eligibility.last_name.ilike(f"%{q}%")) |
+            (Eligibility.phone_number.ilike(f"%{q}%"))
+        )
+    if status == "opted_in":
+        statement = statement.where(Eligibility.opted_in == True)
+    elif status == "opted_out":
+        statement = statement.where(Eligibility.opted_out == True)
+    elif status == "pending":
+        statement = statement.where(and_(Eligibility.opted_in == False, Eligibility.opted_out == False))
+    return statement
+
+def count_members(session: Session, employer_id: Optional[int] = None, q: Optional[str] = None, status: Optional[str] = "all") -> int:
+    key = (employer_id, q or None, status)
+    total = _count_cache.get(key)
+    if total is None:
+        total = session.exec(filter_members(select(func.count(Eligibility.id)), employer_id, q, status)).one()
+        _count_cache.set(key, total)
+    return total
+
+def member_page(
+    session: Session,
+    employer_id: Optional[int] = None,
+    q: Optional[str] = None,
+    status: Optional[str] = "all",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    One page of the members list, ordered by (plan_id, id). The cursor is the
+    last row's key, so each page is an index range read instead of an OFFSET
+    that walks every earlier row. Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(limit or settings.MEMBERS_PAGE_SIZE, MAX_PAGE_SIZE))
+    statement = filter_members(select(Eligibility), employer_id, q, status)
+    if cursor:
+        statement = statement.where(tuple_(Eligibility.plan_id, Eligibility.id) > decode_cursor(cursor))
+    members = session.exec(
+        statement
+        .options(selectinload(Eligibility.plan))
+        .order_by(Eligibility.plan_id, Eligibility.id)
+        .limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        next_cursor = encode_cursor(members[-1].plan_id, members[-1].id)
+    return {
+        "members": members,
+        "next_cursor": next_cursor,
+        "total": count_members(session, employer_id, q, status),
+    }
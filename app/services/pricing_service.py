@@ -1,73 +1,264 @@
-from sqlmodel import Session, select, func
-from app.db.models import EOB, CPTApprovalRule, Facility
-from typing import List, Dict, Optional
+from sqlmodel import Session, select, delete
+from sqlalchemy import exists, tuple_
+from app.db.models import EOB, CPTApprovalRule, Facility, PriceSummary
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from typing import List, Dict, Optional, Iterable, Tuple
+from datetime import datetime
+import copy
+import threading
+import statistics
+
+settings = get_settings()
+
+# Keys per IN (...) batch when refreshing the summary table
+SUMMARY_REFRESH_CHUNK = 500
+
+# Widest savings-tier radius (miles) considered when routing
+MAX_ROUTING_DISTANCE = 25
+# Facilities without coordinates need a zip-to-zip distance lookup each
+MAX_ZIP_DISTANCE_LOOKUPS = 10
+
+# Pricing result cache, keyed by a per-plan price-index version.
+# Bumping a plan's version (EOB ingest) or the global version (facility changes)
+# makes older entries unreachable; they age out through LRU/TTL.
+# Versions are per process, so the TTL bounds staleness across uvicorn workers.
+_price_cache = TTLCache(settings.PRICING_CACHE_MAX_ENTRIES, settings.PRICING_CACHE_TTL_SECONDS)
+_version_lock = threading.Lock()
+_plan_versions: Dict[int, int] = {}
+_global_version = 0
+
+def bump_price_index_version(plan_id: Optional[int] = None):
+    """Invalidate cached pricing for one plan, or for every plan if plan_id is None."""
+    global _global_version
+    with _version_lock:
+        if plan_id is None:
+            _global_version += 1
+        else:
+            _plan_versions[plan_id] = _plan_versions.get(plan_id, 0) + 1
+
+def get_price_index_version(plan_id: int) -> Tuple[int, int]:
+    return (_global_version, _plan_versions.get(plan_id, 0))
+
+def get_pricing_cache_stats() -> dict:
+    return _price_cache.stats()
+
+def clear_pricing_cache():
+    _price_cache.clear()
 
 class PricingService:
     def __init__(self, session: Session):
         self.session = session
 
+    def refresh_price_summary(self, keys: Iterable[Tuple[int, str, str]]) -> int:
+        """
+        Recompute PriceSummary rows for the given (plan_id, cpt_code, npi) keys
+        from the raw EOB table. Called after EOB ingest with only the keys that
+        were touched, so the cost scales with the upload, not the EOB table.
+        Returns the number of summary rows written.
+        """
+        keys = list(set(keys))
+        written = 0
+        for start in range(0, len(keys), SUMMARY_REFRESH_CHUNK):
+            chunk = keys[start:start + SUMMARY_REFRESH_CHUNK]
+            key_filter = tuple_(EOB.plan_id, EOB.cpt_code, EOB.npi).in_(chunk)
+
+            amounts: Dict[Tuple[int, str, str], List[float]] = {}
+            names: Dict[Tuple[int, str, str], str] = {}
+            rows = self.session.exec(
+                select(EOB.plan_id, EOB.cpt_code, EOB.npi, EOB.allowed_amount, EOB.facility_name).where(key_filter)
+            ).all()
+            for plan_id, cpt_code, npi, allowed, facility_name in rows:
+                key = (plan_id, cpt_code, npi)
+                amounts.setdefault(key, []).append(allowed)
+                if facility_name and key not in names:
+                    names[key] = facility_name
+
+            # Existing rows are updated in place (new keys inserted, keys without
+            # EOBs left deleted), so a summary row keeps its identity across refreshes
+            existing = {
+                (summary.plan_id, summary.cpt_code, summary.npi): summary
+                for summary in self.session.exec(
+                    select(PriceSummary).where(
+                        tuple_(PriceSummary.plan_id, PriceSummary.cpt_code, PriceSummary.npi).in_(chunk)
+                    )
+                ).all()
+            }
+            now = datetime.utcnow()
+            for (plan_id, cpt_code, npi), values in amounts.items():
+                summary = existing.pop((plan_id, cpt_code, npi), None)
+                if summary is None:
+                    summary = PriceSummary(plan_id=plan_id, cpt_code=cpt_code, npi=npi,
+                                           min_allowed=0.0, median_allowed=0.0)
+                summary.min_allowed = min(values)
+                summary.median_allowed = statistics.median(values)
+                summary.eob_count = len(values)
+                summary.facility_name = names.get((plan_id, cpt_code, npi))
+                summary.updated_at = now
+                self.session.add(summary)
+                written += 1
+            for summary in existing.values():
+                self.session.delete(summary)
+
+        self.session.commit()
+        for plan_id in {key[0] for key in keys}:
+            bump_price_index_version(plan_id)
+        return written
+
+    def rebuild_price_summary(self, plan_id: Optional[int] = None) -> int:
+        """
+        Full rebuild of PriceSummary (optionally for one plan).
+        Used for backfills; regular ingest should use refresh_price_summary.
+        """
+        statement = select(EOB.plan_id, EOB.cpt_code, EOB.npi).distinct()
+        if plan_id is not None:
+            statement = statement.where(EOB.plan_id == plan_id)
+        keys = self.session.exec(statement).all()
+
+        # Drop summary rows whose EOBs no longer exist; the rest are refreshed in place
+        stale = delete(PriceSummary).where(~exists().where(
+            EOB.plan_id == PriceSummary.plan_id, EOB.cpt_code == PriceSummary.cpt_code, EOB.npi == PriceSummary.npi
+        ))
+        if plan_id is not None:
+            stale = stale.where(PriceSummary.plan_id == plan_id)
+        self.session.exec(stale)
+
+        written = self.refresh_price_summary([tuple(k) for k in keys])
+        bump_price_index_version(plan_id)
+        return written
+
     def find_cheapest_facilities(self, plan_id: int, cpt_codes: List[str], member_zip: str = None) -> List[Dict]:
         """
         Finds the cheapest facilities for the given CPT codes under the plan.
-        Returns a list of facilities with pricing info.
+        Returns a list of facilities with pricing info. With more than one
+        CPT code, "price" is the bundle total (see _find_cheapest_bundle).
+        Results are served from the pricing cache while the plan's price index is unchanged.
         """
         if not cpt_codes:
             return []
 
-        # For MVP, we'll focus on the primary CPT (first one) or iterate.
-        # Let's aggregate results.
-        
-        # 1. Get approved NPIs for this plan and CPTs
-        # We need to find NPIs that are approved for AT LEAST ONE of the CPTs?
-        # Or usually, we route based on the main procedure.
-        # Let's assume the first CPT is the primary one for routing.
+        key = (plan_id, get_price_index_version(plan_id), tuple(cpt_codes), member_zip)
+        cached = _price_cache.get(key)
+        if cached is None:
+            cached = self._find_cheapest_facilities(plan_id, cpt_codes, member_zip)
+            _price_cache.set(key, cached)
+        # Callers may annotate the matches, including bundle line_items / missing_cpts; hand out deep copies
+        return copy.deepcopy(cached)
+
+    def _find_cheapest_facilities(self, plan_id: int, cpt_codes: List[str], member_zip: str = None) -> List[Dict]:
+        # Multi-code referrals (e.g. 80050+80053+85025) are priced as a bundle
+        if len(set(cpt_codes)) > 1:
+            return self._find_cheapest_bundle(plan_id, cpt_codes, member_zip)
+
         primary_cpt = cpt_codes[0]
         
-        # 2. Query EOBs for this plan and CPT
-        # We want the lowest allowed_amount per NPI
+        # Read the precomputed lowest allowed_amount per NPI
+        # (maintained from EOBs by refresh_price_summary), joined with the
+        # Facility row and the EOB fallback name so enrichment is one query
         statement = (
-            select(EOB.npi, func.min(EOB.allowed_amount).label("min_price"))
-            .where(EOB.plan_id == plan_id)
-            .where(EOB.cpt_code == primary_cpt)
-            .group_by(EOB.npi)
-            .order_by(func.min(EOB.allowed_amount))
+            select(PriceSummary.npi, PriceSummary.min_allowed, PriceSummary.facility_name, Facility)
+            .outerjoin(Facility, Facility.npi == PriceSummary.npi)
+            .where(PriceSummary.plan_id == plan_id)
+            .where(PriceSummary.cpt_code == primary_cpt)
+            .order_by(PriceSummary.min_allowed)
         )
         
         results = self.session.exec(statement).all()
         
-        if not results:
+        candidates = [
+            {"npi": npi, "price": price, "eob_name": eob_name, "facility": facility}
+            for npi, price, eob_name, facility in results
+        ]
+        return self._select_nearby(candidates, member_zip)
+
+    def _find_cheapest_bundle(self, plan_id: int, cpt_codes: List[str], member_zip: str = None) -> List[Dict]:
+        """
+        Prices every requested CPT at each facility in one query and ranks
+        facilities by bundle total. Facilities that cover the whole bundle
+        win; if none do, the best-covered facilities are ranked instead.
+        Each match reports its per-CPT line items and missing_cpts.
+        """
+        codes = list(dict.fromkeys(cpt_codes))
+        statement = (
+            select(PriceSummary.npi, PriceSummary.cpt_code, PriceSummary.min_allowed, PriceSummary.facility_name, Facility)
+            .outerjoin(Facility, Facility.npi == PriceSummary.npi)
+            .where(PriceSummary.plan_id == plan_id)
+            .where(PriceSummary.cpt_code.in_(codes))
+        )
+        
+        bundles: Dict[str, Dict] = {}
+        for npi, cpt_code, price, eob_name, facility in self.session.exec(statement).all():
+            bundle = bundles.setdefault(npi, {
+                "npi": npi, "price": 0.0, "eob_name": eob_name, "facility": facility, "line_items": {}
+            })
+            bundle["line_items"][cpt_code] = price
+            bundle["price"] += price
+            bundle["eob_name"] = bundle["eob_name"] or eob_name
+        
+        if not bundles:
             return []
-            
-        # 3. Logic: Cheapest + within 10%
-        cheapest_price = results[0][1]
-        threshold = cheapest_price * 1.10
         
-        eligible_npis = []
-        for npi, price in results:
-            if price <= threshold:
-                eligible_npis.append({"npi": npi, "price": price})
+        for bundle in bundles.values():
+            bundle["missing_cpts"] = [code for code in codes if code not in bundle["line_items"]]
+        
+        # Only compare totals between facilities with the same coverage
+        best_gap = min(len(b["missing_cpts"]) for b in bundles.values())
+        candidates = sorted(
+            (b for b in bundles.values() if len(b["missing_cpts"]) == best_gap),
+            key=lambda b: b["price"]
+        )
+        return self._select_nearby(candidates, member_zip, extra_keys=("line_items", "missing_cpts"))
+
+    def _select_nearby(self, candidates: List[Dict], member_zip: str = None, extra_keys: Tuple[str, ...] = ()) -> List[Dict]:
+        """
+        Walks candidates (sorted by price) and keeps those within a
+        savings-dependent distance of the member and within 10% of the
+        cheapest reachable one. Returns the top 3.
+        Distances come from the facility spatial index in one radius query;
+        facilities without coordinates fall back to zip-to-zip distance.
+        """
+        if not candidates:
+            return []
         
-        # 4. Enrich with Facility details and apply geo-filtering
-        from app.services.geo_service import calculate_distance
+        from app.services.geo_service import calculate_distance, get_coordinates
+        from app.services.facility_index import get_facility_index
+        
+        index = None
+        nearby: Dict[str, float] = {}
+        if member_zip:
+            origin = get_coordinates(member_zip)
+            if origin:
+                index = get_facility_index(self.session)
+                nearby = index.within(origin[0], origin[1], MAX_ROUTING_DISTANCE)
+        
+        # Savings are measured against the most expensive option
+        max_price = candidates[-1]["price"] if len(candidates) > 1 else None
         
         final_results = []
-        for item in eligible_npis[:10]: # Get more candidates for geo-filtering
-            facility = self.session.exec(
-                select(Facility).where(Facility.npi == item["npi"])
-            ).first()
+        threshold = None
+        zip_lookups = 0
+        for item in candidates:
+            # Logic: Cheapest reachable + within 10%
+            if threshold is not None and item["price"] > threshold:
+                break
+            facility = item["facility"]
             
             if facility:
                 # Calculate distance if member zip is provided
                 distance = 0.0
                 if member_zip and facility.zip_code:
-                    distance = calculate_distance(member_zip, facility.zip_code)
+                    if index is not None and facility.npi in index:
+                        distance = nearby.get(facility.npi)
+                        if distance is None:
+                            continue  # Beyond every routing radius
+                    else:
+                        # Not indexed: bound the slow per-zip lookups
+                        if zip_lookups >= MAX_ZIP_DISTANCE_LOOKUPS:
+                            continue
+                        zip_lookups += 1
+                        distance = calculate_distance(member_zip, facility.zip_code)
                 
-                # Calculate potential savings (compared to most expensive option)
-                if results:
-                    max_price = results[-1][1] if len(results) > 1 else item["price"] * 2
-                    savings = max_price - item["price"]
-                else:
-                    savings = 0
+                savings = (max_price if max_price is not None else item["price"] * 2) - item["price"]
                 
                 # Determine max acceptable distance based on savings
                 # Default: 10 miles
@@ -85,27 +276,28 @@ class PricingService:
                     if distance > max_distance:
                         continue  # Skip this facility, too far
                 
-                final_results.append({
+                match = {
                     "name": facility.facility_name,
                     "address": f"{facility.address}, {facility.city}, {facility.state}",
                     "price": item["price"],
                     "distance": distance,
                     "zip_code": facility.zip_code
-                })
+                }
             else:
                 # Fallback if facility details missing but we have NPI/Price from EOB
-                eob_name = self.session.exec(
-                    select(EOB.facility_name)
-                    .where(EOB.npi == item["npi"])
-                    .limit(1)
-                ).first()
-                final_results.append({
-                    "name": eob_name or "Unknown Facility",
+                match = {
+                    "name": item["eob_name"] or "Unknown Facility",
                     "address": "Address not on file",
                     "price": item["price"],
                     "distance": 999,  # Unknown
                     "zip_code": None
-                })
+                }
+            
+            if threshold is None:
+                threshold = item["price"] * 1.10
+            for extra in extra_keys:
+                match[extra] = item[extra]
+            final_results.append(match)
             
             # Limit to top 3 after filtering
             if len(final_results) >= 3:
@@ -1,6 +1,14 @@
 from sqlmodel import Session, select
-from app.db.models import Eligibility, Accumulator, ReferralEvent, Facility, MemberInteraction
-from datetime import datetime
+from app.db.models import Eligibility, Accumulator, ReferralEvent, Facility, MemberInteraction, Plan, OptOut
+from app.core.utils import normalize_phone_number
+from datetime import datetime, date
+from typing import Iterable, List
+
+# Max ids per IN (...) when prefetching batch context
+BATCH_PREFETCH_CHUNK = 1000
+
+# Sentinel: accumulator not prefetched, look it up
+_UNSET = object()
 
 class RoutingEngine:
     def __init__(self, session: Session):
@@ -8,16 +16,89 @@ class RoutingEngine:
         # Common Routine Labs CPTs (Demo Requirement)
         self.ROUTINE_LABS = ["80050", "80053", "85025", "80061", "80048"]
 
+    def latest_accumulator(self, member_id: int):
+        return self.session.exec(
+            select(Accumulator)
+            .where(Accumulator.member_id == member_id)
+            .order_by(Accumulator.timestamp.desc())
+        ).first()
+
+    def load_batch_context(self, member_ids: Iterable[int]) -> dict:
+        """
+        Prefetch everything routing needs for a batch of members in a fixed
+        number of queries per chunk: members, their plans, their latest
+        accumulator and whether their phone is on the OptOut list.
+        """
+        member_ids = list(dict.fromkeys(member_ids))
+        context = {"members": {}, "plans": {}, "accumulators": {}, "opted_out_phones": set()}
+        
+        for start in range(0, len(member_ids), BATCH_PREFETCH_CHUNK):
+            chunk = member_ids[start:start + BATCH_PREFETCH_CHUNK]
+            members = self.session.exec(select(Eligibility).where(Eligibility.id.in_(chunk))).all()
+            context["members"].update({m.id: m for m in members})
+            
+            # Oldest first, so the last one seen per member is the latest
+            for acc in self.session.exec(
+                select(Accumulator)
+                .where(Accumulator.member_id.in_(chunk))
+                .order_by(Accumulator.timestamp.asc(), Accumulator.id.asc())
+            ).all():
+                context["accumulators"][acc.member_id] = acc
+            
+            phones = {normalize_phone_number(m.phone_number) for m in members}
+            if phones:
+                context["opted_out_phones"].update(
+                    self.session.exec(select(OptOut.phone_number).where(OptOut.phone_number.in_(phones))).all()
+                )
+        
+        plan_ids = list({m.plan_id for m in context["members"].values()})
+        for start in range(0, len(plan_ids), BATCH_PREFETCH_CHUNK):
+            chunk = plan_ids[start:start + BATCH_PREFETCH_CHUNK]
+            context["plans"].update({p.id: p for p in self.session.exec(select(Plan).where(Plan.id.in_(chunk))).all()})
+        
+        return context
+
+    def evaluate_batch(self, referrals: List[ReferralEvent], context: dict = None) -> List[dict]:
+        """
+        Evaluate many referrals with prefetched member context instead of
+        querying per referral. Returns one decision per referral, in order:
+        the evaluate_referral result plus member, plan, accumulator and opted_out.
+        """
+        if context is None:
+            context = self.load_batch_context(r.member_id for r in referrals)
+        
+        decisions = []
+        for referral in referrals:
+            member = context["members"].get(referral.member_id)
+            if member is None:
+                decisions.append({"engage": False, "reason": "Member not found", "member": None,
+                                  "plan": None, "accumulator": None, "opted_out": False})
+                continue
+            accumulator = context["accumulators"].get(member.id)
+            decision = self._evaluate(member, referral.cpt_code, accumulator)
+            decision.update({
+                "member": member,
+                "plan": context["plans"].get(member.plan_id),
+                "accumulator": accumulator,
+                "opted_out": member.opted_out or normalize_phone_number(member.phone_number) in context["opted_out_phones"],
+            })
+            decisions.append(decision)
+        return decisions
+
     def evaluate_referral(self, referral: ReferralEvent) -> dict:
         """
         Evaluate a referral event to determine if we should engage the member.
         Returns dict with 'engage' (bool) and 'reason' (str).
         """
         member = referral.member
-        cpt_code = referral.cpt_code
-        
-        # 1. Get Accumulators
-        accumulator = self.session.exec(select(Accumulator).where(Accumulator.member_id == member.id)).first()
+        return self._evaluate(member, referral.cpt_code, self.latest_accumulator(member.id))
+
+    def _evaluate(self, member: Eligibility, cpt_code: str, accumulator) -> dict:
+        # 0. Members whose coverage has ended are never engaged
+        if member.termination_date and member.termination_date <= date.today():
+            return {"engage": False, "reason": f"Coverage terminated {member.termination_date}"}
+
+        # 1. Deductible position from the member's accumulator
         if not accumulator:
             # Default to 0 met if no record
             deductible_remaining = 3000.0 
@@ -74,9 +155,10 @@ class RoutingEngine:
 
         return {"engage": engage, "reason": reason}
     
-    def calculate_financial_viability(self, member, cpt_code: str, matches: list) -> dict:
+    def calculate_financial_viability(self, member, cpt_code: str, matches: list, accumulator=_UNSET) -> dict:
         """
         Determine if member can achieve $0 out-of-pocket cost.
+        Pass a prefetched accumulator (or None) to skip the lookup.
         
         Returns:
         {
@@ -85,10 +167,9 @@ class RoutingEngine:
             "reasoning": str
         }
         """
-        from app.db.models import Accumulator
-        
         # Get accumulator
-        accumulator = self.session.exec(select(Accumulator).where(Accumulator.member_id == member.id)).first()
+        if accumulator is _UNSET:
+            accumulator = self.latest_accumulator(member.id)
         
         if not accumulator:
             return {
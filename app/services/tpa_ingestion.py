@@ -1,7 +1,48 @@
 from sqlmodel import Session, select
-from app.db.models import Eligibility, Accumulator, Claim, ReferralEvent, Plan, Employer, MemberInteraction
+from sqlalchemy import insert, update
+from app.db.models import Eligibility, Accumulator, Claim, ReferralEvent, Plan, Employer, MemberInteraction, Facility
 from datetime import datetime, date
-from app.core.utils import normalize_phone_number
+from app.core.utils import normalize_phone_number, parse_date
+from app.core.config import get_settings
+from app.core.uploads import MAX_REPORTED_ERRORS
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+import hashlib
+import time
+import zlib
+
+settings = get_settings()
+
+# Rows per prefetch/executemany batch for bulk eligibility ingest
+ELIGIBILITY_CHUNK = 1000
+
+_UNSET = object()
+
+# 834 maintenance type code for a cancellation / termination
+MAINTENANCE_TERMINATION = "024"
+
+def supports_parallel_writes(bind) -> bool:
+    """SQLite allows one writer at a time; concurrent worker commits fail with "database is locked"."""
+    return bind.dialect.name != "sqlite"
+
+def _member_id(row: dict) -> str:
+    """The row's member_id; a row without one is rejected rather than failing its chunk's insert."""
+    member_id = row["member_id"]
+    if member_id is None or not str(member_id).strip():
+        name = f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip()
+        raise ValueError(f"missing member_id for {name}" if name else "missing member_id")
+    return member_id
+
+def _reject(results: dict, message: str):
+    """Counts a rejected row; only the first MAX_REPORTED_ERRORS messages are kept."""
+    results["rejected"] += 1
+    if len(results["errors"]) < MAX_REPORTED_ERRORS:
+        results["errors"].append(message)
+
+def eligibility_row_hash(values: dict) -> str:
+    """Hash of the roster fields a full eligibility file controls for one member."""
+    fields = ("first_name", "last_name", "date_of_birth", "phone_number", "zip_code", "plan_id", "risk_tier", "termination_date")
+    return hashlib.sha256("|".join(str(values.get(f) or "") for f in fields).encode()).hexdigest()
 
 class TPAIngestionService:
     def __init__(self, session: Session):
@@ -11,47 +52,99 @@ class TPAIngestionService:
         """
         Ingest eligibility data (834-like).
         Expected format: list of dicts with member details.
+        Existing members are prefetched by member_id in chunks; new members are
+        inserted and existing ones updated in one executemany each per chunk.
+        See sync_eligibility for full files that should also terminate missing members.
         """
-        results = {"processed": 0, "errors": []}
-        for row in data:
-            try:
-                # Find or create member
-                member = self.session.exec(select(Eligibility).where(Eligibility.member_id == row["member_id"])).first()
-                if not member:
-                    # Assume plan_id is provided or lookup by plan_name/group_id
-                    # For MVP, assuming plan_id is passed or we default to a known plan
-                    plan_id = row.get("plan_id")
-                    if not plan_id:
-                        # Fallback to first plan for demo simplicity if not provided
-                        plan = self.session.exec(select(Plan)).first()
-                        plan_id = plan.id if plan else None
-                    
-                    member = Eligibility(
-                        member_id=row["member_id"],
-                        first_name=row["first_name"],
-                        last_name=row["last_name"],
-                        date_of_birth=datetime.strptime(row["date_of_birth"], "%Y-%m-%d").date(),
-                        phone_number=normalize_phone_number(row["phone_number"]),
-                        plan_id=plan_id,
-                        risk_tier=row.get("risk_tier", "Low")
+        results = {"processed": 0, "inserted": 0, "updated": 0, "rejected": 0, "errors": [], "rows_per_sec": 0.0}
+        started = time.perf_counter()
+        default_plan_id = _UNSET
+
+        for start in range(0, len(data), ELIGIBILITY_CHUNK):
+            chunk = data[start:start + ELIGIBILITY_CHUNK]
+            member_ids = list({row.get("member_id") for row in chunk if row.get("member_id")})
+            existing = {}
+            if member_ids:
+                for member_id, id_, first_name, last_name, phone_number, zip_code, risk_tier in self.session.exec(
+                    select(
+                        Eligibility.member_id, Eligibility.id, Eligibility.first_name, Eligibility.last_name,
+                        Eligibility.phone_number, Eligibility.zip_code, Eligibility.risk_tier
                     )
-                    self.session.add(member)
-                else:
-                    # Update fields
-                    member.first_name = row.get("first_name", member.first_name)
-                    member.last_name = row.get("last_name", member.last_name)
-                    member.phone_number = row.get("phone_number", member.phone_number)
-                    if "risk_tier" in row:
-                        member.risk_tier = row["risk_tier"]
-                    self.session.add(member)
-                
-                results["processed"] += 1
-            except Exception as e:
-                results["errors"].append(f"Error processing {row.get('member_id')}: {str(e)}")
-        
+                    .where(Eligibility.member_id.in_(member_ids))
+                    .order_by(Eligibility.id)
+                ).all():
+                    existing.setdefault(member_id, {
+                        "id": id_, "first_name": first_name, "last_name": last_name,
+                        "phone_number": phone_number, "zip_code": zip_code, "risk_tier": risk_tier
+                    })
+
+            # Later rows for the same member update earlier ones, as row-by-row ingest did
+            inserts, updates = {}, {}
+            for row in chunk:
+                try:
+                    member_id = _member_id(row)
+                    if member_id in existing or member_id in updates:
+                        values = updates.setdefault(member_id, dict(existing.get(member_id, {}), row_hash=None))
+                        self._apply_member_update(values, row)
+                    elif member_id in inserts:
+                        self._apply_member_update(inserts[member_id], row)
+                    else:
+                        # Assume plan_id is provided or lookup by plan_name/group_id
+                        plan_id = row.get("plan_id")
+                        if not plan_id:
+                            # Fallback to first plan for demo simplicity if not provided
+                            if default_plan_id is _UNSET:
+                                plan = self.session.exec(select(Plan)).first()
+                                default_plan_id = plan.id if plan else None
+                            plan_id = default_plan_id
+
+                        inserts[member_id] = {
+                            "member_id": member_id,
+                            "first_name": row["first_name"],
+                            "last_name": row["last_name"],
+                            "date_of_birth": parse_date(row["date_of_birth"]),
+                            "phone_number": normalize_phone_number(row["phone_number"]),
+                            "zip_code": row.get("zip_code") or None,
+                            "plan_id": plan_id,
+                            "risk_tier": row.get("risk_tier") or "Low",
+                        }
+                    results["processed"] += 1
+                except Exception as e:
+                    _reject(results, f"Error processing {row.get('member_id')}: {str(e)}")
+
+            if inserts:
+                self.session.exec(insert(Eligibility), params=list(inserts.values()))
+            if updates:
+                self.session.exec(update(Eligibility), params=list(updates.values()))
+            results["inserted"] += len(inserts)
+            results["updated"] += len(updates)
+
         self.session.commit()
+        elapsed = time.perf_counter() - started
+        results["rows_per_sec"] = round(len(data) / elapsed, 1) if elapsed > 0 else 0.0
         return results
 
+    @staticmethod
+    def _apply_member_update(values: dict, row: dict):
+        # Update fields
+        for field in ("first_name", "last_name", "zip_code"):
+            if row.get(field):
+                values[field] = row[field]
+        if row.get("phone_number"):
+            values["phone_number"] = normalize_phone_number(row["phone_number"])
+        if row.get("risk_tier"):
+            values["risk_tier"] = row["risk_tier"]
+
+    def sync_eligibility(self, data: list[dict]):
+        """
+        Apply a complete eligibility file as a delta: only new and changed
+        members are written, and active members of the file's plans that are
+        missing from it are terminated. See EligibilityRosterSync.
+        """
+        from app.core.uploads import merge_results
+        sync = EligibilityRosterSync(self.session)
+        return merge_results(sync(data), sync.finish())
+
     def ingest_accumulators(self, data: list[dict]):
         """
         Ingest accumulator snapshots.
@@ -86,28 +179,97 @@ class TPAIngestionService:
     def ingest_claims(self, data: list[dict]):
         """
         Ingest historical claims.
+        Rows are bulk loaded (COPY on Postgres) rather than added one ORM object at a time;
+        claims already on file (same member, date, CPT, NPI, amount) are skipped.
         """
-        results = {"processed": 0, "errors": []}
+        from app.services.bulk_loader import BulkLoader
+        
+        summary = BulkLoader(self.session).load_claims(data)
+        return {"processed": summary["loaded"], "rejected": summary["rejected"],
+                "duplicates": summary["duplicates"], "errors": summary["errors"]}
+
+    def ingest_facilities(self, data: list[dict]):
+        """
+        Ingest facility directory rows (upsert by NPI).
+        Coordinates are resolved from the zip once here and stored, so pricing
+        never geocodes facilities on the request path.
+        """
+        from app.services.geo_service import geocode_facility
+        results = {"processed": 0, "geocoded": 0, "errors": []}
+        
+        npis = [row.get("npi") for row in data if row.get("npi")]
+        existing = {
+            f.npi: f for f in self.session.exec(select(Facility).where(Facility.npi.in_(npis))).all()
+        } if npis else {}
+        
         for row in data:
             try:
-                member = self.session.exec(select(Eligibility).where(Eligibility.member_id == row["member_id"])).first()
-                if not member:
-                    results["errors"].append(f"Member not found: {row.get('member_id')}")
-                    continue
-
-                claim = Claim(
-                    member_id=member.id,
-                    date_of_service=datetime.strptime(row["date_of_service"], "%Y-%m-%d").date(),
-                    cpt_code=row["cpt_code"],
-                    diagnosis_code=row.get("diagnosis_code"),
-                    allowed_amount=float(row["allowed_amount"]),
-                    provider_npi=row.get("provider_npi")
-                )
-                self.session.add(claim)
+                facility = existing.get(row["npi"])
+                if not facility:
+                    facility = Facility(npi=row["npi"], facility_name=row["facility_name"])
+                    existing[facility.npi] = facility
+                
+                moved = "zip_code" in row and row["zip_code"] != facility.zip_code
+                for field in ["facility_name", "address", "city", "state", "zip_code"]:
+                    if row.get(field) is not None:
+                        setattr(facility, field, row[field])
+                
+                if row.get("latitude") not in (None, "") and row.get("longitude") not in (None, ""):
+                    facility.latitude = float(row["latitude"])
+                    facility.longitude = float(row["longitude"])
+                elif moved:
+                    # New address: drop stale coordinates so they are re-resolved
+                    facility.latitude = None
+                    facility.longitude = None
+                
+                if geocode_facility(facility):
+                    results["geocoded"] += 1
+                
+                self.session.add(facility)
                 results["processed"] += 1
             except Exception as e:
-                results["errors"].append(f"Error processing claim for {row.get('member_id')}: {str(e)}")
+                results["errors"].append(f"Error processing facility {row.get('npi')}: {str(e)}")
+        
+        self.session.commit()
+        
+        # Facility changes affect every plan's routing
+        from app.services.pricing_service import bump_price_index_version
+        from app.services.facility_index import invalidate_facility_index
+        bump_price_index_version()
+        invalidate_facility_index()
+        return results
+
+    def ingest_referrals_parallel(self, data: list[dict], workers: int = None):
+        """
+        ingest_referrals across a thread pool (REFERRAL_WORKERS), one Session per worker.
+        Rows are partitioned by member_id, so each member's referrals are
+        handled by a single worker in their original order.
+        Workers commit independently, so if one fails the others' referrals
+        (and texts) stand; rows carrying a source_key (job chunks) are skipped
+        when the chunk is retried. Runs serially on SQLite.
+        """
+        from app.core.uploads import merge_results
+        
+        workers = workers or settings.REFERRAL_WORKERS
+        if workers <= 1 or len(data) < 2 or not supports_parallel_writes(self.session.get_bind()):
+            return self.ingest_referrals(data)
+        
+        partitions = [[] for _ in range(workers)]
+        for row in data:
+            member_key = str(row.get("member_id")).encode()
+            partitions[zlib.crc32(member_key) % workers].append(row)
+        
+        bind = self.session.get_bind()
+        def run(rows):
+            with Session(bind) as session:
+                return TPAIngestionService(session).ingest_referrals(rows)
+        
+        results = {"processed": 0, "errors": []}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="referral-ingest") as pool:
+            for result in pool.map(run, [rows for rows in partitions if rows]):
+                merge_results(results, result)
         
+        # Commit the caller's pending state (e.g. a job checkpoint) after the workers' rows
         self.session.commit()
         return results
 
@@ -115,37 +277,69 @@ class TPAIngestionService:
         """
         Ingest referral/ordering events.
         Triggers routing logic immediately.
+        Members, baseline prices, accumulators and opt-outs are prefetched for
+        the whole batch. Referrals are committed together, and only then are the
+        texts sent: a failure can lose a text but a retry never repeats one.
+        Rows with a source_key already stored are skipped (counted as duplicates).
         """
-        results = {"processed": 0, "errors": []}
+        results = {"processed": 0, "duplicates": 0, "errors": []}
         # Import here to avoid circular dependency if routing engine imports this
-        from app.services.routing_engine import RoutingEngine 
+        from app.services.routing_engine import RoutingEngine, BATCH_PREFETCH_CHUNK
+        from app.db.models import EOB
+        from sqlalchemy import tuple_
         
         routing_engine = RoutingEngine(self.session)
 
+        # 1. Resolve members for the whole file
+        members_by_id = {}
+        member_ids = list({row.get("member_id") for row in data if row.get("member_id")})
+        for start in range(0, len(member_ids), BATCH_PREFETCH_CHUNK):
+            chunk = member_ids[start:start + BATCH_PREFETCH_CHUNK]
+            for member in self.session.exec(
+                select(Eligibility).where(Eligibility.member_id.in_(chunk)).order_by(Eligibility.id)
+            ).all():
+                members_by_id.setdefault(member.member_id, member)
+
+        # Rows an earlier attempt at the same job chunk already committed
+        source_keys = [row["source_key"] for row in data if row.get("source_key")]
+        done_keys = set()
+        for start in range(0, len(source_keys), BATCH_PREFETCH_CHUNK):
+            done_keys.update(self.session.exec(
+                select(ReferralEvent.source_key)
+                .where(ReferralEvent.source_key.in_(source_keys[start:start + BATCH_PREFETCH_CHUNK]))
+            ).all())
+
+        # 2. Baseline prices (What would have happened), first EOB per (npi, cpt, plan)
+        baseline_keys = list({
+            (row["provider_npi"], row.get("cpt_code"), members_by_id[row["member_id"]].plan_id)
+            for row in data
+            if row.get("provider_npi") and row.get("member_id") in members_by_id
+        })
+        baseline_prices = {}
+        for start in range(0, len(baseline_keys), BATCH_PREFETCH_CHUNK):
+            chunk = baseline_keys[start:start + BATCH_PREFETCH_CHUNK]
+            for npi, cpt_code, plan_id, allowed in self.session.exec(
+                select(EOB.npi, EOB.cpt_code, EOB.plan_id, EOB.allowed_amount)
+                .where(tuple_(EOB.npi, EOB.cpt_code, EOB.plan_id).in_(chunk))
+                .order_by(EOB.id)
+            ).all():
+                baseline_prices.setdefault((npi, cpt_code, plan_id), allowed)
+
+        # 3. Create Referral Events, flushed together to get IDs
+        pending = []
         for row in data:
             try:
-                member = self.session.exec(select(Eligibility).where(Eligibility.member_id == row["member_id"])).first()
+                if row.get("source_key") in done_keys:
+                    results["duplicates"] += 1
+                    continue
+                member = members_by_id.get(row.get("member_id"))
                 if not member:
                     results["errors"].append(f"Member not found: {row.get('member_id')}")
                     continue
 
-                # Calculate Baseline (What would have happened)
                 baseline_npi = row.get("provider_npi")
-                baseline_allowed = 0.0
-                
-                if baseline_npi:
-                    # Look up price for this NPI and CPT
-                    from app.db.models import EOB
-                    eob = self.session.exec(
-                        select(EOB)
-                        .where(EOB.npi == baseline_npi)
-                        .where(EOB.cpt_code == row["cpt_code"])
-                        .where(EOB.plan_id == member.plan_id)
-                    ).first()
-                    if eob:
-                        baseline_allowed = eob.allowed_amount
-
-                # Create Referral Event
+                baseline_allowed = baseline_prices.get((baseline_npi, row["cpt_code"], member.plan_id), 0.0) if baseline_npi else 0.0
+
                 referral = ReferralEvent(
                     member_id=member.id,
                     cpt_code=row["cpt_code"],
@@ -154,28 +348,44 @@ class TPAIngestionService:
                     baseline_allowed=baseline_allowed,
                     plan_cost_baseline=baseline_allowed, # Assuming 0 member share for now or calc later
                     timestamp=datetime.utcnow(),
-                    status="received"
+                    status="received",
+                    source_key=row.get("source_key")
                 )
                 self.session.add(referral)
-                self.session.commit() # Commit to get ID
-                self.session.refresh(referral)
+                pending.append((row, member, referral))
+            except Exception as e:
+                results["errors"].append(f"Error processing referral for {row.get('member_id')}: {str(e)}")
+        self.session.flush()
+
+        # 4. Route every referral against the prefetched member context
+        decisions = routing_engine.evaluate_batch([referral for _, _, referral in pending])
+
+        from app.services.pricing_service import PricingService
+        pricing = PricingService(self.session)
+
+        today = date.today()
+        outbox = []  # (member, message, media url), sent once the referrals are committed
+        for (row, member, referral), routing_result in zip(pending, decisions):
+            try:
+                if member.termination_date and member.termination_date <= today:
+                    # Coverage has ended: never engaged, whatever the $0 viability below would say
+                    referral.status = "suppressed"
+                    self.session.add(MemberInteraction(
+                        member_id=member.id,
+                        message_type="suppressed",
+                        content=f"Referral {row['cpt_code']} suppressed (Coverage terminated {member.termination_date}) - No SMS Sent"
+                    ))
+                    self.session.add(referral)
+                    results["processed"] += 1
+                    continue
 
-                # Trigger Routing Logic
-                routing_result = routing_engine.evaluate_referral(referral)
-                
                 # Calculate financial viability (Real Check)
-                from app.services.pricing_service import PricingService
-                pricing = PricingService(self.session)
                 matches = pricing.find_cheapest_facilities(member.plan_id, [row["cpt_code"]], member_zip=member.zip_code)
                 
-                accumulator = self.session.exec(select(Accumulator).where(Accumulator.member_id == member.id)).first()
-                # Calculate deductible remaining
-                deductible_remaining = 3000.0 # Default
-                if accumulator:
-                    deductible_remaining = max(0, accumulator.deductible_limit - accumulator.deductible_met)
-                
                 # Check viability
-                viability = routing_engine.calculate_financial_viability(member, row["cpt_code"], matches)
+                viability = routing_engine.calculate_financial_viability(
+                    member, row["cpt_code"], matches, accumulator=routing_result["accumulator"]
+                )
                 viable_for_zero = viability["viable_for_zero"]
                 
                 # Proactive Rules Logic
@@ -197,7 +407,6 @@ class TPAIngestionService:
                     referral.status = "engaged"
                     
                     # SMS Decision Tree Implementation
-                    from app.services.twilio_service import TwilioService
                     from app.services.cpt_service import CPTService
                     from app.services.referral_image_service import ReferralImageService
                     
@@ -205,7 +414,8 @@ class TPAIngestionService:
                     image_service = ReferralImageService()
                     
                     # Get member's plan name
-                    plan_name = member.plan.name if member.plan else "your health plan"
+                    plan = routing_result["plan"]
+                    plan_name = plan.name if plan else "your health plan"
                     member_name = member.first_name
                     
                     # Get friendly service name
@@ -254,31 +464,11 @@ class TPAIngestionService:
                             f"Reply YES to see your $0 options."
                         )
                     
-                    # Send SMS and log if message was generated
+                    # Queue SMS if message was generated
                     if msg:
-                        # Normalize phone number for check
-                        from app.core.utils import normalize_phone_number
-                        normalized_phone = normalize_phone_number(member.phone_number)
-                        
-                        # Explicitly check OptOut here to be safe
-                        from app.db.models import OptOut
-                        opt_out_check = self.session.exec(select(OptOut).where(OptOut.phone_number == normalized_phone)).first()
-                        
-                        if opt_out_check:
-                            # Log blocked SMS
-                            # print(f"BLOCKED proactive SMS to {normalized_phone} due to OptOut record.", flush=True)
-                            sid = None
-                        else:
-                            twilio = TwilioService()
-                            sid = twilio.send_sms(member.phone_number, msg, media_url=full_media_url, session=self.session)
-                        
-                        # Log Interaction only if sent
-                        if sid:
-                            self.session.add(MemberInteraction(
-                                member_id=member.id,
-                                message_type="outbound_referral_trigger",
-                                content=msg + f" [Image: {full_media_url}]"
-                            ))
+                        # Explicitly check OptOut here to be safe (prefetched for the batch)
+                        if not routing_result["opted_out"]:
+                            outbox.append((member, msg, full_media_url))
                     else:
                         # Should not happen given should_engage logic, but safe fallback
                         pass
@@ -297,5 +487,161 @@ class TPAIngestionService:
             except Exception as e:
                 results["errors"].append(f"Error processing referral for {row.get('member_id')}: {str(e)}")
         
+        # Referrals first, then the texts: nothing external happens for a referral
+        # that could still be rolled back and processed again
         self.session.commit()
+
+        if outbox:
+            from app.services.twilio_service import TwilioService
+            twilio = TwilioService()
+            for member, msg, full_media_url in outbox:
+                try:
+                    sid = twilio.send_sms(member.phone_number, msg, media_url=full_media_url, session=self.session)
+                    # Log Interaction only if sent
+                    if sid:
+                        self.session.add(MemberInteraction(
+                            member_id=member.id,
+                            message_type="outbound_referral_trigger",
+                            content=msg + f" [Image: {full_media_url}]"
+                        ))
+                except Exception as e:
+                    results["errors"].append(f"Error sending referral SMS to {member.member_id}: {str(e)}")
+            self.session.commit()
+        return results
+
+class EligibilityRosterSync:
+    """
+    Applies a full eligibility file (e.g. a nightly 834) chunk by chunk as a
+    delta against the stored roster, so the cost scales with churn rather
+    than roster size:
+      - each row is hashed and compared with the member's stored row_hash;
+        only new and changed members are written (executemany per chunk)
+      - finish() terminates active members of the file's plans that the file
+        no longer lists (UNK- placeholders from inbound SMS are left alone)
+    The member ids seen are kept across chunks; skip() records chunks that an
+    earlier, interrupted run already applied.
+    """
+    def __init__(self, session: Session, as_of: Optional[date] = None):
+        self.session = session
+        self.as_of = as_of or date.today()
+        self.seen: Set[str] = set()
+        self._default_plan_id = _UNSET
+
+    def skip(self, data: list[dict]):
+        self.seen.update(row["member_id"] for row in data if row.get("member_id"))
+
+    def _termination_date(self, row: dict) -> Optional[date]:
+        coverage_end = row.get("coverage_end") or row.get("termination_date")
+        if coverage_end:
+            return parse_date(coverage_end)
+        if row.get("maintenance_type") == MAINTENANCE_TERMINATION:
+            return self.as_of
+        return None
+
+    def _values(self, row: dict, current_plan_id: Optional[int] = None) -> dict:
+        """
+        The roster fields for a row, i.e. everything the row hash covers. A row
+        without a plan keeps the member's current plan (or the default plan for new members).
+        """
+        plan_id = row.get("plan_id") or current_plan_id
+        if not plan_id:
+            if self._default_plan_id is _UNSET:
+                plan = self.session.exec(select(Plan)).first()
+                self._default_plan_id = plan.id if plan else None
+            plan_id = self._default_plan_id
+        return {
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "date_of_birth": parse_date(row["date_of_birth"]),
+            "phone_number": normalize_phone_number(row["phone_number"]),
+            "zip_code": row.get("zip_code") or None,
+            "plan_id": int(plan_id) if plan_id else None,
+            "risk_tier": row.get("risk_tier") or "Low",
+            "termination_date": self._termination_date(row),
+        }
+
+    def __call__(self, data: list[dict]) -> dict:
+        results = {"processed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "errors": []}
+
+        for start in range(0, len(data), ELIGIBILITY_CHUNK):
+            chunk = data[start:start + ELIGIBILITY_CHUNK]
+            member_ids = list({row.get("member_id") for row in chunk if row.get("member_id")})
+            existing = {}
+            if member_ids:
+                for member_id, id_, plan_id, row_hash in self.session.exec(
+                    select(Eligibility.member_id, Eligibility.id, Eligibility.plan_id, Eligibility.row_hash)
+                    .where(Eligibility.member_id.in_(member_ids))
+                    .order_by(Eligibility.id)
+                ).all():
+                    existing.setdefault(member_id, {"id": id_, "plan_id": plan_id, "row_hash": row_hash})
+
+            inserts, updates = {}, {}
+            for row in chunk:
+                try:
+                    member_id = _member_id(row)
+                    current = existing.get(member_id)
+                    values = self._values(row, current["plan_id"] if current else None)
+                    digest = eligibility_row_hash(values)
+                    if current:
+                        if current["row_hash"] == digest:
+                            results["unchanged"] += 1
+                        else:
+                            # Every hashed field is written, so the stored row matches its hash
+                            updates[member_id] = {"id": current["id"], **values, "row_hash": digest}
+                            current.update(plan_id=values["plan_id"], row_hash=digest)
+                    else:
+                        inserts[member_id] = {"member_id": member_id, **values, "row_hash": digest}
+                    self.seen.add(member_id)
+                    results["processed"] += 1
+                except Exception as e:
+                    _reject(results, f"Error processing {row.get('member_id')}: {str(e)}")
+
+            if inserts:
+                self.session.exec(insert(Eligibility), params=list(inserts.values()))
+            if updates:
+                self.session.exec(update(Eligibility), params=list(updates.values()))
+            results["inserted"] += len(inserts)
+            results["updated"] += len(updates)
+
+        self.session.commit()
+        return results
+
+    def finish(self) -> dict:
+        """
+        Terminates (as of self.as_of) the active members of every plan present
+        in the file who were not in it. Refuses, reporting an error, if that
+        would terminate more than ROSTER_MAX_TERMINATION_RATIO of them.
+        """
+        results = {"terminated": 0, "errors": []}
+        seen = list(self.seen)
+        plan_ids = set()
+        for start in range(0, len(seen), ELIGIBILITY_CHUNK):
+            plan_ids.update(self.session.exec(
+                select(Eligibility.plan_id).distinct()
+                .where(Eligibility.member_id.in_(seen[start:start + ELIGIBILITY_CHUNK]))
+            ).all())
+        if not plan_ids:
+            return results
+
+        active = self.session.exec(
+            select(Eligibility.id, Eligibility.member_id)
+            .where(Eligibility.plan_id.in_(plan_ids))
+            .where(Eligibility.termination_date.is_(None))
+            .where(Eligibility.member_id.not_like("UNK-%"))
+        ).all()
+        missing = [id_ for id_, member_id in active if member_id not in self.seen]
+        if len(missing) > settings.ROSTER_MAX_TERMINATION_RATIO * len(active):
+            results["errors"].append(
+                f"Refusing to terminate {len(missing)} of {len(active)} active members; "
+                f"the file looks incomplete"
+            )
+            return results
+
+        if missing:
+            # row_hash is cleared so the member is updated (reinstated) if a later file lists them again
+            self.session.exec(update(Eligibility), params=[
+                {"id": id_, "termination_date": self.as_of, "row_hash": None} for id_ in missing
+            ])
+            self.session.commit()
+        results["terminated"] = len(missing)
         return results
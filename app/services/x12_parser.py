@@ -0,0 +1,261 @@
+"""
+Streaming X12 parser for 834 (benefit enrollment) and 835 (remittance) files.
+Segments are read block by block using the delimiters declared in the ISA
+header, and each transaction set is turned into flat row dicts for the
+existing ingestion paths:
+  834 -> eligibility rows for TPAIngestionService.ingest_eligibility
+  835 -> EOB rows for BulkLoader.load_eobs
+Only one member / claim is held in memory at a time.
+"""
+import codecs
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+# Bytes read per block
+X12_READ_BLOCK = 64 * 1024
+# ISA is fixed width: 106 characters including the segment terminator
+ISA_LENGTH = 106
+
+# PER communication qualifiers treated as a phone number, in preference order
+PHONE_QUALIFIERS = ("CP", "HP", "TE", "WP")
+# CLP02 claim status for a reversal of a previous payment
+CLAIM_REVERSAL = "22"
+
+def _element(segment: List[str], index: int) -> str:
+    return segment[index].strip() if len(segment) > index else ""
+
+def _d8(value: str) -> Optional[str]:
+    """CCYYMMDD -> YYYY-MM-DD"""
+    value = value.strip()
+    if len(value) != 8 or not value.isdigit():
+        return None
+    return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+
+def _amount(value: str) -> float:
+    return float(value) if value.strip() else 0.0
+
+class X12Reader:
+    """
+    Iterates the segments of an X12 interchange as lists of elements.
+    Delimiters come from the ISA header: element separator (ISA position 3),
+    component separator (ISA16) and segment terminator (last ISA character).
+    """
+    def __init__(self, fileobj: BinaryIO, block_size: int = X12_READ_BLOCK):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        text = ""
+        while len(text.lstrip("\ufeff \t\r\n")) < ISA_LENGTH:
+            block = fileobj.read(block_size)
+            if not block:
+                break
+            text += self._decoder.decode(block)
+        self._buffer = text.lstrip("\ufeff \t\r\n")
+        if not self._buffer.startswith("ISA") or len(self._buffer) < ISA_LENGTH:
+            raise ValueError("Not an X12 interchange (missing ISA header)")
+
+        self.element_separator = self._buffer[3]
+        self.component_separator = self._buffer[104]
+        self.segment_terminator = self._buffer[105]
+
+    def __iter__(self) -> Iterator[List[str]]:
+        buf = self._buffer
+        self._buffer = ""
+        while True:
+            *complete, buf = buf.split(self.segment_terminator)
+            for segment in complete:
+                segment = segment.strip("\r\n")
+                if segment:
+                    yield segment.split(self.element_separator)
+            block = self.fileobj.read(self.block_size)
+            if not block:
+                break
+            buf += self._decoder.decode(block)
+        buf = (buf + self._decoder.decode(b"", final=True)).strip("\r\n")
+        if buf:
+            yield buf.split(self.element_separator)
+
+def _transaction(segments: Iterator[List[str]]) -> Iterator[List[str]]:
+    """Yields the segments of one transaction set, up to and including SE."""
+    for segment in segments:
+        yield segment
+        if segment[0] == "SE":
+            return
+
+def iter_834_members(segments: Iterable[List[str]], component_separator: str = ":") -> Iterator[dict]:
+    """
+    Yields one eligibility row per INS (member) loop:
+    member_id, first_name, last_name, date_of_birth, phone_number, zip_code,
+    plus subscriber_id, maintenance_type (INS03, e.g. 021 add, 024 cancel)
+    and coverage_start / coverage_end (DTP 348 / 349).
+    member_id is the member's own identifier (NM1*IL with qualifier ZZ, or
+    REF*23) if present, otherwise the subscriber ID (REF*0F); dependents
+    without their own identifier get "<subscriber id>-<FIRST NAME>". A loop
+    with no identifier at all yields member_id None, which ingest rejects.
+    """
+    member: Optional[dict] = None
+    refs: Dict[str, str] = {}
+    own_id = None
+    is_subscriber = False
+    in_member_name = False  # Inside loop 2100A (member name, contact, address, demographics)
+
+    def finish() -> dict:
+        subscriber_id = refs.get("0F")
+        member_id = own_id or refs.get("23")
+        if not member_id and subscriber_id:
+            member_id = subscriber_id if is_subscriber else f"{subscriber_id}-{member['first_name'].upper()}"
+        return {"member_id": member_id, "subscriber_id": subscriber_id, **member}
+
+    for segment in segments:
+        tag = segment[0]
+        if tag == "INS":
+            if member:
+                yield finish()
+            member = {
+                "first_name": "", "last_name": "", "date_of_birth": None, "phone_number": "",
+                "zip_code": None, "maintenance_type": _element(segment, 3),
+                "coverage_start": None, "coverage_end": None,
+            }
+            refs, own_id = {}, None
+            is_subscriber = _element(segment, 1) == "Y"
+            in_member_name = False
+        elif member is None:
+            continue
+        elif tag == "REF":
+            refs.setdefault(_element(segment, 1), _element(segment, 2))
+        elif tag == "DTP" and _element(segment, 2) == "D8":
+            qualifier = _element(segment, 1)
+            if qualifier in ("348", "356"):
+                member["coverage_start"] = member["coverage_start"] or _d8(_element(segment, 3))
+            elif qualifier in ("349", "357"):
+                member["coverage_end"] = member["coverage_end"] or _d8(_element(segment, 3))
+        elif tag == "NM1":
+            in_member_name = _element(segment, 1) == "IL"
+            if in_member_name:
+                member["last_name"] = _element(segment, 3)
+                member["first_name"] = _element(segment, 4)
+                if _element(segment, 8) == "ZZ":
+                    own_id = _element(segment, 9) or None
+        elif tag == "HD":
+            in_member_name = False
+        elif not in_member_name:
+            continue
+        elif tag == "PER":
+            numbers = {_element(segment, i): _element(segment, i + 1) for i in (3, 5, 7)}
+            for qualifier in PHONE_QUALIFIERS:
+                if numbers.get(qualifier):
+                    member["phone_number"] = numbers[qualifier]
+                    break
+        elif tag == "N4":
+            member["zip_code"] = _element(segment, 3)[:5] or None
+        elif tag == "DMG" and _element(segment, 1) == "D8":
+            member["date_of_birth"] = _d8(_element(segment, 2))
+
+    if member:
+        yield finish()
+
+def iter_835_eobs(segments: Iterable[List[str]], component_separator: str = ":", plan_id: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yields one EOB row per SVC (service line) of each CLP (claim):
+    member_id, plan_id, date_of_service, cpt_code, npi, allowed_amount,
+    place_of_service, facility_name, claim_id.
+    allowed_amount is AMT*B6 when sent, otherwise paid plus patient
+    responsibility (CAS group PR). npi is the rendering provider (NM1*82)
+    or else the payee (N1*PE). Reversal claims (CLP02 = 22) are skipped.
+    plan_id is not part of the 835 and must be supplied by the caller.
+    """
+    payee_npi = None
+    payee_name = None
+    claim: Optional[dict] = None
+    line: Optional[dict] = None
+    lines: List[dict] = []
+
+    def finish_claim() -> List[dict]:
+        rows = []
+        if claim and claim["status"] != CLAIM_REVERSAL:
+            for item in lines:
+                allowed = item["allowed"]
+                if allowed is None:
+                    allowed = item["paid"] + item["patient_responsibility"]
+                rows.append({
+                    "member_id": claim["member_id"],
+                    "plan_id": plan_id,
+                    "date_of_service": item["date"] or claim["date"],
+                    "cpt_code": item["cpt_code"],
+                    "npi": claim["npi"] or payee_npi,
+                    "allowed_amount": round(allowed, 2),
+                    "place_of_service": claim["place_of_service"],
+                    "facility_name": payee_name,
+                    "claim_id": claim["claim_id"],
+                })
+        return rows
+
+    for segment in segments:
+        tag = segment[0]
+        if tag == "N1" and _element(segment, 1) == "PE":
+            payee_name = _element(segment, 2) or None
+            if _element(segment, 3) == "XX":
+                payee_npi = _element(segment, 4) or None
+        elif tag == "CLP":
+            yield from finish_claim()
+            claim = {
+                "claim_id": _element(segment, 1),
+                "status": _element(segment, 2),
+                "place_of_service": _element(segment, 8) or None,
+                "member_id": None, "npi": None, "date": None,
+            }
+            line = None
+            lines = []
+        elif claim is None:
+            continue
+        elif tag == "NM1":
+            entity = _element(segment, 1)
+            if entity == "QC" and _element(segment, 9):
+                claim["member_id"] = _element(segment, 9)
+            elif entity == "IL" and _element(segment, 9) and not claim["member_id"]:
+                claim["member_id"] = _element(segment, 9)
+            elif entity == "82" and _element(segment, 8) == "XX":
+                claim["npi"] = _element(segment, 9) or None
+        elif tag == "DTM" and line is None and _element(segment, 1) in ("232", "050"):
+            claim["date"] = claim["date"] or _d8(_element(segment, 2))
+        elif tag == "SVC":
+            procedure = _element(segment, 1).split(component_separator)
+            line = {
+                "cpt_code": procedure[1] if len(procedure) > 1 else procedure[0],
+                "paid": _amount(_element(segment, 3)),
+                "patient_responsibility": 0.0,
+                "allowed": None,
+                "date": None,
+            }
+            lines.append(line)
+        elif line is None:
+            continue
+        elif tag == "DTM" and _element(segment, 1) in ("472", "150"):
+            line["date"] = _d8(_element(segment, 2))
+        elif tag == "CAS" and _element(segment, 1) == "PR":
+            # Reason/amount/quantity triples start at CAS02
+            for i in range(3, len(segment), 3):
+                line["patient_responsibility"] += _amount(_element(segment, i))
+        elif tag == "AMT" and _element(segment, 1) == "B6":
+            line["allowed"] = _amount(_element(segment, 2))
+
+    yield from finish_claim()
+
+def iter_x12_rows(fileobj: BinaryIO, block_size: int = X12_READ_BLOCK) -> Iterator[dict]:
+    """
+    Streams rows from every 834 / 835 transaction set in an X12 file.
+    Other transaction sets are skipped.
+    """
+    reader = X12Reader(fileobj, block_size)
+    segments = iter(reader)
+    for segment in segments:
+        if segment[0] != "ST":
+            continue
+        body = _transaction(segments)
+        transaction_set = _element(segment, 1)
+        if transaction_set == "834":
+            yield from iter_834_members(body, reader.component_separator)
+        elif transaction_set == "835":
+            yield from iter_835_eobs(body, reader.component_separator)
+        for _ in body:
+            pass
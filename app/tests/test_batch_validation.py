@@ -0,0 +1,65 @@
+import pytest
+from datetime import date
+from app.core.utils import normalize_phone_number
+from app.services.batch_validation import validate_batch, MAX_REPORTED_REJECTIONS
+
+def member(i, **fields):
+    return {"member_id": f"M{i}", "first_name": "Pat", "last_name": "Lee", "date_of_birth": "1980-01-05",
+            "phone_number": "(610) 555-0101", **fields}
+
+def test_eligibility_columns_are_coerced():
+    check = validate_batch("eligibility", [
+        member(0, plan_id="3", extra="dropped"),
+        member(1, phone_number="1-610-555-0102", plan_id=2.0, date_of_birth=" 1975-12-31 "),
+    ])
+    assert check.rejected == 0
+    assert check.rows[0] == {
+        "member_id": "M0", "first_name": "Pat", "last_name": "Lee", "date_of_birth": date(1980, 1, 5),
+        "phone_number": "+16105550101", "plan_id": 3, "risk_tier": "Low", "zip_code": None, "coverage_end": None,
+        "termination_date": None, "maintenance_type": None,
+    }
+    assert check.rows[1]["phone_number"] == "+16105550102"
+    assert check.rows[1]["plan_id"] == 2
+    assert check.rows[1]["date_of_birth"] == date(1975, 12, 31)
+
+@pytest.mark.parametrize("phone", ["6105550101", "+1 (610) 555-0101", "16105550101", "+44 20 7946 0958", "44 20 7946 0958"])
+def test_phone_matches_normalize_phone_number(phone):
+    assert validate_batch("eligibility", [member(0, phone_number=phone)]).rows[0]["phone_number"] == normalize_phone_number(phone)
+
+def test_invalid_rows_are_reported_by_index():
+    check = validate_batch("claims", [
+        {"member_id": "M1", "date_of_service": "2024-01-05", "cpt_code": "80050", "allowed_amount": "12.5"},
+        {"member_id": "M1", "date_of_service": "2024-02-30", "cpt_code": "8005", "allowed_amount": "12,50"},
+        {"member_id": 7, "date_of_service": "2024-1-5", "cpt_code": "g0103", "allowed_amount": 1e2},
+        {"date_of_service": "2024-01-05", "cpt_code": "0001U", "allowed_amount": None},
+    ])
+    assert [row["cpt_code"] for row in check.rows] == ["80050"]
+    assert check.rows[0]["allowed_amount"] == 12.5
+    assert check.rejected == 3
+    assert check.rejections == [
+        {"row": 1, "errors": {"date_of_service": "expected a YYYY-MM-DD date", "cpt_code": "not a CPT/HCPCS code",
+                              "allowed_amount": "not a number"}},
+        {"row": 2, "errors": {"date_of_service": "expected a YYYY-MM-DD date"}},
+        {"row": 3, "errors": {"member_id": "required", "allowed_amount": "required"}},
+    ]
+
+def test_codes_are_kept_as_strings():
+    check = validate_batch("claims", [
+        {"member_id": 1001, "date_of_service": "2024-01-05", "cpt_code": 100, "allowed_amount": 10, "provider_npi": 1234567890},
+        {"member_id": 1002, "date_of_service": "2024-01-05", "cpt_code": 80050, "allowed_amount": 10, "provider_npi": 1234567891},
+    ])
+    assert check.rejected == 0
+    assert [(r["member_id"], r["cpt_code"], r["provider_npi"]) for r in check.rows] == [
+        ("1001", "00100", "1234567890"), ("1002", "80050", "1234567891"),
+    ]
+
+def test_maintenance_type_is_kept_for_cancellations():
+    check = validate_batch("eligibility", [member(0, maintenance_type="024"), member(1, maintenance_type=" 021 ")])
+    assert [r["maintenance_type"] for r in check.rows] == ["024", "021"]
+
+def test_rejection_report_is_capped():
+    rows = [{"member_id": "M1", "cpt_code": "bad"}] * (MAX_REPORTED_REJECTIONS + 5)
+    check = validate_batch("referrals", rows)
+    assert check.rows == []
+    assert check.report()["rejected"] == MAX_REPORTED_REJECTIONS + 5
+    assert len(check.report()["rows"]) == MAX_REPORTED_REJECTIONS
@@ -0,0 +1,167 @@
+import os
+import pytest
+from datetime import date
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, Eligibility, EOB, Claim, PriceSummary
+from app.services.bulk_loader import BulkLoader, _to_copy_csv
+from app.services.facility_index import invalidate_facility_index
+from app.services.pricing_service import clear_pricing_cache
+from app.services.tpa_ingestion import TPAIngestionService
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+# The COPY path only runs against Postgres; point this at a scratch database to exercise it
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="TechStart")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def test_load_eobs_reports_loaded_and_rejected(session, plan):
+    rows = [
+        {"member_id": "M1", "plan_id": str(plan.id), "date_of_service": "2024-01-05", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "120.50", "facility_name": ""},
+        {"member_id": "M2", "plan_id": str(plan.id), "date_of_service": "2024-01-06", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "99.00", "facility_name": "QuickLab"},
+        {"member_id": "M3", "plan_id": str(plan.id), "date_of_service": "01/07/2024", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "80.00"},
+        {"member_id": "M4", "plan_id": str(plan.id), "date_of_service": "2024-01-08", "cpt_code": "80050",
+         "allowed_amount": "70.00"},
+    ]
+    summary = BulkLoader(session).load_eobs(rows)
+
+    assert summary["method"] == "executemany"
+    assert summary["loaded"] == 2
+    assert summary["rejected"] == 2
+    assert summary["errors"][0].startswith("Row 3:")
+    assert summary["errors"][1] == "Row 4: missing column 'npi'"
+
+    eobs = session.exec(select(EOB).order_by(EOB.id)).all()
+    assert [e.allowed_amount for e in eobs] == [120.50, 99.00]
+    assert eobs[0].facility_name is None
+    assert eobs[0].date_of_service == date(2024, 1, 5)
+
+    # Loaded keys are reflected in the price summary
+    price = session.exec(select(PriceSummary)).one()
+    assert price.min_allowed == 99.00
+    assert price.eob_count == 2
+    assert price.facility_name == "QuickLab"
+
+def test_ingest_claims_resolves_members_in_bulk(session, plan):
+    member = Eligibility(member_id="M1", first_name="Pat", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                         phone_number="+16105550001", plan_id=plan.id)
+    session.add(member)
+    session.commit()
+
+    result = TPAIngestionService(session).ingest_claims([
+        {"member_id": "M1", "date_of_service": "2024-02-01", "cpt_code": "85025", "allowed_amount": 45.0},
+        {"member_id": "GHOST", "date_of_service": "2024-02-01", "cpt_code": "85025", "allowed_amount": 45.0},
+    ])
+    assert result["processed"] == 1
+    assert result["rejected"] == 1
+    assert result["errors"] == ["Row 2: Member not found: GHOST"]
+
+    claim = session.exec(select(Claim)).one()
+    assert claim.member_id == member.id
+    assert claim.timestamp is not None
+
+def test_copy_payload_writes_nulls_as_empty_fields():
+    buf = _to_copy_csv(["a", "b", "c"], [{"a": "x,y", "b": None, "c": 1.5}])
+    assert buf.read() == '"x,y",,1.5\n'
+
+def test_resent_rows_are_dropped_by_row_hash(session, plan):
+    rows = [
+        {"member_id": "M1", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "120.50"},
+        {"member_id": "M1", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "120.5"},
+        {"member_id": "M2", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+         "npi": "1111111111", "allowed_amount": "99.00"},
+    ]
+    summary = BulkLoader(session).load_eobs(rows)
+    assert summary["loaded"] == 2
+    assert summary["duplicates"] == 1
+
+    # Resending the file (plus one new line) only adds the new line
+    summary = BulkLoader(session).load_eobs(rows + [{**rows[2], "allowed_amount": "89.00"}])
+    assert summary["loaded"] == 1
+    assert summary["duplicates"] == 3
+    assert len(session.exec(select(EOB)).all()) == 3
+    assert session.exec(select(PriceSummary)).one().eob_count == 3
+
+    member = Eligibility(member_id="M1", first_name="Pat", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                         phone_number="+16105550001", plan_id=plan.id)
+    session.add(member)
+    session.commit()
+    claim = {"member_id": "M1", "date_of_service": "2024-02-01", "cpt_code": "85025", "allowed_amount": 45.0}
+    assert TPAIngestionService(session).ingest_claims([claim])["processed"] == 1
+    result = TPAIngestionService(session).ingest_claims([claim])
+    assert result["processed"] == 0
+    assert result["duplicates"] == 1
+    assert len(session.exec(select(Claim)).all()) == 1
+
+def test_blank_required_columns_are_rejected(session, plan):
+    row = {"member_id": "M1", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+           "npi": "1111111111", "allowed_amount": "120.50"}
+    summary = BulkLoader(session).load_eobs([row, {**row, "cpt_code": ""}, {**row, "npi": "  "}, {**row, "member_id": ""}])
+    assert summary["loaded"] == 1
+    assert summary["errors"] == ["Row 2: empty column 'cpt_code'", "Row 3: empty column 'npi'",
+                                 "Row 4: empty column 'member_id'"]
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+def test_copy_path_loads_and_drops_duplicates_on_postgres():
+    pg_engine = create_engine(POSTGRES_URL)
+    try:
+        SQLModel.metadata.create_all(pg_engine)
+    except Exception as e:
+        pytest.skip(f"Postgres unavailable: {e}")
+    clear_pricing_cache()
+    try:
+        with Session(pg_engine) as session:
+            employer = Employer(name="TechStart")
+            session.add(employer)
+            session.commit()
+            plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+            session.add(plan)
+            session.commit()
+
+            rows = [
+                {"member_id": "M1", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+                 "npi": "1111111111", "allowed_amount": "120.50", "facility_name": "Quick, Lab"},
+                {"member_id": "M2", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+                 "npi": "1111111111", "allowed_amount": "99.00", "facility_name": ""},
+                {"member_id": "M3", "plan_id": plan.id, "date_of_service": "2024-01-05", "cpt_code": "80050",
+                 "npi": "", "allowed_amount": "80.00"},
+            ]
+            summary = BulkLoader(session).load_eobs(rows)
+            assert summary["method"] == "copy"
+            assert summary["loaded"] == 2
+            assert summary["errors"] == ["Row 3: empty column 'npi'"]
+
+            summary = BulkLoader(session).load_eobs(rows[:2])
+            assert summary["loaded"] == 0
+            assert summary["duplicates"] == 2
+
+            eobs = session.exec(select(EOB).order_by(EOB.member_id_ref)).all()
+            assert [(e.member_id_ref, e.facility_name) for e in eobs] == [("M1", "Quick, Lab"), ("M2", None)]
+            assert session.exec(select(PriceSummary)).one().eob_count == 2
+    finally:
+        clear_pricing_cache()
+        SQLModel.metadata.drop_all(pg_engine)
+        pg_engine.dispose()
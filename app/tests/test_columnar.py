@@ -0,0 +1,102 @@
+import io
+import pytest
+from datetime import date, datetime
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, Eligibility, EOB, Claim
+from app.core.uploads import iter_upload_rows
+from app.services.ingestion_jobs import IngestionJobService
+from app.services.facility_index import invalidate_facility_index
+from app.services.pricing_service import clear_pricing_cache
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="TechStart")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def parquet(table, **kwargs) -> io.BytesIO:
+    buf = io.BytesIO()
+    pq.write_table(table, buf, **kwargs)
+    buf.seek(0)
+    return buf
+
+def test_parquet_columns_are_cast_per_batch():
+    table = pa.table({
+        "member_id": [101, 102, 103],
+        "date_of_service": [datetime(2024, 1, 5, 9, 30), datetime(2024, 1, 6), None],
+        "cpt_code": [" 80050", "00100", "85025"],
+        "allowed_amount": ["120.5", "99", " "],
+        "note": ["a", "b", "c"],
+    })
+    chunks = list(iter_upload_rows(parquet(table, row_group_size=2), chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 1]
+    assert chunks[0][0] == {"member_id": "101", "date_of_service": date(2024, 1, 5), "cpt_code": "80050",
+                            "allowed_amount": 120.5, "note": "a"}
+    assert chunks[0][1]["cpt_code"] == "00100"
+    assert chunks[1][0]["allowed_amount"] is None
+
+def test_arrow_stream_with_bad_value_keeps_column_raw():
+    batch = pa.record_batch({"date_of_service": ["2024-01-05", "01/07/2024"], "allowed_amount": [1.0, 2.0]})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    sink.seek(0)
+    rows = [r for c in iter_upload_rows(sink) for r in c]
+    # One unparseable date leaves the batch's column as strings for per-row validation
+    assert [r["date_of_service"] for r in rows] == ["2024-01-05", "01/07/2024"]
+
+def test_parquet_claims_and_eobs_ingest(session, plan):
+    member = Eligibility(member_id="M1", first_name="Pat", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                         phone_number="+16105550001", plan_id=plan.id)
+    session.add(member)
+    session.commit()
+
+    claims = pa.table({
+        "member_id": ["M1", "M1", "GHOST"],
+        "date_of_service": pa.array([date(2024, 2, 1), date(2024, 2, 2), date(2024, 2, 3)], pa.date32()),
+        "cpt_code": ["85025", "80050", "85025"],
+        "allowed_amount": [45.0, 60.0, 10.0],
+        "provider_npi": [None, 1111111111, None],
+    })
+    job, result = IngestionJobService(session).run("claims", parquet(claims), "claims.parquet")
+    assert job.status == "completed"
+    assert result["processed"] == 2
+    assert result["errors"] == ["Row 3: Member not found: GHOST"]
+    stored = session.exec(select(Claim).order_by(Claim.date_of_service)).all()
+    assert [c.provider_npi for c in stored] == [None, "1111111111"]
+
+    eobs = pa.table({
+        "member_id": ["M1", "M1"],
+        "plan_id": [plan.id, plan.id],
+        "date_of_service": ["2024-01-05", "2024-01-06"],
+        "cpt_code": ["80050", "80050"],
+        "npi": ["2222222222", None],
+        "allowed_amount": [120.5, 99.0],
+    })
+    sink = io.BytesIO()
+    with pa.ipc.new_file(sink, eobs.schema) as writer:
+        writer.write_table(eobs)
+    sink.seek(0)
+    job, result = IngestionJobService(session).run("eob", sink, "eob.arrow")
+    assert result["loaded"] == 1
+    assert result["errors"] == ["Row 2: empty column 'npi'"]
+    assert session.exec(select(EOB)).one().date_of_service == date(2024, 1, 5)
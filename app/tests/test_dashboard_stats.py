@@ -0,0 +1,70 @@
+import pytest
+from datetime import date
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+from app.db.models import Employer, Plan, Eligibility, MemberInteraction
+from app.services.dashboard_stats import dashboard_stats, employer_stats, clear_dashboard_stats_cache
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_dashboard_stats_cache()
+    with Session(engine) as session:
+        yield session
+    clear_dashboard_stats_cache()
+    SQLModel.metadata.drop_all(engine)
+
+def add_member(session, plan, n, **fields):
+    member = Eligibility(member_id=f"M{n}", first_name="Pat", last_name=f"L{n}", date_of_birth=date(1980, 1, 1),
+                         phone_number=f"+1610555{n:04d}", plan_id=plan.id, **fields)
+    session.add(member)
+    session.commit()
+    return member
+
+def count_queries(fn):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+def test_dashboard_stats_grouped_by_employer_and_cached(session):
+    plans = {}
+    for name in ("TechStart", "Acme"):
+        employer = Employer(name=name)
+        session.add(employer)
+        session.commit()
+        plans[name] = Plan(name=f"{name} HDHP", employer_id=employer.id)
+        session.add(plans[name])
+        session.commit()
+    techstart, acme = plans["TechStart"].employer_id, plans["Acme"].employer_id
+
+    first = add_member(session, plans["TechStart"], 1, opted_in=True)
+    add_member(session, plans["TechStart"], 2, opted_out=True)
+    add_member(session, plans["TechStart"], 3, opted_in=True)
+    other = add_member(session, plans["Acme"], 4)
+    for member in (first, first, other):
+        session.add(MemberInteraction(member_id=member.id, message_type="inbound_text"))
+    session.commit()
+
+    by_employer, query_count = count_queries(lambda: employer_stats(session))
+    assert query_count == 2
+    assert by_employer[techstart] == {"members": 3, "opted_in": 2, "opted_out": 1, "interactions": 2}
+    assert by_employer[acme] == {"members": 1, "opted_in": 0, "opted_out": 0, "interactions": 1}
+
+    # Served from the cache until it expires or is cleared
+    add_member(session, plans["Acme"], 5, opted_in=True)
+    totals, query_count = count_queries(lambda: dashboard_stats(session))
+    assert query_count == 0
+    assert totals == {"members": 4, "opted_in": 2, "opted_out": 1, "interactions": 3}
+
+    clear_dashboard_stats_cache()
+    assert dashboard_stats(session, acme) == {"members": 2, "opted_in": 1, "opted_out": 0, "interactions": 1}
+    assert dashboard_stats(session, 999) == {"members": 0, "opted_in": 0, "opted_out": 0, "interactions": 0}
@@ -0,0 +1,148 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, EOB, Facility
+from app.services import facility_index
+from app.services.facility_index import FacilitySpatialIndex, build_facility_index, get_facility_index, invalidate_facility_index
+from app.services.geo_service import haversine_distance, haversine_distances, get_coordinates, calculate_distance, get_zip_table, clear_geocode_cache, get_geocode_cache_stats
+from app.db.models import GeocodeCache
+from app.services.pricing_service import PricingService, clear_pricing_cache
+from datetime import date
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    invalidate_facility_index()
+    SQLModel.metadata.drop_all(engine)
+
+# Bethlehem, Allentown, Easton and Philadelphia, PA
+BETHLEHEM = (40.6259, -75.3705)
+ALLENTOWN = (40.6023, -75.4714)
+EASTON = (40.6884, -75.2207)
+PHILADELPHIA = (39.9526, -75.1652)
+
+def test_spatial_index_radius_query():
+    index = FacilitySpatialIndex([
+        ("ALLENTOWN", *ALLENTOWN),
+        ("EASTON", *EASTON),
+        ("PHILADELPHIA", *PHILADELPHIA),
+    ])
+    found = index.within(*BETHLEHEM, radius_miles=25)
+    assert set(found) == {"ALLENTOWN", "EASTON"}
+    assert found["EASTON"] == round(haversine_distance(*BETHLEHEM, *EASTON), 1)
+    assert "PHILADELPHIA" in index
+    assert set(index.within(*BETHLEHEM, radius_miles=60)) == {"ALLENTOWN", "EASTON", "PHILADELPHIA"}
+
+def test_facility_index_expires_without_invalidation(session, monkeypatch):
+    session.add(Facility(npi="1111111111", facility_name="Easton Lab", zip_code="18042", latitude=EASTON[0], longitude=EASTON[1]))
+    session.commit()
+    index = get_facility_index(session)
+    assert len(index) == 1
+
+    # Added by another process, whose invalidation never reaches this one
+    session.add(Facility(npi="2222222222", facility_name="Allentown Lab", zip_code="18103",
+                         latitude=ALLENTOWN[0], longitude=ALLENTOWN[1]))
+    session.commit()
+    assert get_facility_index(session) is index
+
+    monkeypatch.setattr(facility_index.settings, "FACILITY_INDEX_TTL_SECONDS", -1)
+    assert "2222222222" in get_facility_index(session)
+
+def test_pricing_filters_price_and_radius_together(session):
+    employer = Employer(name="Acme")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="Acme PPO", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+
+    # The cheapest facility is in Philadelphia, ~50 miles from the member
+    facilities = [
+        ("1111111111", "Philly Lab", PHILADELPHIA, "19103", 20.0),
+        ("2222222222", "Easton Lab", EASTON, "18042", 30.0),
+        ("3333333333", "Allentown Lab", ALLENTOWN, "18103", 31.0),
+    ]
+    for npi, name, (lat, lng), zip_code, price in facilities:
+        session.add(Facility(npi=npi, facility_name=name, zip_code=zip_code, latitude=lat, longitude=lng))
+        session.add(EOB(member_id_ref="HISTORICAL", plan_id=plan.id, date_of_service=date(2024, 1, 1),
+                        cpt_code="80050", npi=npi, allowed_amount=price))
+    session.commit()
+
+    pricing = PricingService(session)
+    pricing.rebuild_price_summary()
+    build_facility_index(session)
+
+    with patch("app.services.geo_service.get_coordinates", return_value=BETHLEHEM):
+        matches = pricing.find_cheapest_facilities(plan.id, ["80050"], member_zip="18015")
+
+    # Philadelphia is dropped for distance; the band is anchored on the cheapest reachable site
+    assert [m["name"] for m in matches] == ["Easton Lab", "Allentown Lab"]
+    assert all(m["distance"] < 10 for m in matches)
+
+def test_zip_centroid_table_resolves_without_network():
+    table = get_zip_table()
+    assert table is not None and len(table) > 40000
+
+    with patch("app.services.geo_service.requests.get") as mock_get:
+        lat, lng = get_coordinates("18015")
+        assert abs(lat - 40.60) < 0.1 and abs(lng - -75.38) < 0.1
+        assert get_coordinates("18015-1234") == (lat, lng)
+        # Bethlehem to Easton is ~9 miles; the mock fallback would say 30
+        assert 5 < calculate_distance("18015", "18042") < 15
+        assert not mock_get.called
+
+    assert get_coordinates("ABCDE") is None
+
+def test_geocode_cache_persists_hits_and_misses(session, monkeypatch):
+    # Zips not in the centroid table go through the geocode cache tiers
+    monkeypatch.setenv("GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr("app.db.session.engine", engine)
+    clear_geocode_cache()
+
+    def fake_geocode(url, params, timeout):
+        response = MagicMock()
+        if params["address"] == "00001":
+            response.json.return_value = {"status": "OK", "results": [{"geometry": {"location": {"lat": 40.0, "lng": -75.0}}}]}
+        else:
+            response.json.return_value = {"status": "ZERO_RESULTS", "results": []}
+        return response
+
+    with patch("app.services.geo_service.requests.get", side_effect=fake_geocode) as mock_get:
+        assert get_coordinates("00001") == (40.0, -75.0)
+        assert get_coordinates("00002") is None
+        assert mock_get.call_count == 2
+
+        # Memory tier
+        assert get_coordinates("00001") == (40.0, -75.0)
+        assert get_coordinates("00002") is None
+
+        # New process / other worker: memory is empty, the DB tier answers
+        clear_geocode_cache()
+        assert get_coordinates("00001") == (40.0, -75.0)
+        assert get_coordinates("00002") is None
+        assert mock_get.call_count == 2
+
+    stats = get_geocode_cache_stats()
+    assert stats["db_hits"] == 2
+    assert stats["api_calls"] == 0
+
+    rows = {row.zip_code: row for row in session.exec(select(GeocodeCache)).all()}
+    assert rows["00001"].found and rows["00001"].latitude == 40.0
+    assert not rows["00002"].found
+
+def test_haversine_distances_matches_scalar():
+    points = [ALLENTOWN, EASTON, PHILADELPHIA, BETHLEHEM]
+    distances = haversine_distances(*BETHLEHEM, [p[0] for p in points], [p[1] for p in points])
+    for (lat, lng), distance in zip(points, distances):
+        assert distance == pytest.approx(haversine_distance(*BETHLEHEM, lat, lng))
+
+    index = FacilitySpatialIndex([("A", *ALLENTOWN), ("P", *PHILADELPHIA)])
+    assert index.within(*BETHLEHEM, 100)["P"] == pytest.approx(haversine_distance(*BETHLEHEM, *PHILADELPHIA), abs=0.05)
+    assert FacilitySpatialIndex([]).within(*BETHLEHEM, 25) == {}
@@ -0,0 +1,251 @@
+import io
+import json
+import pytest
+from datetime import date
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, Eligibility, IngestionJob, ReferralEvent
+from app.core.uploads import MAX_REPORTED_ERRORS
+from app.services.ingestion_jobs import IngestionJobService
+from app.services.tpa_ingestion import TPAIngestionService
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="TechStart")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def roster(plan, n):
+    return json.dumps([
+        {"member_id": f"M{i}", "first_name": "Pat", "last_name": f"L{i}", "date_of_birth": "1980-01-01",
+         "phone_number": f"610555{i:04d}", "plan_id": plan.id}
+        for i in range(n)
+    ]).encode()
+
+def test_interrupted_job_resumes_from_checkpoint(session, plan, monkeypatch):
+    payload = roster(plan, 10)
+    original = TPAIngestionService.ingest_eligibility
+    calls = []
+
+    def crash_on_third_chunk(self, data):
+        calls.append([row["member_id"] for row in data])
+        if len(calls) == 3:
+            # Partial work of the failing chunk must not survive
+            self.session.add(Eligibility(member_id="PARTIAL", first_name="x", last_name="y",
+                                         date_of_birth=date(1980, 1, 1), phone_number="+1", plan_id=plan.id))
+            self.session.flush()
+            raise RuntimeError("worker killed")
+        return original(self, data)
+
+    monkeypatch.setattr(TPAIngestionService, "ingest_eligibility", crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        IngestionJobService(session).run("eligibility", io.BytesIO(payload), "roster.json", chunk_size=4)
+
+    job = session.exec(select(IngestionJob)).one()
+    assert job.status == "failed"
+    assert job.row_offset == 8
+    assert job.processed == 8
+    assert job.last_error == "worker killed"
+    assert len(session.exec(select(Eligibility)).all()) == 8
+
+    # Re-submitting the same file only processes the rows after the checkpoint
+    monkeypatch.setattr(TPAIngestionService, "ingest_eligibility", original)
+    job, result = IngestionJobService(session).run("eligibility", io.BytesIO(payload), "roster.json", chunk_size=4)
+    assert job.status == "completed"
+    assert job.row_offset == 10
+    assert job.processed == 10
+    assert result["resumed_from"] == 8
+    assert result["processed"] == 2
+    members = session.exec(select(Eligibility.member_id)).all()
+    assert sorted(members) == sorted(f"M{i}" for i in range(10))
+    assert len(session.exec(select(IngestionJob)).all()) == 1
+
+def test_running_job_is_not_started_twice(session, plan):
+    service = IngestionJobService(session)
+    job = service.start("eligibility", "abc123", "roster.json")
+    assert job.status == "running"
+    with pytest.raises(ValueError):
+        service.start("eligibility", "abc123", "roster.json")
+    # A different file is a different job
+    assert service.start("eligibility", "def456").id != job.id
+
+def test_queued_job_is_claimed_once_and_processed(session, plan):
+    rows = json.loads(roster(plan, 5))
+    service = IngestionJobService(session)
+    job = service.enqueue("eligibility", rows)
+    assert job.status == "queued"
+    assert job.total_rows == 5
+
+    job_id = service.claim_next()
+    assert job_id == job.id
+    # Already claimed by this worker
+    assert service.claim_next() is None
+
+    job, result = service.process(job_id, chunk_size=2)
+    assert job.status == "completed"
+    assert job.row_offset == 5
+    assert job.processed == 5
+    assert job.payload is None
+    assert result["processed"] == 5
+    assert len(session.exec(select(Eligibility)).all()) == 5
+
+def test_worker_drains_queue(session, plan):
+    from app.services.job_worker import JobWorker
+    IngestionJobService(session).enqueue("eligibility", json.loads(roster(plan, 3)))
+
+    worker = JobWorker(engine)
+    job_id = worker.run_once()
+    assert job_id is not None
+    assert worker.run_once() is None
+
+    session.expire_all()
+    job = session.get(IngestionJob, job_id)
+    assert job.status == "completed"
+    assert job.processed == 3
+
+def test_completed_file_is_skipped(session, plan):
+    payload = roster(plan, 3)
+    job, result = IngestionJobService(session).run("eligibility", io.BytesIO(payload), "roster.json")
+    assert result["processed"] == 3
+
+    again, result = IngestionJobService(session).run("eligibility", io.BytesIO(payload), "roster-resent.json")
+    assert again.id == job.id
+    assert result["duplicate_of"] == job.id
+    assert result["processed"] == 0
+    # The same file with different row defaults is a new job
+    other, _ = IngestionJobService(session).run("eligibility", io.BytesIO(payload), "roster.json",
+                                                row_defaults={"plan_id": plan.id})
+    assert other.id != job.id
+    assert len(session.exec(select(IngestionJob)).all()) == 2
+
+def test_resumed_roster_sync_terminates_only_missing_members(session, plan, monkeypatch):
+    from app.services.tpa_ingestion import EligibilityRosterSync
+    IngestionJobService(session).run("eligibility_full", io.BytesIO(roster(plan, 10)), "day1.json")
+
+    # Day 2 drops M9; the first run dies after two chunks
+    payload = roster(plan, 9)
+    original = EligibilityRosterSync.__call__
+    calls = []
+
+    def crash_on_third_chunk(self, data):
+        calls.append(len(data))
+        if len(calls) == 3:
+            raise RuntimeError("worker killed")
+        return original(self, data)
+
+    monkeypatch.setattr(EligibilityRosterSync, "__call__", crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        IngestionJobService(session).run("eligibility_full", io.BytesIO(payload), "day2.json", chunk_size=4)
+    monkeypatch.setattr(EligibilityRosterSync, "__call__", original)
+
+    job, result = IngestionJobService(session).run("eligibility_full", io.BytesIO(payload), "day2.json", chunk_size=4)
+    assert job.status == "completed"
+    assert result["resumed_from"] == 8
+    assert result["unchanged"] == 1
+    assert result["terminated"] == 1
+    terminated = session.exec(select(Eligibility.member_id).where(Eligibility.termination_date.is_not(None))).all()
+    assert terminated == ["M9"]
+
+def test_retried_referral_chunk_skips_rows_already_committed(session, plan, monkeypatch):
+    for i in range(4):
+        session.add(Eligibility(member_id=f"M{i}", first_name="Pat", last_name=f"L{i}", date_of_birth=date(1980, 1, 1),
+                                phone_number=f"+1610555{i:04d}", plan_id=plan.id))
+    session.commit()
+    service = IngestionJobService(session)
+    job_id = service.enqueue("referrals", [{"member_id": f"M{i}", "cpt_code": "80050"} for i in range(4)]).id
+    original = TPAIngestionService.ingest_referrals_parallel
+
+    def one_worker_fails(self, data, workers=None):
+        # One worker commits its partition in its own session, another one fails
+        with Session(engine) as other:
+            TPAIngestionService(other).ingest_referrals(data[:2])
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(TPAIngestionService, "ingest_referrals_parallel", one_worker_fails)
+    with pytest.raises(RuntimeError):
+        service.process(job_id)
+    assert len(session.exec(select(ReferralEvent)).all()) == 2
+
+    # The retried chunk only routes (and texts) the rows that were rolled back
+    monkeypatch.setattr(TPAIngestionService, "ingest_referrals_parallel", original)
+    job, result = service.process(job_id)
+    assert job.status == "completed"
+    assert result["duplicates"] == 2
+    assert result["processed"] == 2
+    referrals = session.exec(select(ReferralEvent).order_by(ReferralEvent.id)).all()
+    assert [r.source_key for r in referrals] == [f"{job_id}:{i}" for i in range(4)]
+
+def test_heartbeat_keeps_long_chunk_from_going_stale(tmp_path, monkeypatch):
+    import time
+    from app.services import ingestion_jobs
+    # The heartbeat uses its own connection, so it needs a shared (file) database
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(file_engine)
+    monkeypatch.setattr(ingestion_jobs.settings, "INGEST_JOB_HEARTBEAT_SECONDS", 0.05)
+    seen = []
+
+    def slow_chunk(self, data):
+        # Another process looking at the job while the chunk runs
+        with Session(file_engine) as other:
+            before = other.get(IngestionJob, 1).updated_at
+            time.sleep(0.3)
+            other.expire_all()
+            seen.append((before, other.get(IngestionJob, 1).updated_at))
+        return {"processed": len(data), "errors": []}
+
+    monkeypatch.setattr(TPAIngestionService, "ingest_accumulators", slow_chunk)
+    with Session(file_engine) as session:
+        service = IngestionJobService(session)
+        job_id = service.enqueue("accumulators", [{"member_id": "M1"}, {"member_id": "M2"}]).id
+        assert service.claim_next() == job_id
+        job, _ = service.process(job_id, chunk_size=1)
+        assert job.status == "completed"
+        assert job.processed == 2
+    assert len(seen) == 2
+    assert all(after > before for before, after in seen)
+    file_engine.dispose()
+
+def test_checkpoint_records_processed_after_each_chunk(session, plan, monkeypatch):
+    original = TPAIngestionService.ingest_eligibility
+    calls = []
+
+    def crash_on_second_chunk(self, data):
+        calls.append(len(data))
+        if len(calls) == 2:
+            # The first chunk's checkpoint, as committed, counts its rows
+            assert session.exec(select(IngestionJob.processed)).one() == 4
+            raise RuntimeError("worker killed")
+        return original(self, data)
+
+    monkeypatch.setattr(TPAIngestionService, "ingest_eligibility", crash_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        IngestionJobService(session).run("eligibility", io.BytesIO(roster(plan, 10)), "roster.json", chunk_size=4)
+    assert session.exec(select(IngestionJob.row_offset)).one() == 4
+
+def test_job_result_keeps_a_sample_of_errors(session, plan):
+    bad = MAX_REPORTED_ERRORS * 3
+    payload = json.dumps([
+        {"member_id": f"M{i}", "first_name": "Pat", "last_name": "Lee", "date_of_birth": "not-a-date",
+         "phone_number": "6105550100"}
+        for i in range(bad)
+    ]).encode()
+    job, result = IngestionJobService(session).run("eligibility", io.BytesIO(payload), "bad.json",
+                                                   chunk_size=MAX_REPORTED_ERRORS)
+    assert job.status == "completed"
+    assert job.error_count == bad
+    assert result["error_count"] == bad
+    assert result["rejected"] == bad
+    assert len(result["errors"]) == MAX_REPORTED_ERRORS
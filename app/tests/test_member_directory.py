@@ -0,0 +1,85 @@
+import pytest
+from datetime import date
+from sqlmodel import Session, SQLModel, create_engine
+from app.db.models import Employer, Plan, Eligibility
+from app.services.member_directory import member_page, count_members, clear_member_count_cache, encode_cursor
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_member_count_cache()
+    with Session(engine) as session:
+        yield session
+    clear_member_count_cache()
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plans")
+def plans_fixture(session):
+    plans = []
+    for name in ("TechStart", "Acme"):
+        employer = Employer(name=name)
+        session.add(employer)
+        session.commit()
+        plan = Plan(name=f"{name} HDHP", employer_id=employer.id)
+        session.add(plan)
+        session.commit()
+        plans.append(plan)
+    return plans
+
+def add_members(session, plan, start, count, **fields):
+    for n in range(start, start + count):
+        session.add(Eligibility(member_id=f"M{n}", first_name="Pat", last_name=f"L{n}", date_of_birth=date(1980, 1, 1),
+                                phone_number=f"+1610555{n:04d}", plan_id=plan.id, **fields))
+    session.commit()
+
+def test_member_pages_follow_plan_then_id(session, plans):
+    techstart, acme = plans
+    # Interleave inserts so id order differs from (plan_id, id) order
+    add_members(session, acme, 0, 3)
+    add_members(session, techstart, 3, 4)
+    add_members(session, acme, 7, 2)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = member_page(session, cursor=cursor, limit=4)
+        assert page["total"] == 9
+        seen.extend((m.plan_id, m.id) for m in page["members"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen == sorted(seen)
+    assert len(set(seen)) == 9
+
+    # The plan is loaded with the page, for the template
+    assert page["members"][0].plan.name == "Acme HDHP"
+
+def test_member_page_filters_in_sql(session, plans):
+    techstart, acme = plans
+    add_members(session, techstart, 0, 3, opted_in=True)
+    add_members(session, techstart, 3, 2)
+    add_members(session, acme, 5, 2, opted_in=True)
+
+    page = member_page(session, employer_id=techstart.employer_id, status="opted_in")
+    assert page["total"] == 3
+    assert {m.member_id for m in page["members"]} == {"M0", "M1", "M2"}
+    assert member_page(session, q="L6")["total"] == 1
+
+    # Past the last row
+    assert member_page(session, cursor=encode_cursor(acme.id, 10 ** 6))["members"] == []
+    with pytest.raises(ValueError):
+        member_page(session, cursor="not-a-cursor")
+
+def test_member_count_is_cached_per_filter(session, plans):
+    techstart, _ = plans
+    add_members(session, techstart, 0, 2)
+    assert count_members(session) == 2
+    add_members(session, techstart, 2, 1)
+    assert count_members(session) == 2
+    assert count_members(session, status="pending") == 3
+    clear_member_count_cache()
+    assert count_members(session) == 3
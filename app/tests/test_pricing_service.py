@@ -0,0 +1,207 @@
+import warnings
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import SAWarning
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, EOB, Facility, PriceSummary
+from app.services.pricing_service import PricingService, clear_pricing_cache, get_pricing_cache_stats, bump_price_index_version
+from app.services.facility_index import build_facility_index, invalidate_facility_index
+from datetime import date
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    invalidate_facility_index()
+    SQLModel.metadata.drop_all(engine)
+
+def add_eob(session, plan_id, cpt_code, npi, amount, facility_name=None):
+    eob = EOB(
+        member_id_ref="HISTORICAL",
+        plan_id=plan_id,
+        date_of_service=date(2024, 1, 1),
+        cpt_code=cpt_code,
+        npi=npi,
+        allowed_amount=amount,
+        facility_name=facility_name
+    )
+    session.add(eob)
+    return eob
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="Acme")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="Acme PPO", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def test_refresh_price_summary_aggregates_touched_keys(session, plan):
+    for amount in [100.0, 300.0, 200.0]:
+        add_eob(session, plan.id, "73721", "1111111111", amount)
+    add_eob(session, plan.id, "73721", "2222222222", 50.0)
+    session.commit()
+
+    pricing = PricingService(session)
+    written = pricing.refresh_price_summary([(plan.id, "73721", "1111111111")])
+    assert written == 1
+
+    summary = session.exec(select(PriceSummary)).all()
+    assert len(summary) == 1
+    assert summary[0].min_allowed == 100.0
+    assert summary[0].median_allowed == 200.0
+    assert summary[0].eob_count == 3
+
+    # A later upload for the same key updates the row in place rather than appending
+    summary_id = summary[0].id
+    add_eob(session, plan.id, "73721", "1111111111", 80.0)
+    session.commit()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SAWarning)
+        pricing.refresh_price_summary([(plan.id, "73721", "1111111111")])
+    summary = session.exec(select(PriceSummary)).all()
+    assert len(summary) == 1
+    assert summary[0].id == summary_id
+    assert summary[0].min_allowed == 80.0
+    assert summary[0].eob_count == 4
+
+    # A key whose EOBs are gone loses its summary row
+    for eob in session.exec(select(EOB)).all():
+        session.delete(eob)
+    session.commit()
+    pricing.refresh_price_summary([(plan.id, "73721", "1111111111")])
+    assert session.exec(select(PriceSummary)).all() == []
+
+def test_find_cheapest_facilities_reads_summary(session, plan):
+    session.add(Facility(npi="1111111111", facility_name="General Hospital", zip_code="18015"))
+    session.add(Facility(npi="2222222222", facility_name="QuickLab", zip_code="18015"))
+    add_eob(session, plan.id, "73721", "1111111111", 2500.0)
+    add_eob(session, plan.id, "73721", "2222222222", 450.0)
+    session.commit()
+
+    pricing = PricingService(session)
+    # Nothing summarized yet
+    assert pricing.find_cheapest_facilities(plan.id, ["73721"]) == []
+
+    pricing.rebuild_price_summary()
+    matches = pricing.find_cheapest_facilities(plan.id, ["73721"])
+    assert [m["name"] for m in matches] == ["QuickLab"]
+    assert matches[0]["price"] == 450.0
+
+def count_queries(fn):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+def test_find_cheapest_facilities_query_count_is_constant(session, plan):
+    # Mix of NPIs with and without Facility rows, all within the 10% band
+    for i in range(12):
+        npi = f"{i:010d}"
+        if i % 2 == 0:
+            session.add(Facility(npi=npi, facility_name=f"Facility {i}", zip_code="18015"))
+        add_eob(session, plan.id, "80050", npi, 30.0 + i * 0.1, facility_name=f"EOB Name {i}")
+    session.commit()
+
+    plan_id = plan.id
+    pricing = PricingService(session)
+    pricing.rebuild_price_summary()
+    build_facility_index(session)  # Built at app startup
+    session.expire_all()
+
+    matches, query_count = count_queries(
+        lambda: pricing.find_cheapest_facilities(plan_id, ["80050"], member_zip="18015")
+    )
+    assert len(matches) == 3
+    assert query_count == 1
+
+    # Fallback names come from the summary row, not a per-NPI EOB lookup
+    assert matches[1]["name"] == "EOB Name 1"
+    assert matches[1]["address"] == "Address not on file"
+
+def test_pricing_cache_hits_until_price_index_changes(session, plan):
+    session.add(Facility(npi="2222222222", facility_name="QuickLab", zip_code="18015"))
+    add_eob(session, plan.id, "73721", "2222222222", 450.0)
+    session.commit()
+    plan_id = plan.id
+
+    pricing = PricingService(session)
+    pricing.rebuild_price_summary()
+
+    first = pricing.find_cheapest_facilities(plan_id, ["73721"])
+    _, query_count = count_queries(lambda: pricing.find_cheapest_facilities(plan_id, ["73721"]))
+    assert query_count == 0
+    stats = get_pricing_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    # Returned dicts are copies; mutating one does not poison the cache
+    first[0]["price"] = 0.0
+    assert pricing.find_cheapest_facilities(plan_id, ["73721"])[0]["price"] == 450.0
+
+    # A cheaper EOB arrives: the refresh bumps the plan version
+    add_eob(session, plan_id, "73721", "2222222222", 400.0)
+    session.commit()
+    pricing.refresh_price_summary([(plan_id, "73721", "2222222222")])
+    assert pricing.find_cheapest_facilities(plan_id, ["73721"])[0]["price"] == 400.0
+
+    # Facility changes invalidate every plan
+    session.add(Facility(npi="3333333333", facility_name="LabCorp", zip_code="18015"))
+    add_eob(session, plan_id, "73721", "3333333333", 405.0)
+    session.commit()
+    pricing.refresh_price_summary([(plan_id, "73721", "3333333333")])
+    misses = get_pricing_cache_stats()["misses"]
+    bump_price_index_version()
+    assert len(pricing.find_cheapest_facilities(plan_id, ["73721"])) == 2
+    assert get_pricing_cache_stats()["misses"] == misses + 1
+
+def test_bundle_pricing_ranks_by_total_and_reports_gaps(session, plan):
+    prices = {
+        "1111111111": {"80050": 300.0, "80053": 200.0, "85025": 100.0},  # Hospital, complete
+        "2222222222": {"80050": 30.0, "80053": 20.0, "85025": 10.0},     # Cheap, complete
+        "3333333333": {"80050": 5.0},                                    # Cheapest line, incomplete
+    }
+    for npi, lines in prices.items():
+        session.add(Facility(npi=npi, facility_name=f"Facility {npi[0]}", zip_code="18015"))
+        for cpt, amount in lines.items():
+            add_eob(session, plan.id, cpt, npi, amount)
+    session.commit()
+    plan_id = plan.id
+
+    pricing = PricingService(session)
+    pricing.rebuild_price_summary()
+    session.expire_all()
+
+    matches, query_count = count_queries(
+        lambda: pricing.find_cheapest_facilities(plan_id, ["80050", "80053", "85025"])
+    )
+    assert query_count == 1
+    assert [m["name"] for m in matches] == ["Facility 2"]
+    assert matches[0]["price"] == 60.0
+    assert matches[0]["line_items"] == {"80050": 30.0, "80053": 20.0, "85025": 10.0}
+    assert matches[0]["missing_cpts"] == []
+
+    # Cached matches are deep-copied, so a caller's edits stay out of the cache
+    matches[0]["line_items"]["80050"] = 0.0
+    matches[0]["missing_cpts"].append("edited")
+    again = pricing.find_cheapest_facilities(plan_id, ["80050", "80053", "85025"])
+    assert again[0]["line_items"]["80050"] == 30.0
+    assert again[0]["missing_cpts"] == []
+
+    # No facility prices 99999: best-covered facilities are returned with their gaps
+    matches = pricing.find_cheapest_facilities(plan_id, ["80053", "99999"])
+    assert [m["name"] for m in matches] == ["Facility 2"]
+    assert matches[0]["missing_cpts"] == ["99999"]
@@ -0,0 +1,73 @@
+import importlib.util
+import pathlib
+import pytest
+from sqlalchemy import text, tuple_
+from sqlmodel import Session, SQLModel, create_engine, select, func
+from app.db.models import Accumulator, MemberInteraction, ReferralEvent, SupportMessage, EOB, Eligibility
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+MIGRATION = pathlib.Path(__file__).resolve().parents[2] / "migrations" / "versions" / "b7e4d2a9c316_add_hot_path_indexes.py"
+
+# The hot queries, as the routes and services issue them, and the index each should use
+HOT_QUERIES = {
+    "latest accumulator (routing)": (
+        select(Accumulator).where(Accumulator.member_id == 1).order_by(Accumulator.timestamp.desc()),
+        "ix_accumulator_member_timestamp",
+    ),
+    "member interactions (member detail, demo console)": (
+        select(MemberInteraction).where(MemberInteraction.member_id == 1).order_by(MemberInteraction.timestamp.asc()),
+        "ix_memberinteraction_member_timestamp",
+    ),
+    "latest referral (YES flow)": (
+        select(ReferralEvent).where(ReferralEvent.member_id == 1).order_by(ReferralEvent.timestamp.desc()),
+        "ix_referralevent_member_timestamp",
+    ),
+    "pending support badge": (
+        select(func.count()).select_from(SupportMessage).where(SupportMessage.status == "pending"),
+        "ix_supportmessage_status",
+    ),
+    "plan CPT prices (pricing)": (
+        select(EOB.allowed_amount).where(EOB.plan_id == 1, EOB.cpt_code == "80050"),
+        "ix_eob_plan_cpt_allowed",
+    ),
+    "members page after a cursor (admin members list)": (
+        select(Eligibility).where(tuple_(Eligibility.plan_id, Eligibility.id) > (1, 100))
+        .order_by(Eligibility.plan_id, Eligibility.id).limit(51),
+        "ix_eligibility_plan_id_id",
+    ),
+}
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+def query_plan(session, statement) -> list:
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in session.exec(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_an_index(session, name):
+    statement, index = HOT_QUERIES[name]
+    plan = query_plan(session, statement)
+    # SQLite reports a full table (or full index) walk as SCAN, and a sort it could not
+    # read off an index as a temp b-tree
+    assert not [step for step in plan if step.startswith("SCAN") or "TEMP B-TREE" in step], plan
+    assert any(f"INDEX {index} " in step for step in plan), plan
+
+def test_migration_creates_the_model_indexes():
+    spec = importlib.util.spec_from_file_location("hot_path_indexes", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    model_indexes = {
+        index.name: (table.name, [column.name for column in index.columns])
+        for table in SQLModel.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name, table, columns in migration.INDEXES:
+        assert model_indexes[name] == (table, columns)
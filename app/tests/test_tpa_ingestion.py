@@ -0,0 +1,304 @@
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, Facility, Eligibility, Accumulator, OptOut, ReferralEvent, EOB
+from app.core.uploads import MAX_REPORTED_ERRORS
+from app.services.tpa_ingestion import TPAIngestionService
+from app.services.routing_engine import RoutingEngine
+from app.services.facility_index import invalidate_facility_index
+from app.services.pricing_service import clear_pricing_cache
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    invalidate_facility_index()
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="TechStart")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def test_ingest_facilities_stores_coordinates(session):
+    service = TPAIngestionService(session)
+    result = service.ingest_facilities([
+        {"npi": "2222222222", "facility_name": "QuickLab", "city": "Allentown", "state": "PA", "zip_code": "18103"},
+        {"npi": "3333333333", "facility_name": "LabCorp", "zip_code": "18042", "latitude": 40.69, "longitude": -75.22},
+    ])
+    assert result["processed"] == 2
+    assert result["geocoded"] == 2
+
+    facilities = {f.npi: f for f in session.exec(select(Facility)).all()}
+    assert facilities["2222222222"].latitude == pytest.approx(40.6, abs=0.1)
+    assert facilities["3333333333"].latitude == 40.69
+
+    # Moving a facility re-resolves its coordinates
+    service.ingest_facilities([{"npi": "3333333333", "facility_name": "LabCorp", "zip_code": "18015"}])
+    moved = session.exec(select(Facility).where(Facility.npi == "3333333333")).one()
+    assert moved.latitude == pytest.approx(40.60, abs=0.1)
+    assert moved.longitude == pytest.approx(-75.38, abs=0.1)
+
+def add_member(session, plan, member_id, phone, **fields):
+    member = Eligibility(
+        member_id=member_id, first_name="Pat", last_name=member_id,
+        date_of_birth=date(1980, 1, 1), phone_number=phone, plan_id=plan.id, **fields
+    )
+    session.add(member)
+    session.commit()
+    return member
+
+def test_load_batch_context_query_count_is_constant(session, plan):
+    members = [add_member(session, plan, f"M{i}", f"+1610555{i:04d}") for i in range(20)]
+    for member in members:
+        session.add(Accumulator(member_id=member.id, deductible_met=0.0, timestamp=datetime(2024, 1, 1)))
+        session.add(Accumulator(member_id=member.id, deductible_met=3000.0, timestamp=datetime(2024, 6, 1)))
+    session.add(OptOut(phone_number="+16105550003", reason="STOP"))
+    session.commit()
+    member_ids = [m.id for m in members]
+
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        context = RoutingEngine(session).load_batch_context(member_ids)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # Members, accumulators, opt-outs, plans
+    assert len(statements) == 4
+    assert len(context["members"]) == 20
+    assert context["plans"][plan.id].name == "TechStart HDHP"
+    # Latest accumulator wins
+    assert all(acc.deductible_met == 3000.0 for acc in context["accumulators"].values())
+    assert context["opted_out_phones"] == {"+16105550003"}
+
+def test_ingest_referrals_routes_batch(session, plan):
+    pytest.importorskip("PIL")  # Engaged referrals render a referral image
+    met = add_member(session, plan, "MET", "+16105550001")
+    fresh = add_member(session, plan, "FRESH", "+16105550002")
+    stopped = add_member(session, plan, "STOP", "+16105550003", risk_tier="High")
+    session.add(Accumulator(member_id=met.id, deductible_met=3000.0))
+    session.add(Accumulator(member_id=fresh.id, deductible_met=0.0))
+    session.add(OptOut(phone_number="+16105550003", reason="STOP"))
+    session.add(EOB(member_id_ref="MET", plan_id=plan.id, npi="9999999999", cpt_code="80050", allowed_amount=450.0, date_of_service=date(2024, 1, 1)))
+    session.commit()
+
+    results = TPAIngestionService(session).ingest_referrals([
+        {"member_id": "MET", "cpt_code": "80050", "provider_npi": "9999999999"},
+        {"member_id": "FRESH", "cpt_code": "80050"},
+        {"member_id": "STOP", "cpt_code": "80050"},
+        {"member_id": "NOBODY", "cpt_code": "80050"},
+    ])
+    assert results["processed"] == 3
+    assert results["errors"] == ["Member not found: NOBODY"]
+
+    referrals = {r.member_id: r for r in session.exec(select(ReferralEvent)).all()}
+    assert referrals[met.id].status == "suppressed"
+    assert referrals[met.id].baseline_allowed == 450.0
+    assert referrals[fresh.id].status == "engaged"
+    assert referrals[fresh.id].baseline_allowed == 0.0
+    # High risk is engaged, but the opt-out still blocks the SMS
+    assert referrals[stopped.id].status == "engaged"
+
+def test_ingest_eligibility_bulk_upsert(session, plan):
+    add_member(session, plan, "E1", "+16105550001")
+    rows = [
+        {"member_id": "E1", "first_name": "Erin", "last_name": "Updated", "date_of_birth": "1980-01-01",
+         "phone_number": "610-555-9999", "risk_tier": "High"},
+        {"member_id": "N1", "first_name": "Nia", "last_name": "New", "date_of_birth": "1990-05-02",
+         "phone_number": "6105550002"},
+        {"member_id": "N1", "first_name": "Nia", "last_name": "Renamed", "date_of_birth": "1990-05-02",
+         "phone_number": "6105550002", "risk_tier": None},
+        {"member_id": "BAD", "first_name": "No", "last_name": "Date", "date_of_birth": "not-a-date",
+         "phone_number": "6105550003"},
+    ]
+    results = TPAIngestionService(session).ingest_eligibility(rows)
+    assert results["processed"] == 3
+    assert results["inserted"] == 1
+    assert results["updated"] == 1
+    assert len(results["errors"]) == 1
+    assert results["rows_per_sec"] > 0
+
+    members = {m.member_id: m for m in session.exec(select(Eligibility)).all()}
+    assert set(members) == {"E1", "N1"}
+    assert members["E1"].last_name == "Updated"
+    assert members["E1"].phone_number == "+16105559999"
+    assert members["E1"].risk_tier == "High"
+    assert members["N1"].last_name == "Renamed"
+    assert members["N1"].plan_id == plan.id
+    assert members["N1"].risk_tier == "Low"
+    assert members["N1"].opted_in is False
+
+def test_ingest_eligibility_caps_reported_errors(session, plan):
+    rows = [{"member_id": f"BAD{i}", "first_name": "No", "last_name": "Date", "date_of_birth": "not-a-date",
+             "phone_number": "6105550003"} for i in range(MAX_REPORTED_ERRORS + 5)]
+    results = TPAIngestionService(session).ingest_eligibility(rows)
+    assert results["processed"] == 0
+    assert results["rejected"] == MAX_REPORTED_ERRORS + 5
+    assert len(results["errors"]) == MAX_REPORTED_ERRORS
+    assert results["errors"][0].startswith("Error processing BAD0:")
+
+def test_ingest_referrals_parallel_keeps_member_order(tmp_path, monkeypatch):
+    from app.services import tpa_ingestion
+    # Workers open their own sessions, so they need a shared (file) database.
+    # SQLite normally runs them serially; force the threaded path (three workers, few rows)
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'referrals.db'}", connect_args={"check_same_thread": False})
+    assert tpa_ingestion.supports_parallel_writes(file_engine) is False
+    monkeypatch.setattr(tpa_ingestion, "supports_parallel_writes", lambda bind: True)
+    SQLModel.metadata.create_all(file_engine)
+    with Session(file_engine) as session:
+        employer = Employer(name="TechStart")
+        session.add(employer)
+        session.commit()
+        plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+        session.add(plan)
+        session.commit()
+        members = [add_member(session, plan, f"M{i}", f"+1610555{i:04d}") for i in range(6)]
+        for member in members:
+            # Deductible met + low risk: suppressed, no SMS
+            session.add(Accumulator(member_id=member.id, deductible_met=3000.0))
+        session.commit()
+
+        codes = ["80050", "80053", "85025"]
+        rows = [{"member_id": f"M{i}", "cpt_code": code} for code in codes for i in range(6)]
+        rows.append({"member_id": "NOBODY", "cpt_code": "80050"})
+        results = TPAIngestionService(session).ingest_referrals_parallel(rows, workers=3)
+
+        assert results["processed"] == 18
+        assert results["errors"] == ["Member not found: NOBODY"]
+        for member in members:
+            referrals = session.exec(
+                select(ReferralEvent).where(ReferralEvent.member_id == member.id).order_by(ReferralEvent.id)
+            ).all()
+            assert [r.cpt_code for r in referrals] == codes
+            assert {r.status for r in referrals} == {"suppressed"}
+    file_engine.dispose()
+
+def roster_rows(plan, n, **overrides):
+    return [
+        {"member_id": f"R{i}", "first_name": "Pat", "last_name": f"L{i}", "date_of_birth": "1980-01-01",
+         "phone_number": f"610555{i:04d}", "plan_id": plan.id, **overrides.get(f"R{i}", {})}
+        for i in range(n)
+    ]
+
+def test_sync_eligibility_applies_only_churn(session, plan):
+    service = TPAIngestionService(session)
+    first = service.sync_eligibility(roster_rows(plan, 10))
+    assert first["inserted"] == 10
+    assert first["terminated"] == 0
+    placeholder = add_member(session, plan, "UNK-0199", "+16105550199")
+
+    # Tomorrow's file: R1 moved, R2 left, R3 cancelled via 834 maintenance code, R10 joined
+    rows = roster_rows(plan, 11, R1={"zip_code": "18103"}, R3={"maintenance_type": "024"})
+    rows = [row for row in rows if row["member_id"] != "R2"]
+    result = service.sync_eligibility(rows)
+    assert result["inserted"] == 1
+    assert result["updated"] == 2
+    assert result["unchanged"] == 7
+    assert result["terminated"] == 1
+    assert result["errors"] == []
+
+    members = {m.member_id: m for m in session.exec(select(Eligibility)).all()}
+    assert members["R1"].zip_code == "18103"
+    assert members["R2"].termination_date == date.today()
+    assert members["R3"].termination_date == date.today()
+    assert members["R4"].termination_date is None
+    assert members[placeholder.member_id].termination_date is None
+
+    # Terminated members are not engaged
+    decision = RoutingEngine(session)._evaluate(members["R2"], "80050", None)
+    assert decision["engage"] is False
+
+    # A member who reappears is reinstated
+    result = service.sync_eligibility(roster_rows(plan, 11, R3={"maintenance_type": "024"}))
+    session.expire_all()
+    assert session.exec(select(Eligibility).where(Eligibility.member_id == "R2")).one().termination_date is None
+    assert result["terminated"] == 0
+
+def test_sync_eligibility_refuses_mass_termination(session, plan):
+    service = TPAIngestionService(session)
+    service.sync_eligibility(roster_rows(plan, 10))
+    result = service.sync_eligibility(roster_rows(plan, 3))
+    assert result["terminated"] == 0
+    assert "Refusing to terminate 7 of 10" in result["errors"][0]
+    assert session.exec(select(Eligibility).where(Eligibility.termination_date.is_not(None))).all() == []
+
+def test_sync_eligibility_writes_every_hashed_field(session, plan):
+    other = Plan(name="TechStart PPO", employer_id=plan.employer_id)
+    session.add(other)
+    session.commit()
+    service = TPAIngestionService(session)
+    service.sync_eligibility(roster_rows(plan, 4))
+
+    moved = {"plan_id": other.id, "date_of_birth": "1981-02-03", "phone_number": "6105559999", "risk_tier": "High"}
+    rows = roster_rows(plan, 4, R0=moved)
+    assert service.sync_eligibility(rows)["updated"] == 1
+
+    session.expire_all()
+    member = session.exec(select(Eligibility).where(Eligibility.member_id == "R0")).one()
+    assert member.plan_id == other.id
+    assert member.date_of_birth == date(1981, 2, 3)
+    assert member.phone_number == "+16105559999"
+    assert member.risk_tier == "High"
+
+    # The stored row now matches its hash, so the same file is a no-op
+    result = service.sync_eligibility(rows)
+    assert result["unchanged"] == 4
+    assert result["updated"] == 0
+
+    # A row without a plan keeps the member's current plan
+    rows[0].pop("plan_id")
+    assert service.sync_eligibility(rows)["unchanged"] == 4
+
+def test_ingest_referrals_never_engages_terminated_members(session, plan, monkeypatch):
+    pytest.importorskip("PIL")  # Engaged referrals render a referral image
+    from app.db.models import MemberInteraction
+    from app.services.pricing_service import PricingService
+    from app.services.twilio_service import TwilioService
+
+    sent = []
+    def send_sms(self, to_number, body, media_url=None, session=None):
+        # Texts go out only after the referrals are committed
+        assert not session.new and not session.dirty
+        sent.append(to_number)
+        return "SM123"
+    monkeypatch.setattr(TwilioService, "send_sms", send_sms)
+
+    active = add_member(session, plan, "ACTIVE", "+16105550001")
+    ended = add_member(session, plan, "ENDED", "+16105550002", termination_date=date.today() - timedelta(days=30))
+    for member in (active, ended):
+        session.add(Accumulator(member_id=member.id, deductible_met=3000.0))
+    session.add(Facility(npi="5555555555", facility_name="Freestanding Imaging", zip_code="18015"))
+    session.add(EOB(member_id_ref="HISTORICAL", plan_id=plan.id, npi="5555555555", cpt_code="73721",
+                    allowed_amount=450.0, date_of_service=date(2024, 1, 1)))
+    session.commit()
+    PricingService(session).rebuild_price_summary()
+
+    results = TPAIngestionService(session).ingest_referrals([
+        {"member_id": "ACTIVE", "cpt_code": "73721"},
+        {"member_id": "ENDED", "cpt_code": "73721"},
+    ])
+    assert results["processed"] == 2
+
+    referrals = {r.member_id: r for r in session.exec(select(ReferralEvent)).all()}
+    # Same accumulator and prices: viable for $0, but only the covered member is engaged
+    assert referrals[active.id].status == "engaged"
+    assert referrals[ended.id].status == "suppressed"
+    assert sent == ["+16105550001"]
+    interactions = session.exec(select(MemberInteraction).where(MemberInteraction.member_id == ended.id)).all()
+    assert [i.message_type for i in interactions] == ["suppressed"]
+    assert "Coverage terminated" in interactions[0].content
@@ -0,0 +1,43 @@
+import io
+import json
+import pytest
+from app.core.uploads import iter_upload_rows, merge_results, MAX_REPORTED_ERRORS
+
+def rows(n):
+    return [{"member_id": f"M{i}", "note": "comma, \"quoted\" ]} text", "amount": i * 1.5} for i in range(n)]
+
+def test_json_array_streams_across_blocks():
+    payload = ("\ufeff  " + json.dumps(rows(25), indent=2)).encode("utf-8")
+    # Tiny read blocks force records to straddle block boundaries
+    chunks = list(iter_upload_rows(io.BytesIO(payload), chunk_size=10, block_size=7))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert [r for c in chunks for r in c] == rows(25)
+
+def test_csv_streams_in_chunks():
+    text = "member_id,cpt_code\r\n" + "".join(f"M{i},8005{i % 10}\r\n" for i in range(12))
+    fileobj = io.BytesIO(text.encode("utf-8-sig"))
+    chunks = list(iter_upload_rows(fileobj, chunk_size=5))
+    assert [len(c) for c in chunks] == [5, 5, 2]
+    assert chunks[0][0] == {"member_id": "M0", "cpt_code": "80050"}
+    # The upload's file object stays usable after reading
+    assert not fileobj.closed
+
+def test_malformed_json_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_upload_rows(io.BytesIO(b'[{"member_id": "M1"}, {"member_id": '), block_size=8))
+    with pytest.raises(ValueError):
+        list(iter_upload_rows(io.BytesIO(b'[1, 2, 3]')))
+
+def test_merge_results_sums_counts_and_concatenates_lists():
+    total = {}
+    for chunk in iter_upload_rows(io.BytesIO(json.dumps(rows(7)).encode()), chunk_size=3):
+        merge_results(total, {"processed": len(chunk), "geocoded": 1, "errors": [f"{len(chunk)} rows"], "method": "copy"})
+    assert total == {"processed": 7, "geocoded": 3, "errors": ["3 rows", "3 rows", "1 rows"], "method": "copy"}
+
+def test_merge_results_keeps_only_the_first_errors():
+    total = {}
+    for chunk in range(3):
+        merge_results(total, {"rejected": 60, "errors": [f"chunk {chunk} row {i}" for i in range(60)]})
+    assert total["rejected"] == 180
+    assert len(total["errors"]) == MAX_REPORTED_ERRORS
+    assert total["errors"][-1] == f"chunk 1 row {MAX_REPORTED_ERRORS - 61}"
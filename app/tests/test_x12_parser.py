@@ -0,0 +1,182 @@
+import io
+import pytest
+from datetime import date
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.db.models import Employer, Plan, Eligibility, EOB
+from app.services.x12_parser import X12Reader, iter_x12_rows
+from app.services.ingestion_jobs import IngestionJobService
+from app.services.facility_index import invalidate_facility_index
+from app.services.pricing_service import clear_pricing_cache
+
+# Setup in-memory DB
+engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(name="session")
+def session_fixture():
+    SQLModel.metadata.create_all(engine)
+    clear_pricing_cache()
+    invalidate_facility_index()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture(name="plan")
+def plan_fixture(session):
+    employer = Employer(name="TechStart")
+    session.add(employer)
+    session.commit()
+    plan = Plan(name="TechStart HDHP", employer_id=employer.id)
+    session.add(plan)
+    session.commit()
+    return plan
+
+def interchange(segments, element="*", component=":", terminator="~\n"):
+    isa = element.join([
+        "ISA", "00", " " * 10, "00", " " * 10, "ZZ", "SENDER".ljust(15), "ZZ", "TOTL".ljust(15),
+        "240101", "1200", "^", "00501", "000000001", "0", "P", component,
+    ])
+    body = [s.replace("*", element).replace(":", component) for s in segments]
+    return (isa + terminator + terminator.join(body) + terminator).encode()
+
+ENROLLMENT_834 = [
+    "GS*BE*SENDER*TOTL*20240101*1200*1*X*005010X220A1",
+    "ST*834*0001*005010X220A1",
+    "BGN*00*12456*20240101*1200****2",
+    "INS*Y*18*021*28*A***FT",
+    "REF*0F*SUB100",
+    "DTP*356*D8*20240101",
+    "NM1*IL*1*RIVERA*SEAN****34*123456789",
+    "PER*IP**HP*6105550100*WP*6105550199",
+    "N3*12 MAIN ST",
+    "N4*ALLENTOWN*PA*181031234",
+    "DMG*D8*19800115*M",
+    "HD*021**HLT*HDHP*EMP",
+    "DTP*348*D8*20240101",
+    "INS*N*19*021*28*A",
+    "REF*0F*SUB100",
+    "NM1*IL*1*RIVERA*MAYA",
+    "DMG*D8*20120304*F",
+    "INS*Y*18*024*07*A",
+    "REF*0F*SUB200",
+    "DTP*357*D8*20240331",
+    "NM1*IL*1*CHEN*LEE****ZZ*MEM200",
+    "DMG*D8*19751111*F",
+    "SE*21*0001",
+    "GE*1*1",
+    "IEA*1*000000001",
+]
+
+REMITTANCE_835 = [
+    "GS*HP*PAYER*TOTL*20240201*1200*2*X*005010X221A1",
+    "ST*835*0002",
+    "BPR*I*150*C*ACH",
+    "N1*PR*ACME HEALTH",
+    "N1*PE*QUICKLAB FREESTANDING*XX*2222222222",
+    "CLP*CLM1*1*300*110*40*12*PAYERCTL*11",
+    "NM1*QC*1*RIVERA*SEAN****MI*SUB100",
+    "DTM*232*20240105",
+    "SVC*HC:80050*200*90",
+    "DTM*472*20240105",
+    "CAS*PR*1*30*1*2*10",
+    "SVC*HC:85025:QW*100*20",
+    "AMT*B6*25",
+    "CLP*CLM2*22*300*-110**12",
+    "NM1*QC*1*RIVERA*SEAN****MI*SUB100",
+    "SVC*HC:80050*200*-90",
+    "CLP*CLM3*1*500*400*0*12**22",
+    "NM1*QC*1*CHEN*LEE****MI*MEM200",
+    "NM1*82*1*SMITH*JO****XX*3333333333",
+    "DTM*050*20240110",
+    "SVC*HC:80053*500*400",
+    "SE*20*0002",
+    "GE*1*2",
+    "IEA*1*000000001",
+]
+
+def test_reader_uses_isa_delimiters_across_blocks():
+    payload = interchange(ENROLLMENT_834, element="|", component=">", terminator="\n")
+    reader = X12Reader(io.BytesIO(payload), block_size=16)
+    assert (reader.element_separator, reader.component_separator, reader.segment_terminator) == ("|", ">", "\n")
+    segments = list(reader)
+    assert segments[0][0] == "ISA"
+    assert segments[4] == ["INS", "Y", "18", "021", "28", "A", "", "", "FT"]
+    assert segments[-1] == ["IEA", "1", "000000001"]
+
+def test_834_members():
+    members = list(iter_x12_rows(io.BytesIO(interchange(ENROLLMENT_834)), block_size=32))
+    assert [m["member_id"] for m in members] == ["SUB100", "SUB100-MAYA", "MEM200"]
+
+    subscriber = members[0]
+    assert subscriber["first_name"] == "SEAN"
+    assert subscriber["last_name"] == "RIVERA"
+    assert subscriber["date_of_birth"] == "1980-01-15"
+    assert subscriber["phone_number"] == "6105550100"
+    assert subscriber["zip_code"] == "18103"
+    assert subscriber["coverage_start"] == "2024-01-01"
+
+    assert members[1]["subscriber_id"] == "SUB100"
+    assert members[1]["phone_number"] == ""
+    assert members[2]["maintenance_type"] == "024"
+    assert members[2]["coverage_end"] == "2024-03-31"
+
+def test_835_service_lines():
+    rows = list(iter_x12_rows(io.BytesIO(interchange(REMITTANCE_835)), block_size=32))
+    # CLM2 is a reversal and is skipped
+    assert [(r["claim_id"], r["cpt_code"]) for r in rows] == [("CLM1", "80050"), ("CLM1", "85025"), ("CLM3", "80053")]
+
+    paid_plus_pr, amt_b6, rendering = rows
+    assert paid_plus_pr["allowed_amount"] == 130.0  # 90 paid + 30 + 10 patient responsibility
+    assert paid_plus_pr["date_of_service"] == "2024-01-05"
+    assert paid_plus_pr["npi"] == "2222222222"
+    assert paid_plus_pr["facility_name"] == "QUICKLAB FREESTANDING"
+    assert paid_plus_pr["place_of_service"] == "11"
+    assert amt_b6["allowed_amount"] == 25.0
+    assert amt_b6["date_of_service"] == "2024-01-05"
+    assert rendering["npi"] == "3333333333"
+    assert rendering["member_id"] == "MEM200"
+    assert rendering["date_of_service"] == "2024-01-10"
+
+def test_x12_feeds_ingestion(session, plan):
+    job, result = IngestionJobService(session).run("eligibility", io.BytesIO(interchange(ENROLLMENT_834)), "enroll.834")
+    assert job.status == "completed"
+    assert result["processed"] == 3
+    sean = session.exec(select(Eligibility).where(Eligibility.member_id == "SUB100")).one()
+    assert sean.zip_code == "18103"
+    assert sean.phone_number == "+16105550100"
+    assert sean.date_of_birth == date(1980, 1, 15)
+
+    job, result = IngestionJobService(session).run(
+        "eob", io.BytesIO(interchange(REMITTANCE_835)), "remit.835", row_defaults={"plan_id": plan.id}
+    )
+    assert result["loaded"] == 3
+    assert {e.plan_id for e in session.exec(select(EOB)).all()} == {plan.id}
+
+def test_835_reloaded_against_another_plan_is_loaded_for_it(session, plan):
+    other = Plan(name="TechStart PPO", employer_id=plan.employer_id)
+    session.add(other)
+    session.commit()
+    payload = interchange(REMITTANCE_835)
+
+    IngestionJobService(session).run("eob", io.BytesIO(payload), "remit.835", row_defaults={"plan_id": plan.id})
+    job, result = IngestionJobService(session).run("eob", io.BytesIO(payload), "remit.835", row_defaults={"plan_id": other.id})
+    # A new job for the other plan, whose rows are not mistaken for the first plan's
+    assert "duplicate_of" not in result
+    assert result["loaded"] == 3
+    assert result["duplicates"] == 0
+    assert len(session.exec(select(EOB).where(EOB.plan_id == other.id)).all()) == 3
+
+    _, result = IngestionJobService(session).run("eob", io.BytesIO(payload), "remit.835", row_defaults={"plan_id": other.id})
+    assert result["duplicate_of"] == job.id
+
+def test_834_member_without_identifier_is_rejected_alone(session, plan):
+    # The dependent has no REF*0F / REF*23 / NM1 ZZ, so no member_id can be derived
+    segments = ENROLLMENT_834[:13] + ["INS*N*19*021*28*A", "NM1*IL*1*DOE*JANE", "DMG*D8*20120304*F"] + ENROLLMENT_834[17:]
+    rows = list(iter_x12_rows(io.BytesIO(interchange(segments))))
+    assert [r["member_id"] for r in rows] == ["SUB100", None, "MEM200"]
+
+    for kind in ("eligibility", "eligibility_full"):
+        job, result = IngestionJobService(session).run(kind, io.BytesIO(interchange(segments)), "enroll.834")
+        assert job.status == "completed"
+        assert result["processed"] == 2
+        assert result["errors"] == ["Error processing None: missing member_id for JANE DOE"]
+    assert {m.member_id for m in session.exec(select(Eligibility)).all()} == {"SUB100", "MEM200"}
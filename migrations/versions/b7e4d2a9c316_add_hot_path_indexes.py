@@ -0,0 +1,47 @@
+"""add_hot_path_indexes
+
+Revision ID: b7e4d2a9c316
+Revises: e52b9d0a7c14
+Create Date: 2026-10-17 19:02:37.614205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d2a9c316'
+down_revision: Union[str, Sequence[str], None] = 'e52b9d0a7c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index, table, columns), matching the Index / index=True definitions in app/db/models.py
+INDEXES = [
+    ('ix_accumulator_member_timestamp', 'accumulator', ['member_id', 'timestamp']),
+    ('ix_memberinteraction_member_timestamp', 'memberinteraction', ['member_id', 'timestamp']),
+    ('ix_referralevent_member_timestamp', 'referralevent', ['member_id', 'timestamp']),
+    ('ix_supportmessage_status', 'supportmessage', ['status']),
+    ('ix_eob_plan_cpt_allowed', 'eob', ['plan_id', 'cpt_code', 'allowed_amount']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # On Postgres the indexes are built CONCURRENTLY so ingestion and routing keep
+    # writing to these tables meanwhile. That cannot run inside a transaction, hence
+    # the autocommit block. A failed concurrent build leaves an INVALID index behind:
+    # drop it and run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
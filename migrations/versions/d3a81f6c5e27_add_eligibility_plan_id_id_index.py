@@ -0,0 +1,33 @@
+"""add_eligibility_plan_id_id_index
+
+Revision ID: d3a81f6c5e27
+Revises: b7e4d2a9c316
+Create Date: 2026-10-17 20:14:55.370148
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a81f6c5e27'
+down_revision: Union[str, Sequence[str], None] = 'b7e4d2a9c316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built CONCURRENTLY on Postgres (outside a transaction), as in b7e4d2a9c316
+    with op.get_context().autocommit_block():
+        op.create_index('ix_eligibility_plan_id_id', 'eligibility', ['plan_id', 'id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_eligibility_plan_id_id', table_name='eligibility', postgresql_concurrently=True)
@@ -56,3 +56,60 @@ def test_eligibility_model(session: Session):
     
     assert member.id is not None
     assert member.opted_in is False
+
+def test_tpa_ingest_reports_invalid_rows(client: TestClient, session: Session):
+    emp = Employer(name="Test Corp")
+    session.add(emp)
+    session.commit()
+    session.add(Plan(name="Test Plan", employer_id=emp.id))
+    session.commit()
+
+    response = client.post("/tpa/ingest/eligibility", json=[
+        {"member_id": "M1", "first_name": "Pat", "last_name": "Lee", "date_of_birth": "1980-01-05", "phone_number": "610-555-0101"},
+        {"member_id": "M2", "first_name": "Sam", "last_name": "Lee", "date_of_birth": "05/01/1980", "phone_number": "610-555-0102"},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["processed"] == 1
+    assert body["validation"] == {"rejected": 1, "rows": [{"row": 1, "errors": {"date_of_birth": "expected a YYYY-MM-DD date"}}]}
+
+    response = client.post("/tpa/ingest/claims", json=[{"member_id": "M1", "cpt_code": "80050"}])
+    assert response.status_code == 422
+
+def test_async_database_url():
+    from app.db.session import async_database_url
+    assert async_database_url("sqlite:///./totl.db") == "sqlite+aiosqlite:///./totl.db"
+    assert async_database_url("postgres://u:p@db/totl") == "postgresql+asyncpg://u:p@db/totl"
+    assert async_database_url("postgresql+psycopg2://u:p@db/totl") == "postgresql+asyncpg://u:p@db/totl"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/totl")
+
+def test_job_status_uses_async_session(tmp_path):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.db.session import get_async_session
+    from app.db.models import IngestionJob
+
+    # Sync and async engines on the same file, as in the app
+    db = tmp_path / "jobs.db"
+    engine = create_engine(f"sqlite:///{db}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        job = IngestionJob(kind="claims", file_hash="abc", status="queued", total_rows=10, row_offset=4, payload=[])
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db}")
+
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    app.dependency_overrides[get_async_session] = get_async_session_override
+    try:
+        client = TestClient(app)
+        body = client.get(f"/tpa/jobs/{job_id}").json()
+        assert body["status"] == "queued"
+        assert body["progress"] == 0.4
+        assert client.get("/tpa/jobs/999").status_code == 404
+    finally:
+        app.dependency_overrides.clear()